@@ -0,0 +1,26 @@
+from app.domain.model.Event import EventId
+from app.domain.model.Inventory import InventoryAmount, SellerName
+
+
+class AdjustInventoryCommand:
+    def __init__(self, event_id, seller_name, delta, minimum=None):
+        self.event_id = event_id
+        self.seller_name = seller_name
+        self.delta = delta
+        self.minimum = minimum
+
+
+class AdjustInventory:
+    def __init__(self, repository):
+        self.repository = repository
+
+    def handle(self, command):
+        delta = InventoryAmount(command.delta)
+        inventory = self.repository.adjust(
+            EventId(command.event_id),
+            SellerName(command.seller_name),
+            delta,
+            InventoryAmount(command.minimum) if command.minimum is not None else None
+        )
+        inventory.inventory_updated(delta)
+        inventory.release()
@@ -1,21 +1,40 @@
 
 class GetEventsQuery:
-    def __init__(self, identifier=None):
+    def __init__(self, identifier=None, after=None, limit=None, stream=False):
         self.identifier = identifier
+        self.after = after
+        self.limit = limit
+        self.stream = stream
 
 
 class GetEvents:
-    def __init__(self, repository):
+    MAX_PAGE_SIZE = 500
+
+    def __init__(self, repository, read_model):
         self.repository = repository
+        self.read_model = read_model
 
     def handle(self, query):
-        if query.identifier is None:
-            result = [self.__transform_event(item) for item in self.repository.all()]
-        else:
+        if query.identifier is not None:
             result = self.repository.of_id(query.identifier)
             result = self.__transform_event(result) if result is not None else {}
+        elif query.stream:
+            result = self.read_model.iter_all()
+        elif query.limit is not None:
+            result = self.__page(query.after, min(query.limit, GetEvents.MAX_PAGE_SIZE))
+        else:
+            result = list(self.read_model.iter_all())
         return result
 
+    def __page(self, after, limit):
+        # One more event than requested tells if there is a next page
+        events = self.read_model.slice(after, limit + 1)
+        page = events[:limit]
+        return {
+            'events': page,
+            'next': page[-1]['id'] if len(events) > limit else None
+        }
+
     def __transform_event(self, record):
         return {
             'id': record.identifier.identifier,
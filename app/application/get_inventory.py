@@ -1,22 +1,13 @@
-from app.domain.model.Event import EventId
-
-
 class GetInventoryOfEventQuery:
-    def __init__(self, event_id):
+    def __init__(self, event_id, stream=False):
         self.event_id = event_id
+        self.stream = stream
 
 
 class GetInventoryOfEvent:
-    def __init__(self, repository):
-        self.repository = repository
+    def __init__(self, read_model):
+        self.read_model = read_model
 
     def handle(self, query):
-        return [self.__transform(item) for item in self.repository.of_event_id(
-            EventId(query.event_id)
-        )]
-
-    def __transform(self, inventory):
-        return {
-            'seller_name': inventory.seller_name.name,
-            'amount': inventory.amount.amount
-        }
+        inventory = self.read_model.iter_of_event_id(query.event_id)
+        return inventory if query.stream else list(inventory)
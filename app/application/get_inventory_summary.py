@@ -0,0 +1,27 @@
+from app.domain.model.Event import EventId
+
+
+class GetInventorySummaryQuery:
+    def __init__(self, event_id):
+        self.event_id = event_id
+
+
+class GetInventorySummary:
+    def __init__(self, repository):
+        self.repository = repository
+
+    def handle(self, query):
+        summary = self.repository.of_event_id(EventId(query.event_id))
+        if summary is None:
+            return {
+                'event_id': query.event_id,
+                'total_amount': 0,
+                'seller_count': 0,
+                'updated_on': None
+            }
+        return {
+            'event_id': summary['eventId'],
+            'total_amount': summary['totalAmount'],
+            'seller_count': summary['sellerCount'],
+            'updated_on': summary['updatedOn']
+        }
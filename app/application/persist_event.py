@@ -12,9 +12,15 @@ class PersistEvent:
         self.repository = repository
 
     def handle(self, command):
+        self.repository.persist(self.__to_event(command))
+
+    def handle_batch(self, commands):
+        self.repository.persist_many([self.__to_event(command) for command in commands])
+
+    def __to_event(self, command):
         event = Event(
             EventId(command.identifier),
             EventName(command.name)
         )
         event.event_created()
-        self.repository.persist(event)
+        return event
@@ -15,11 +15,22 @@ class PersistInventory:
         self.repository = repository
 
     def handle(self, command):
-        self.repository.persist(
-            Inventory(
-                InventoryId(command.identifier),
-                EventId(command.event_id),
-                InventoryAmount(command.amount),
-                SellerName(command.seller_name)
-            )
+        inventory = PersistInventory.__to_inventory(command)
+        self.repository.persist(inventory)
+        return inventory.identifier.identifier
+
+    def handle_batch(self, commands):
+        inventories = [PersistInventory.__to_inventory(command) for command in commands]
+        self.repository.persist_many(inventories)
+        return [inventory.identifier.identifier for inventory in inventories]
+
+    @staticmethod
+    def __to_inventory(command):
+        inventory = Inventory(
+            InventoryId(command.identifier),
+            EventId(command.event_id),
+            InventoryAmount(command.amount),
+            SellerName(command.seller_name)
         )
+        inventory.inventory_updated()
+        return inventory
@@ -0,0 +1,16 @@
+from app.domain.model.Event import EventId
+
+
+class RebuildInventorySummaryCommand:
+    def __init__(self, event_id=None):
+        self.event_id = event_id
+
+
+class RebuildInventorySummary:
+    def __init__(self, repository):
+        self.repository = repository
+
+    def handle(self, command):
+        self.repository.rebuild(
+            EventId(command.event_id) if command.event_id is not None else None
+        )
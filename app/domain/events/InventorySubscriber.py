@@ -0,0 +1,20 @@
+from app.domain.model.Inventory import InventoryUpdated
+from app.infrastructure.domain_events import DomainEventSubscriber
+
+
+class InventorySummaryProjector(DomainEventSubscriber):
+    """
+    Keeps the inventory summary of each event up to date
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def handle(self, domain_event) -> None:
+        self.repository.apply(domain_event)
+
+    def handle_batch(self, domain_events) -> None:
+        self.repository.apply_many(domain_events)
+
+    def is_subscribed_to(self, domain_event) -> bool:
+        return isinstance(domain_event, InventoryUpdated)
@@ -1,8 +1,10 @@
 from uuid import uuid4
-from app.infrastructure.domain_events import DomainRoot, DomainEvent
+from app.infrastructure.domain_events import DomainRoot, DomainEvent, ValueObject
 
 
 class Event(DomainRoot):
+    __slots__ = ('identifier', 'name')
+
     def __init__(self, identifier, name):
         super().__init__()
         self.identifier = identifier
@@ -11,20 +13,27 @@ class Event(DomainRoot):
     def event_created(self):
         self.publish(EventCreated(self.identifier, self.name))
 
+    def event_deleted(self):
+        self.publish(EventDeleted(self.identifier))
+
+
+class EventId(ValueObject):
+    __slots__ = ('identifier',)
 
-class EventId:
     def __init__(self, identifier):
-        self.identifier = identifier
+        object.__setattr__(self, 'identifier', identifier)
 
     @staticmethod
     def generate_id():
         return EventId(uuid4())
 
 
-class EventName:
+class EventName(ValueObject):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.__validate_name(name)
-        self.name = name
+        object.__setattr__(self, 'name', name)
 
     @staticmethod
     def __validate_name(name):
@@ -39,7 +48,17 @@ class EventNameInvalid(Exception):
 
 
 class EventCreated(DomainEvent):
+    __slots__ = ('identifier', 'name')
+
     def __init__(self, identifier, name):
         super(EventCreated, self).__init__()
         self.identifier = identifier
         self.name = name
+
+
+class EventDeleted(DomainEvent):
+    __slots__ = ('identifier',)
+
+    def __init__(self, identifier):
+        super(EventDeleted, self).__init__()
+        self.identifier = identifier
@@ -1,8 +1,11 @@
+from typing import Generator
 from uuid import uuid4
-from app.infrastructure.domain_events import DomainRoot, DomainEvent
+from app.infrastructure.domain_events import DomainRoot, DomainEvent, ValueObject
 
 
 class Inventory(DomainRoot):
+    __slots__ = ('identifier', 'event_id', 'amount', 'seller_name')
+
     def __init__(self, identifier, event_id, amount, seller_name):
         super().__init__()
         self.identifier = identifier
@@ -10,44 +13,79 @@ class Inventory(DomainRoot):
         self.amount = amount
         self.seller_name = seller_name
 
-    def inventory_updated(self):
-        self.publish(
-            InventoryUpdated(self.identifier, self.event_id, self.amount, self.seller_name)
-        )
+    def inventory_updated(self, delta=None):
+        # Without a delta the amount has been replaced, the event carries the new amount only
+        self.publish(InventoryUpdated(
+            self.identifier,
+            self.event_id,
+            self.amount,
+            self.seller_name,
+            delta
+        ))
+
 
+class InventoryId(ValueObject):
+    __slots__ = ('identifier',)
 
-class InventoryId:
     def __init__(self, identifier):
-        self.identifier = identifier
+        object.__setattr__(self, 'identifier', identifier)
 
     @staticmethod
     def generate_id():
         return InventoryId(uuid4())
 
 
-class InventoryAmount:
+class InventoryAmount(ValueObject):
+    __slots__ = ('amount',)
+
     def __init__(self, amount):
-        self.amount = amount
+        self.__validate_amount(amount)
+        object.__setattr__(self, 'amount', amount)
+
+    @staticmethod
+    def __validate_amount(amount):
+        if isinstance(amount, bool) or not isinstance(amount, int):
+            raise InventoryAmountInvalid
+
+
+class InventoryAmountInvalid(Exception):
+    """
+    The amount of an inventory has to be an integer
+    """
+
 
+class InventoryBelowMinimum(Exception):
+    """
+    An inventory adjustment would leave the amount below the required minimum
+    """
+
+
+class SellerName(ValueObject):
+    __slots__ = ('name',)
 
-class SellerName:
     def __init__(self, name):
-        self.name = name
+        object.__setattr__(self, 'name', name)
 
 
 class InventoryUpdated(DomainEvent):
-    def __init__(self, identifier, event_id, amount, seller_name):
+    __slots__ = ('identifier', 'event_id', 'amount', 'seller_name', 'delta')
+
+    def __init__(self, identifier, event_id, amount, seller_name, delta):
         super(InventoryUpdated, self).__init__()
         self.identifier = identifier
         self.event_id = event_id
         self.amount = amount
         self.seller_name = seller_name
+        self.delta = delta
 
 
 class InventoryRepository:
     def persist(self, event) -> None:
         raise NotImplementedError
 
+    def persist_many(self, inventories) -> None:
+        raise NotImplementedError
+
     def delete(self, event) -> None:
         raise NotImplementedError
 
@@ -56,3 +94,9 @@ class InventoryRepository:
 
     def of_event_id(self, event_id) -> list:
         raise NotImplementedError
+
+    def iter_of_event_id(self, event_id, batch_size=None) -> Generator:
+        raise NotImplementedError
+
+    def adjust(self, event_id, seller_name, delta, minimum=None) -> object:
+        raise NotImplementedError
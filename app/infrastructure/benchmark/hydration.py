@@ -0,0 +1,140 @@
+"""
+Measures the memory, the allocated blocks and the time needed to hydrate each aggregate of a
+large listing, comparing the slotted domain model with classes backed by an instance
+`__dict__`. Run it with `python -m app.infrastructure.benchmark.hydration`
+"""
+import argparse
+import gc
+import timeit
+import tracemalloc
+
+from app.domain.model.Event import Event, EventId, EventName
+from app.domain.model.Inventory import Inventory, InventoryId, InventoryAmount, SellerName
+from app.infrastructure.domain_events import DomainEventPublisher
+
+
+class DictDomainRoot:
+    """
+    Aggregate root allocating its event buffer and looking up the publisher on creation
+    """
+
+    def __init__(self):
+        self.events = []
+        self.domain_event_publisher = DomainEventPublisher.get_instance()
+
+
+class DictEvent(DictDomainRoot):
+    def __init__(self, identifier, name):
+        super().__init__()
+        self.identifier = identifier
+        self.name = name
+
+
+class DictInventory(DictDomainRoot):
+    def __init__(self, identifier, event_id, amount, seller_name):
+        super().__init__()
+        self.identifier = identifier
+        self.event_id = event_id
+        self.amount = amount
+        self.seller_name = seller_name
+
+
+class DictValue:
+    def __init__(self, value):
+        self.value = value
+
+
+class DictEventName:
+    def __init__(self, name):
+        if len(name) < 10 or len(name) > 60:
+            raise ValueError(name)
+        self.name = name
+
+
+class DictInventoryAmount:
+    def __init__(self, amount):
+        if isinstance(amount, bool) or not isinstance(amount, int):
+            raise ValueError(amount)
+        self.amount = amount
+
+
+def hydrate_events(records) -> list:
+    return [Event(EventId(record['identifier']), EventName(record['name'])) for record in records]
+
+
+def hydrate_dict_events(records) -> list:
+    return [
+        DictEvent(DictValue(record['identifier']), DictEventName(record['name']))
+        for record in records
+    ]
+
+
+def hydrate_inventory(records) -> list:
+    return [
+        Inventory(
+            InventoryId(record['identifier']),
+            EventId(record['eventId']),
+            InventoryAmount(record['amount']),
+            SellerName(record['sellerName'])
+        ) for record in records
+    ]
+
+
+def hydrate_dict_inventory(records) -> list:
+    return [
+        DictInventory(
+            DictValue(record['identifier']),
+            DictValue(record['eventId']),
+            DictInventoryAmount(record['amount']),
+            DictValue(record['sellerName'])
+        ) for record in records
+    ]
+
+
+def measure(hydrate, records, repeat) -> tuple:
+    """
+    :param hydrate: Function building the aggregates of the records
+    :param records: List of documents as they are read from Mongo
+    :param repeat: Number of timed runs, the fastest is kept
+    :return: Bytes, memory blocks and microseconds per aggregate
+    """
+    gc.collect()
+    tracemalloc.start()
+    aggregates = hydrate(records)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    statistics = snapshot.statistics('filename')
+    size = sum(statistic.size for statistic in statistics)
+    blocks = sum(statistic.count for statistic in statistics)
+    del aggregates
+    seconds = min(timeit.repeat(lambda: hydrate(records), number=1, repeat=repeat))
+    return size / len(records), blocks / len(records), seconds * 1e6 / len(records)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=100000, help='aggregates per listing')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of each listing')
+    arguments = parser.parse_args()
+    event_records = [
+        {'identifier': str(index), 'name': 'Benchmark event {0}'.format(index)}
+        for index in range(arguments.count)
+    ]
+    inventory_records = [
+        {'identifier': str(index), 'eventId': 'event', 'amount': index, 'sellerName': 'seller'}
+        for index in range(arguments.count)
+    ]
+    cases = [
+        ('Event', hydrate_events, event_records),
+        ('Event (__dict__)', hydrate_dict_events, event_records),
+        ('Inventory', hydrate_inventory, inventory_records),
+        ('Inventory (__dict__)', hydrate_dict_inventory, inventory_records)
+    ]
+    print('{0:<22}{1:>10}{2:>10}{3:>10}'.format('Aggregate', 'bytes', 'blocks', 'us'))
+    for (name, hydrate, records) in cases:
+        (size, blocks, time) = measure(hydrate, records, arguments.repeat)
+        print('{0:<22}{1:>10.1f}{2:>10.2f}{3:>10.3f}'.format(name, size, blocks, time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Measures the cost of dispatching an operation through the `SimpleBus`, compared with calling
+the handler directly and with the lookup by class name of previous versions. Run it with
+`python -m app.infrastructure.benchmark.simple_bus`
+"""
+import argparse
+import timeit
+
+from app.infrastructure.simple_bus import Middleware, OperationHandler, SimpleBus
+
+
+class BenchmarkQuery:
+    pass
+
+
+class BenchmarkHandler(OperationHandler):
+    def invoke(self, operation):
+        return operation
+
+
+class PassThroughMiddleware(Middleware):
+    def execute(self, operation, proceed):
+        return proceed(operation)
+
+
+class NamedBus:
+    """
+    Dispatch of previous versions, handlers keyed by the `module.class` name of the DTO
+    """
+
+    def __init__(self, handler):
+        self.operations = {
+            '{0}.{1}'.format(BenchmarkQuery.__module__, BenchmarkQuery.__name__): handler
+        }
+
+    def execute(self, operation):
+        name = '{0}.{1}'.format(operation.__class__.__module__, operation.__class__.__name__)
+        if name not in self.operations:
+            raise KeyError(name)
+        return self.operations[name].invoke(operation)
+
+
+def bus_with(middleware) -> SimpleBus:
+    bus = SimpleBus(middleware=middleware)
+    bus.operation_provider.record(BenchmarkQuery, BenchmarkHandler())
+    return bus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=1000000, help='dispatches per run')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs, the fastest is kept')
+    arguments = parser.parse_args()
+    query = BenchmarkQuery()
+    handler = BenchmarkHandler()
+    cases = [
+        ('handler.invoke', handler.invoke),
+        ('class name lookup', NamedBus(handler).execute),
+        ('SimpleBus', bus_with([]).execute),
+        ('SimpleBus, 1 middleware', bus_with([PassThroughMiddleware()]).execute),
+        ('SimpleBus, 3 middleware', bus_with([PassThroughMiddleware() for _ in range(3)]).execute)
+    ]
+    print('{0:<28}{1:>12}'.format('Dispatch', 'ns/call'))
+    for (name, dispatch) in cases:
+        seconds = min(timeit.repeat(
+            lambda: dispatch(query), number=arguments.number, repeat=arguments.repeat
+        ))
+        print('{0:<28}{1:>12.1f}'.format(name, seconds * 1e9 / arguments.number))
+
+
+if __name__ == '__main__':
+    main()
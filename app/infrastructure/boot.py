@@ -1,24 +1,89 @@
-from app.infrastructure.domain_events import DomainEventPublisher
+from app.infrastructure.boot_profiler import BootProfiler
+from app.infrastructure.domain_events import DomainEventPublisher, LazySubscriber
 from app.infrastructure.service_injector import ServiceInjector, ServiceRecorder, \
-    YamlServiceFileParser
+    YamlServiceFileParser, CompiledServiceFileParser, LazyService
+from app.infrastructure.simple_bus import ServiceOperationHandler
+from contextlib import nullcontext
+from importlib import import_module
 import logging
+import os
 import sys
+import threading
 
 
 class Boot:
     SERVICE_DEFINITION_DIR = 'app/infrastructure/config/services.yaml'
+    COMPILED_SERVICE_DEFINITION = 'app/infrastructure/config/services.compiled'
+    INDEX_MANAGER = 'app.persistence.mongodb.index_manager'
+    BUS = 'app.application.bus'
+    SUBSCRIBER_OPTIONS = ('workers', 'queue_size', 'backpressure', 'start_method')
+    PROFILE_VARIABLE = 'BOOT_PROFILE'
+    PROFILE_REPORT_VARIABLE = 'BOOT_PROFILE_REPORT'
 
-    def __init__(self):
+    def __init__(self, lazy=True, compiled=True, profile=None, profile_report=None):
+        """
+        :param lazy: If the services are built on their first use, unless their definition
+            declares `lazy: false`. Subscribers are built on their first domain event, except
+            the `process` ones, and the indexes are ensured in a background thread. The
+            outbox and the bus middleware are still built at boot, as they are asked on every
+            operation.
+        :param compiled: If the service definitions are loaded from the compiled file while
+            the definition file does not change
+        :param profile: If the cost of building each service is measured and logged, by
+            default when the `BOOT_PROFILE` environment variable is set. The boot is not lazy
+            while profiling, so every service and index is built before the report
+        :param profile_report: Location of the JSON report of the profile, by default the
+            `BOOT_PROFILE_REPORT` environment variable
+        """
         self.injector = ServiceInjector('default', '1.0')
         self.parser = YamlServiceFileParser()
+        if compiled:
+            self.parser = CompiledServiceFileParser(
+                self.parser,
+                Boot.COMPILED_SERVICE_DEFINITION
+            )
+        if profile is None:
+            profile = os.environ.get(Boot.PROFILE_VARIABLE, '') not in ('', '0')
+        self.lazy = lazy and not profile
+        self.profiler = BootProfiler() if profile else None
+        self.profile_report = profile_report or os.environ.get(Boot.PROFILE_REPORT_VARIABLE)
 
     def start(self):
         self.__setup_logging()
-        recorder = ServiceRecorder(self.injector, self.parser)
-        recorder.record(Boot.SERVICE_DEFINITION_DIR)
-        self.__setup_domain_event_subscribers()
+        if self.profiler is None:
+            self.__start()
+            return
+        self.profiler.start()
+        try:
+            self.__start()
+        finally:
+            self.profiler.stop()
+        logging.info('Boot profile:\n{0}'.format(self.profiler.report()))
+        if self.profile_report:
+            self.profiler.write(self.profile_report)
+
+    def __start(self):
+        recorder = ServiceRecorder(self.injector, self.parser, self.lazy, profiler=self.profiler)
+        with self.__stage('services'):
+            recorder.record(Boot.SERVICE_DEFINITION_DIR)
+        with self.__stage('domain_event_subscribers'):
+            self.__setup_domain_event_subscribers()
+        with self.__stage('bus_handlers'):
+            self.__setup_bus_handlers()
+        if self.lazy:
+            threading.Thread(
+                target=self.__setup_indexes,
+                name='index-setup',
+                daemon=True
+            ).start()
+        else:
+            with self.__stage('indexes'):
+                self.__setup_indexes()
         logging.info(vars(self.injector.service_consumer))
 
+    def __stage(self, name):
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+
     def __setup_logging(self):
         logging.basicConfig(
             format='%(module)s.%(filename)s:%(lineno)d [%(levelname)s] %(message)s',
@@ -29,8 +94,75 @@ class Boot:
     def __setup_domain_event_subscribers(self):
         for (id, service) in self.injector.service_consumer.services.items():
             for tag in service.tags:
+                if tag['name'] == 'domain_event_outbox':
+                    DomainEventPublisher.get_instance().set_outbox(service.instance)
                 if tag['name'] == 'domain_event_sub':
+                    dispatch = tag.get('dispatch', DomainEventPublisher.DISPATCH_SYNC)
                     DomainEventPublisher.get_instance().subscribe(
                         service.identifier,
-                        service.instance
+                        self.__to_subscriber(service, dispatch),
+                        dispatch,
+                        self.__to_classes(tag.get('to_class')),
+                        {
+                            option: tag[option] for option in Boot.SUBSCRIBER_OPTIONS
+                            if option in tag
+                        }
                     )
+
+    def __setup_bus_handlers(self):
+        if not self.injector.is_service(Boot.BUS):
+            return
+        bus = self.injector.get_service(Boot.BUS).instance
+        operation_provider = bus.operation_provider
+        for (id, service) in self.injector.service_consumer.services.items():
+            for tag in service.tags:
+                if tag['name'] == 'bus_middleware':
+                    bus.add_middleware(service.instance)
+                if tag['name'] == 'bus_handler':
+                    for operation_class in self.__to_classes(tag['operation']):
+                        operation_provider.record(
+                            operation_class,
+                            ServiceOperationHandler(service)
+                        )
+
+    @staticmethod
+    def __to_subscriber(service, dispatch) -> object:
+        # A process subscriber is sent to its workers when it is subscribed
+        if isinstance(service, LazyService) and not service.built and \
+                dispatch != DomainEventPublisher.DISPATCH_PROCESS:
+            return LazySubscriber(service)
+        return service.instance
+
+    @staticmethod
+    def __to_classes(class_paths) -> list:
+        if class_paths is None:
+            return []
+        if isinstance(class_paths, str):
+            class_paths = [class_paths]
+        classes = []
+        for class_path in class_paths:
+            (module_name, _, class_name) = class_path.rpartition('.')
+            classes.append(getattr(import_module(module_name), class_name))
+        return classes
+
+    def __setup_indexes(self):
+        if not self.injector.is_service(Boot.INDEX_MANAGER):
+            return
+        index_manager = self.injector.get_service(Boot.INDEX_MANAGER).instance
+        for (id, service) in self.injector.service_consumer.services.items():
+            for tag in service.tags:
+                if tag['name'] != 'mongo_indexes':
+                    continue
+                try:
+                    index_manager.ensure_indexes(service.instance)
+                except Exception:
+                    logging.exception('Indexes of {0} could not be ensured'.format(id))
+
+
+if __name__ == '__main__':
+    PARSER = CompiledServiceFileParser(
+        YamlServiceFileParser(),
+        Boot.COMPILED_SERVICE_DEFINITION
+    )
+    PARSER.set_filepath(Boot.SERVICE_DEFINITION_DIR)
+    PARSER.compile()
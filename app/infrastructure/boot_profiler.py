@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+import json
+import time
+import tracemalloc
+
+
+class BootProfiler:
+    """
+    Records how long each service takes to be imported and constructed, the memory it
+    allocates, and how long each stage of the boot takes. Services should be built one after
+    another while profiling, otherwise their times overlap.
+    """
+
+    def __init__(self):
+        self.services = []
+        self.stages = []
+        self.started_tracing = False
+
+    def start(self) -> None:
+        """
+        Starts tracing the memory allocations
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self) -> None:
+        """
+        Stops tracing the memory allocations, if it was started by the profiler
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def build(self, identifier, get_class, arguments) -> object:
+        """
+        Imports and constructs a service measuring both steps
+
+        :param identifier: Identifier of the service
+        :param get_class: Function without arguments returning the class of the service
+        :param arguments: Arguments of the constructor
+        :return: The instance of the service
+        """
+        memory = BootProfiler.__traced_memory()
+        started = time.perf_counter()
+        service_class = get_class()
+        imported = time.perf_counter()
+        instance = service_class(*arguments)
+        constructed = time.perf_counter()
+        self.services.append({
+            'service': identifier,
+            'import': imported - started,
+            'construction': constructed - imported,
+            'memory': BootProfiler.__traced_memory() - memory
+        })
+        return instance
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measures a stage of the boot, including the services it builds
+
+        :param name: Name of the stage
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({'stage': name, 'time': time.perf_counter() - started})
+
+    def report(self) -> str:
+        """
+        :return: Table of the services sorted by their total time, followed by the stages
+        """
+        lines = ['{0:<60}{1:>12}{2:>14}{3:>12}'.format(
+            'Service', 'import ms', 'construct ms', 'memory KiB'
+        )]
+        for service in sorted(
+                self.services,
+                key=lambda item: item['import'] + item['construction'],
+                reverse=True
+        ):
+            lines.append('{0:<60}{1:>12.2f}{2:>14.2f}{3:>12.1f}'.format(
+                service['service'],
+                service['import'] * 1000,
+                service['construction'] * 1000,
+                service['memory'] / 1024
+            ))
+        lines.append('')
+        lines.append('{0:<60}{1:>12}'.format('Stage', 'ms'))
+        for stage in self.stages:
+            lines.append('{0:<60}{1:>12.2f}'.format(stage['stage'], stage['time'] * 1000))
+        return '\n'.join(lines)
+
+    def write(self, file_location) -> None:
+        """
+        :param file_location: Location of the JSON report
+        """
+        with open(file_location, mode='w') as report_file:
+            json.dump({'services': self.services, 'stages': self.stages}, report_file, indent=2)
+
+    @staticmethod
+    def __traced_memory() -> int:
+        return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
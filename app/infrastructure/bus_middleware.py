@@ -0,0 +1,117 @@
+from importlib import import_module
+import logging
+import time
+
+from app.infrastructure.simple_bus import Middleware
+from app.infrastructure.single_flight import SingleFlight, coalescing_key
+
+
+class TimingMiddleware(Middleware):
+    """
+    Logs how long each operation takes
+    """
+
+    def __init__(self, threshold=0.0):
+        """
+        :param threshold: Seconds an operation has to last to be logged
+        """
+        self.threshold = threshold
+
+    def execute(self, operation, proceed):
+        started = time.perf_counter()
+        try:
+            return proceed(operation)
+        finally:
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold:
+                logging.debug('{0} executed in {1:.2f} ms'.format(
+                    type(operation).__name__,
+                    elapsed * 1000
+                ))
+
+    def execute_batch(self, operations, proceed):
+        started = time.perf_counter()
+        try:
+            return proceed(operations)
+        finally:
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold:
+                logging.debug('{0} {1} executed in {2:.2f} ms'.format(
+                    len(operations),
+                    type(operations[0]).__name__ if operations else 'operations',
+                    elapsed * 1000
+                ))
+
+
+class UnitOfWorkMiddleware(Middleware):
+    """
+    Runs the commands in a unit of work, so their aggregates are written together and their
+    domain events published once the write succeeds
+    """
+
+    def __init__(self, unit_of_work, operation_classes):
+        """
+        :param unit_of_work: The `UnitOfWork`
+        :param operation_classes: The DTO classes of the commands, or their `module.Class`
+            paths, including their subclasses
+        """
+        self.unit_of_work = unit_of_work
+        self.operation_classes = to_classes(operation_classes)
+
+    def applies_to(self, operation_class) -> bool:
+        return issubclass(operation_class, self.operation_classes)
+
+    def execute(self, operation, proceed):
+        with self.unit_of_work:
+            return proceed(operation)
+
+    def execute_batch(self, operations, proceed):
+        # The whole batch is written at once
+        with self.unit_of_work:
+            return proceed(operations)
+
+
+class SingleFlightMiddleware(Middleware):
+    """
+    Coalesces identical concurrent queries, so only one of them reaches the handler and the
+    others share its result. Queries are identical when they have the same class and fields.
+    The shared result must not be modified by the callers.
+    """
+
+    def __init__(self, operation_classes, single_flight=None):
+        """
+        :param operation_classes: The DTO classes of the queries, or their `module.Class`
+            paths, including their subclasses
+        :param single_flight: The `SingleFlight` holding the calls in flight, a new one by default
+        """
+        self.operation_classes = to_classes(operation_classes)
+        self.single_flight = single_flight or SingleFlight()
+
+    def applies_to(self, operation_class) -> bool:
+        return issubclass(operation_class, self.operation_classes)
+
+    def execute(self, operation, proceed):
+        key = coalescing_key(operation)
+        if key is None:
+            return proceed(operation)
+        return self.single_flight.do(key, lambda: proceed(operation))
+
+    def stats(self) -> dict:
+        """
+        :return: The counters of the coalesced queries
+        """
+        return self.single_flight.stats()
+
+
+def to_classes(operation_classes) -> tuple:
+    """
+    :param operation_classes: List of classes or `module.Class` paths
+    :return: The classes
+    """
+    classes = []
+    for operation_class in operation_classes:
+        if isinstance(operation_class, str):
+            (module_name, _, class_name) = operation_class.rpartition('.')
+            operation_class = getattr(import_module(module_name), class_name)
+        classes.append(operation_class)
+    return tuple(classes)
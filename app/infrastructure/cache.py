@@ -0,0 +1,111 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class LruTtlCache:
+    """
+    Thread safe in-memory cache bounded in size and lifetime. When it is full the least recently
+    used entry is evicted, and entries older than `ttl` seconds are never served.
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        """
+        :param max_size: Maximum number of entries
+        :param ttl: Seconds an entry can be served since it was stored
+        :param clock: Function returning the current time in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None) -> object:
+        """
+        :param key: The key of the entry
+        :param default: Value returned when the entry is not cached or has expired
+        :return: The cached value
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            (value, expires_on) = entry
+            if expires_on <= self.clock():
+                del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_or_load(self, key, loader) -> object:
+        """
+        Gets the entry, loading and storing it when it is not cached. A value is not stored
+        when the cache has been invalidated while it was being loaded, because it may be
+        older than the invalidation. `None` values are never stored.
+
+        :param key: The key of the entry
+        :param loader: Function without arguments returning the value of the entry
+        :return: The cached or loaded value
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        generation = self.generation
+        value = loader()
+        if value is not None:
+            self.set(key, value, generation)
+        return value
+
+    def set(self, key, value, generation=None) -> None:
+        """
+        :param key: The key of the entry
+        :param value: The value of the entry
+        :param generation: When given, the entry is only stored if the cache has not been
+            invalidated since the generation was read
+        """
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = (value, self.clock() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key) -> None:
+        """
+        Invalidates an entry
+
+        :param key: The key of the entry
+        """
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Invalidates all the entries
+        """
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: The counters of the cache
+        """
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
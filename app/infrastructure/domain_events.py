@@ -1,5 +1,9 @@
+from collections import deque
 from datetime import datetime
 import logging
+from uuid import uuid4
+
+from app.infrastructure.event_dispatchers import AsyncDispatcher, ProcessPoolDispatcher
 
 
 class DomainEventPublisher:
@@ -8,9 +12,21 @@ class DomainEventPublisher:
     when a domain event is published.
     """
     PUBLISHER_INSTANCE = None
+    DISPATCH_SYNC = 'sync'
+    DISPATCH_OUTBOX = 'outbox'
+    DISPATCH_ASYNC = 'async'
+    DISPATCH_PROCESS = 'process'
+    DISPATCH_MODES = (DISPATCH_SYNC, DISPATCH_OUTBOX, DISPATCH_ASYNC, DISPATCH_PROCESS)
+    MAX_FAILURES = 100
 
     def __init__(self):
         self.subscribers = {}
+        self.classes = {}
+        self.deferred = set()
+        self.executors = {}
+        self.outbox = None
+        self.routes = {}
+        self.failures = deque(maxlen=DomainEventPublisher.MAX_FAILURES)
 
     @staticmethod
     def get_instance() -> object:
@@ -25,19 +41,44 @@ class DomainEventPublisher:
         instance = DomainEventPublisher.PUBLISHER_INSTANCE = DomainEventPublisher()
         return instance
 
-    def subscribe(self, identifier, domain_event_subscriber) -> None:
+    def subscribe(
+            self, identifier, domain_event_subscriber, dispatch=DISPATCH_SYNC, to_classes=None,
+            options=None
+    ) -> None:
         """
         Subscribes a DomainEventSubscriber to the Domain Event
 
         :param identifier: Identifier of the subscriber
         :param domain_event_subscriber: The domain event subscriber instance
-        :raises SubscriberAlreadyExist, NotADomainEventSubscriber
+        :param dispatch: `sync` to be notified when the event is published, `outbox` to be
+            notified by the `OutboxDispatcher` once the event has been stored in the outbox,
+            `async` to be notified in worker threads, or `process` to be notified in worker
+            processes
+        :param to_classes: The `DomainEvent` classes the subscriber is subscribed to, including
+            their subclasses. Without them `is_subscribed_to` is asked for every event.
+        :param options: Arguments of the `AsyncDispatcher` of an `async` subscriber, or of the
+            `ProcessPoolDispatcher` of a `process` subscriber
+        :raises SubscriberAlreadyExist, NotADomainEventSubscriber, UnknownDispatchMode,
+            SubscriberCannotBePickled
         """
         if identifier in self.subscribers:
             raise SubscriberAlreadyExist
         if not isinstance(domain_event_subscriber, DomainEventSubscriber):
             raise NotADomainEventSubscriber
+        if dispatch not in DomainEventPublisher.DISPATCH_MODES:
+            raise UnknownDispatchMode
         self.subscribers[identifier] = domain_event_subscriber
+        if to_classes:
+            self.classes[identifier] = tuple(to_classes)
+        if dispatch == DomainEventPublisher.DISPATCH_OUTBOX:
+            self.deferred.add(identifier)
+        if dispatch == DomainEventPublisher.DISPATCH_ASYNC:
+            self.executors[identifier] = AsyncDispatcher(identifier, **(options or {}))
+        if dispatch == DomainEventPublisher.DISPATCH_PROCESS:
+            self.executors[identifier] = ProcessPoolDispatcher(
+                identifier, domain_event_subscriber, self.report_failure, **(options or {})
+            )
+        self.routes = {}
         logging.debug(
             'Service {0} has subscribed to {1}'.format(
                 type(domain_event_subscriber).__name__,
@@ -55,33 +96,279 @@ class DomainEventPublisher:
         if identifier not in self.subscribers:
             raise SubscriberDoesNotExist
         del self.subscribers[identifier]
-        logging.debug('Service {0} has unsubscribed', identifier)
+        self.classes.pop(identifier, None)
+        self.deferred.discard(identifier)
+        executor = self.executors.pop(identifier, None)
+        if executor is not None:
+            executor.shutdown()
+        self.routes = {}
+        logging.debug('Service {0} has unsubscribed'.format(identifier))
+
+    def set_outbox(self, outbox) -> None:
+        """
+        Stores the published domain events in an outbox, so the subscribers subscribed with the
+        `outbox` dispatch mode are notified by an `OutboxDispatcher` instead of the publisher
+
+        :param outbox: A `DomainEventOutbox`
+        """
+        self.outbox = outbox
+        self.routes = {}
+
+    def deferred_events(self, domain_events) -> list:
+        """
+        :param domain_events: List of `DomainEvent`
+        :return: The domain events that have to be stored in the outbox, those a deferred
+            subscriber may be subscribed to
+        """
+        if self.outbox is None:
+            return []
+        return [event for event in domain_events if self.__routes(type(event))[1]]
 
     def publish(self, domain_event) -> None:
         """
-        Notifies about a `domain_event` to all subscribers
+        Notifies about a `domain_event` to all subscribers, storing it in the outbox for the
+        deferred ones
+
+        :param domain_event: DomainEventSubscriber
+        """
+        if self.deferred_events([domain_event]):
+            self.outbox.store([domain_event])
+        self.dispatch(domain_event)
+
+    def publish_batch(self, domain_events) -> None:
+        """
+        Notifies about several domain events at once, storing them in the outbox for the
+        deferred subscribers. Each subscriber receives the events it is subscribed to in a
+        single `handle_batch` call.
+
+        :param domain_events: List of `DomainEvent` in the order they were recorded
+        """
+        if not domain_events:
+            return
+        deferred = self.deferred_events(domain_events)
+        if deferred:
+            self.outbox.store(deferred)
+        self.dispatch_batch(domain_events)
+
+    def dispatch(self, domain_event) -> None:
+        """
+        Notifies about a `domain_event` that has already been stored in the outbox. Deferred
+        subscribers are only notified when there is no outbox.
 
         :param domain_event: DomainEventSubscriber
         """
-        for item in self.subscribers.values():
-            if item.is_subscribed_to(domain_event):
-                item.handle(domain_event)
-                logging.debug(
-                    'Notify to service {0} about {1} published'.format(
-                        type(item).__name__,
-                        type(domain_event).__name__
-                    )
+        for (_, item, checked, executor) in self.__routes(type(domain_event))[0]:
+            self.__notify(item, checked, executor, domain_event)
+
+    def dispatch_batch(self, domain_events) -> None:
+        """
+        Notifies about several domain events that have already been stored in the outbox,
+        grouped by subscriber
+
+        :param domain_events: List of `DomainEvent` in the order they were recorded
+        """
+        batches = {}
+        for domain_event in domain_events:
+            for (_, item, checked, executor) in self.__routes(type(domain_event))[0]:
+                if checked and not item.is_subscribed_to(domain_event):
+                    continue
+                if id(item) not in batches:
+                    batches[id(item)] = (item, executor, [])
+                batches[id(item)][2].append(domain_event)
+        for (item, executor, batch) in batches.values():
+            if executor is not None:
+                executor.notify_batch(item, batch)
+            else:
+                item.handle_batch(batch)
+            logging.debug(
+                'Notify to service {0} about {1} events published'.format(
+                    type(item).__name__,
+                    len(batch)
                 )
+            )
+
+    def deliver(self, domain_event, delivered_to=()) -> tuple:
+        """
+        Notifies about a `domain_event` read from the outbox to the deferred subscribers that
+        have not received it yet. A failing subscriber does not prevent the others from being
+        notified.
+
+        :param domain_event: DomainEventSubscriber
+        :param delivered_to: Identifiers of the subscribers that already received the event
+        :return: The identifiers of the subscribers that have received the event, including
+            `delivered_to`, and the first exception raised by a subscriber, or None
+        """
+        delivered_to = set(delivered_to)
+        error = None
+        for (identifier, item, checked, executor) in self.__routes(type(domain_event))[1]:
+            if identifier in delivered_to:
+                continue
+            try:
+                self.__notify(item, checked, executor, domain_event)
+            except Exception as subscriber_error:
+                logging.exception('Subscriber {0} failed handling {1}'.format(
+                    identifier,
+                    type(domain_event).__name__
+                ))
+                error = error or subscriber_error
+                continue
+            delivered_to.add(identifier)
+        return delivered_to, error
+
+    def deliver_batch(self, records) -> dict:
+        """
+        Notifies about several domain events read from the outbox to the deferred subscribers
+        that have not received them yet. Each subscriber receives its events in a single
+        `handle_batch` call; when it fails, all its events of the batch are failed for it.
+
+        :param records: List of (identifier, `DomainEvent`, identifiers of the subscribers that
+            already received the event) in the order they were stored
+        :return: Dictionary from the identifier of each record to the identifiers of the
+            subscribers that have received the event, and the first exception raised by a
+            subscriber, or None
+        """
+        delivered = {key: set(delivered_to) for (key, _, delivered_to) in records}
+        errors = {}
+        batches = {}
+        for (key, domain_event, _) in records:
+            for (identifier, item, checked, executor) in self.__routes(type(domain_event))[1]:
+                if identifier in delivered[key]:
+                    continue
+                if checked and not item.is_subscribed_to(domain_event):
+                    delivered[key].add(identifier)
+                    continue
+                if identifier not in batches:
+                    batches[identifier] = (item, executor, [])
+                batches[identifier][2].append((key, domain_event))
+        for (identifier, (item, executor, entries)) in batches.items():
+            batch = [domain_event for (_, domain_event) in entries]
+            try:
+                if executor is not None:
+                    executor.notify_batch(item, batch)
+                else:
+                    item.handle_batch(batch)
+            except Exception as error:
+                logging.exception('Subscriber {0} failed handling {1} events'.format(
+                    identifier,
+                    len(batch)
+                ))
+                for (key, _) in entries:
+                    errors.setdefault(key, error)
+                continue
+            for (key, _) in entries:
+                delivered[key].add(identifier)
+        return {key: (delivered[key], errors.get(key)) for key in delivered}
+
+    def report_failure(self, identifier, domain_event, error) -> None:
+        """
+        Records a notification that failed out of the publishing thread. The last failures are
+        kept in `failures`.
+
+        :param identifier: Identifier of the subscriber
+        :param domain_event: The `DomainEvent` the subscriber was notified about, or the list of
+            events of a batch
+        :param error: The exception raised by the subscriber
+        """
+        self.failures.append(SubscriberFailed(identifier, domain_event, error))
+        logging.error(
+            'Subscriber {0} failed handling {1}: {2!r}'.format(
+                identifier,
+                type(domain_event).__name__,
+                error
+            )
+        )
+
+    def drain(self, timeout=None) -> bool:
+        """
+        Waits until the asynchronous subscribers have handled all the published events
+
+        :param timeout: Maximum seconds to wait for each subscriber, or None to wait forever
+        :return: If all events were handled before the timeout
+        """
+        drained = True
+        for executor in list(self.executors.values()):
+            drained = executor.drain(timeout) and drained
+        return drained
+
+    def shutdown(self, timeout=None) -> None:
+        """
+        Stops the workers of the asynchronous subscribers once they handle the published events
+
+        :param timeout: Maximum seconds to wait for each worker
+        """
+        for executor in list(self.executors.values()):
+            executor.shutdown(timeout)
+
+    def __routes(self, event_type) -> tuple:
+        # Subscribers are resolved once per concrete event type, then publishing is a lookup
+        routes = self.routes.get(event_type)
+        if routes is None:
+            routes = self.routes[event_type] = self.__resolve_routes(event_type)
+        return routes
+
+    def __resolve_routes(self, event_type) -> tuple:
+        hierarchy = set(event_type.__mro__)
+        immediate = []
+        deferred = []
+        for (identifier, item) in self.subscribers.items():
+            classes = self.classes.get(identifier)
+            if classes is not None and hierarchy.isdisjoint(classes):
+                continue
+            # Subscribers without declared classes are checked on every event
+            route = (identifier, item, classes is None, self.executors.get(identifier))
+            if identifier in self.deferred:
+                deferred.append(route)
+                if self.outbox is not None:
+                    continue
+            immediate.append(route)
+        return immediate, deferred
+
+    @staticmethod
+    def __notify(item, checked, executor, domain_event) -> None:
+        if checked and not item.is_subscribed_to(domain_event):
+            return
+        if executor is not None:
+            executor.notify(item, domain_event)
+        else:
+            item.handle(domain_event)
+        logging.debug(
+            'Notify to service {0} about {1} published'.format(
+                type(item).__name__,
+                type(domain_event).__name__
+            )
+        )
 
 
 class DomainRoot:
     """
-    The domain root class has to implement this to publish domain events.
+    The domain root class has to implement this to publish domain events. The event buffer is
+    only allocated when an event is published, so aggregates hydrated by read paths stay small.
     """
+    __slots__ = ('_events', '_domain_event_publisher')
+    NO_EVENTS = ()
 
     def __init__(self):
-        self.events = []
-        self.domain_event_publisher = DomainEventPublisher.get_instance()
+        self._events = None
+        self._domain_event_publisher = None
+
+    @property
+    def events(self) -> list:
+        """
+        :return: The events recorded and not released yet
+        """
+        return self._events if self._events is not None else DomainRoot.NO_EVENTS
+
+    @property
+    def domain_event_publisher(self) -> DomainEventPublisher:
+        """
+        :return: The `DomainEventPublisher` of the aggregate, the singleton by default
+        """
+        publisher = self._domain_event_publisher
+        return publisher if publisher is not None else DomainEventPublisher.get_instance()
+
+    @domain_event_publisher.setter
+    def domain_event_publisher(self, publisher) -> None:
+        self._domain_event_publisher = publisher
 
     def publish(self, domain_event) -> None:
         """
@@ -89,33 +376,46 @@ class DomainRoot:
 
         :param domain_event:
         """
-        self.events.append(domain_event)
+        if self._events is None:
+            self._events = []
+        self._events.append(domain_event)
         logging.debug('Event {0} registered'.format(type(domain_event).__name__))
 
     def release(self) -> None:
         """
         Launch all events that have been recorded
         """
-        for event in self.events:
-            self.domain_event_publisher.publish(event)
-        logging.debug('{0} registered events have been published'.format(len(self.events)))
+        if not self._events:
+            return
+        self.domain_event_publisher.publish_batch(list(self._events))
+        logging.debug('{0} registered events have been published'.format(len(self._events)))
         self.clear()
 
     def clear(self) -> None:
         """
         Remove all recorded events
         """
-        self.events.clear()
-        logging.debug('Stored events have been cleared')
+        if self._events:
+            self._events.clear()
+            logging.debug('Stored events have been cleared')
 
 
 class DomainEvent:
     """
     Template for a domain event
     """
+    __slots__ = ('_occurred_on', '_domain_event_id')
 
     def __init__(self):
         self._occurred_on = datetime.now()
+        self._domain_event_id = uuid4().hex
+
+    @property
+    def domain_event_id(self) -> str:
+        """
+        :return: Identifier of the domain event, kept when it is stored and delivered again
+        """
+        return self._domain_event_id
 
     @property
     def occurred_on(self) -> datetime:
@@ -125,6 +425,75 @@ class DomainEvent:
         return self._occurred_on
 
 
+class ValueObject:
+    """
+    Template for an immutable value object. Subclasses declare their fields in `__slots__`
+    and assign them with `object.__setattr__` in their constructor. Value objects with the same
+    fields are equal and have the same hash.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise ValueObjectIsImmutable(name)
+
+    def __delattr__(self, name):
+        raise ValueObjectIsImmutable(name)
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.__values() == other.__values()
+
+    def __hash__(self) -> int:
+        return hash((type(self), self.__values()))
+
+    def __reduce__(self) -> tuple:
+        # Rebuilt with the constructor, as the fields cannot be set once the object exists
+        return type(self), self.__values()
+
+    def __repr__(self) -> str:
+        return '{0}({1})'.format(type(self).__name__, ', '.join(map(repr, self.__values())))
+
+    def __values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+class DomainEventOutbox:
+    """
+    Template for a storage of the domain events that have not been delivered yet
+    """
+
+    def store(self, domain_events) -> None:
+        """
+        :param domain_events: List of `DomainEvent` to be delivered later
+        """
+        raise NotImplementedError
+
+    def claim(self, limit) -> list:
+        """
+        Claims pending domain events for a while, so no other dispatcher delivers them until
+        they are marked or the claim expires
+
+        :param limit: Maximum number of domain events
+        :return: List of (identifier, `DomainEvent`, identifiers of the subscribers that already
+            received the event) in the order they were stored
+        """
+        raise NotImplementedError
+
+    def mark_delivered(self, identifiers) -> None:
+        """
+        :param identifiers: Identifiers of the domain events that have been delivered
+        """
+        raise NotImplementedError
+
+    def mark_failed(self, identifier, error, delivered_to=()) -> None:
+        """
+        :param identifier: Identifier of the domain event that could not be delivered
+        :param error: The exception raised by the subscriber
+        :param delivered_to: Identifiers of the subscribers that received the event, they are
+            not notified again when it is retried
+        """
+        raise NotImplementedError
+
+
 class DomainEventSubscriber:
     """
     Template for a service subscribed to a domain event
@@ -147,6 +516,51 @@ class DomainEventSubscriber:
         """
         raise NotImplementedError
 
+    def handle_batch(self, domain_events) -> None:
+        """
+        Executes the action for several events published together. Subscribers that can
+        handle them at once, for instance with a bulk write, should override it.
+
+        :param domain_events: List of the events the subscriber is subscribed to, in the order
+            they were published
+        """
+        for domain_event in domain_events:
+            self.handle(domain_event)
+
+
+class LazySubscriber(DomainEventSubscriber):
+    """
+    Stands for a subscriber that is built on its first domain event, so subscribing it does not
+    build it nor its dependencies. It cannot be used by `process` subscribers, which send the
+    subscriber to their workers when they are subscribed.
+    """
+
+    def __init__(self, service):
+        """
+        :param service: Object building the subscriber on the first access to its `instance`
+        """
+        self.service = service
+
+    @property
+    def subscriber(self) -> DomainEventSubscriber:
+        """
+        :return: The subscriber, built on the first call
+        :raises NotADomainEventSubscriber:
+        """
+        subscriber = self.service.instance
+        if not isinstance(subscriber, DomainEventSubscriber):
+            raise NotADomainEventSubscriber
+        return subscriber
+
+    def is_subscribed_to(self, domain_event) -> bool:
+        return self.subscriber.is_subscribed_to(domain_event)
+
+    def handle(self, domain_event) -> None:
+        self.subscriber.handle(domain_event)
+
+    def handle_batch(self, domain_events) -> None:
+        self.subscriber.handle_batch(domain_events)
+
 
 class SubscriberAlreadyExist(Exception):
     """
@@ -164,3 +578,27 @@ class NotADomainEventSubscriber(Exception):
     """
     A subscriber does not implement DomainEventSubscriber contract
     """
+
+
+class SubscriberFailed(Exception):
+    """
+    A subscriber notified out of the publishing thread has failed handling a domain event
+    """
+
+    def __init__(self, identifier, domain_event, error):
+        super().__init__(identifier, domain_event, error)
+        self.identifier = identifier
+        self.domain_event = domain_event
+        self.error = error
+
+
+class ValueObjectIsImmutable(AttributeError):
+    """
+    A field of a value object cannot be modified
+    """
+
+
+class UnknownDispatchMode(Exception):
+    """
+    A subscriber has requested a dispatch mode that is not supported
+    """
@@ -0,0 +1,297 @@
+from concurrent.futures import ProcessPoolExecutor, wait
+from functools import partial
+import logging
+from multiprocessing import get_context
+import pickle
+import queue
+import threading
+import time
+
+
+class AsyncDispatcher:
+    """
+    Runs the notifications of a subscriber in a pool of worker threads. Each worker has its own
+    bounded queue, and the notifications with the same ordering key always go to the same
+    worker, so they are handled in the order they were submitted.
+    """
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop_oldest'
+    CALLER_RUNS = 'caller_runs'
+    BACKPRESSURE_POLICIES = (BLOCK, DROP_OLDEST, CALLER_RUNS)
+    STOP = object()
+
+    def __init__(self, name, workers=2, queue_size=1000, backpressure=BLOCK):
+        """
+        :param name: Name of the worker threads
+        :param workers: Number of worker threads
+        :param queue_size: Maximum number of notifications waiting in each worker
+        :param backpressure: What happens when the queue of a worker is full: `block` waits
+            for room, `drop_oldest` discards the oldest waiting notification, and `caller_runs`
+            handles the notification in the publishing thread, out of order
+        :raises UnknownBackpressurePolicy:
+        """
+        if backpressure not in AsyncDispatcher.BACKPRESSURE_POLICIES:
+            raise UnknownBackpressurePolicy
+        self.name = name
+        self.backpressure = backpressure
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.queues = [queue.Queue(queue_size) for _ in range(workers)]
+        self.threads = [
+            threading.Thread(
+                target=self.__work,
+                args=(work_queue,),
+                name='{0}-{1}'.format(name, index),
+                daemon=True
+            ) for (index, work_queue) in enumerate(self.queues)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, key, task) -> None:
+        """
+        :param key: Notifications with the same key are handled in order
+        :param task: Function without arguments to run in a worker
+        """
+        work_queue = self.queues[hash(key) % len(self.queues)]
+        if self.backpressure == AsyncDispatcher.BLOCK:
+            work_queue.put(task)
+            return
+        while True:
+            try:
+                work_queue.put_nowait(task)
+                return
+            except queue.Full:
+                if self.backpressure == AsyncDispatcher.CALLER_RUNS:
+                    self.__run(task)
+                    return
+            try:
+                work_queue.get_nowait()
+                work_queue.task_done()
+                with self.lock:
+                    self.dropped += 1
+                logging.warning('Notification dropped, the subscriber is not keeping up')
+            except queue.Empty:
+                pass
+
+    def notify(self, subscriber, domain_event) -> None:
+        """
+        :param subscriber: The `DomainEventSubscriber` to notify
+        :param domain_event: The published `DomainEvent`, ordered by its aggregate
+        """
+        self.submit(ordering_key(domain_event), lambda: subscriber.handle(domain_event))
+
+    def notify_batch(self, subscriber, domain_events) -> None:
+        """
+        :param subscriber: The `DomainEventSubscriber` to notify
+        :param domain_events: The published `DomainEvent` list, split in one batch per aggregate
+            so each batch keeps the order of its aggregate
+        """
+        batches = {}
+        for domain_event in domain_events:
+            batches.setdefault(ordering_key(domain_event), []).append(domain_event)
+        for (key, batch) in batches.items():
+            self.submit(key, lambda batch=batch: subscriber.handle_batch(batch))
+
+    def drain(self, timeout=None) -> bool:
+        """
+        Waits until all the submitted notifications have been handled
+
+        :param timeout: Maximum seconds to wait, or None to wait forever
+        :return: If all notifications were handled before the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for work_queue in self.queues:
+            with work_queue.all_tasks_done:
+                while work_queue.unfinished_tasks:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    work_queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=None) -> None:
+        """
+        Handles the waiting notifications and stops the workers. Workers that do not finish in
+        time are left running, they are daemon threads.
+
+        :param timeout: Maximum seconds to wait for all the workers, or None to wait forever
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for work_queue in self.queues:
+            try:
+                work_queue.put(AsyncDispatcher.STOP, timeout=AsyncDispatcher.__remaining(deadline))
+            except queue.Full:
+                logging.warning('A worker of {0} is still busy and has not been stopped'.format(
+                    self.name
+                ))
+        for thread in self.threads:
+            thread.join(AsyncDispatcher.__remaining(deadline))
+
+    @staticmethod
+    def __remaining(deadline) -> float:
+        return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+    def __work(self, work_queue) -> None:
+        while True:
+            task = work_queue.get()
+            try:
+                if task is AsyncDispatcher.STOP:
+                    return
+                self.__run(task)
+            finally:
+                work_queue.task_done()
+
+    @staticmethod
+    def __run(task) -> None:
+        try:
+            task()
+        except Exception:
+            logging.exception('Asynchronous domain event subscriber failed')
+
+
+class ProcessPoolDispatcher:
+    """
+    Runs the notifications of a CPU bound subscriber in a pool of worker processes. The pool is
+    started on the first notification and reused. The subscriber is sent once to each worker,
+    so it must be picklable, and the events are sent pickled. Notifications are not ordered.
+    """
+
+    def __init__(self, identifier, subscriber, on_failure, workers=None, start_method='spawn'):
+        """
+        :param identifier: Identifier of the subscriber
+        :param subscriber: The `DomainEventSubscriber`
+        :param on_failure: Function called with the identifier of the subscriber, the event, or
+            the list of events of a batch, and the exception when a notification fails
+        :param workers: Number of worker processes, the number of CPUs by default
+        :param start_method: How the worker processes are started, `spawn` is safe for
+            applications running threads
+        :raises SubscriberCannotBePickled:
+        """
+        # Pickled once, when it is subscribed, so an unpicklable subscriber fails at boot
+        # instead of on the first event
+        try:
+            self.payload = pickle.dumps(subscriber, pickle.HIGHEST_PROTOCOL)
+        except Exception as error:
+            raise SubscriberCannotBePickled('{0}: {1!r}'.format(identifier, error)) from error
+        self.identifier = identifier
+        self.subscriber = subscriber
+        self.on_failure = on_failure
+        self.workers = workers
+        self.start_method = start_method
+        self.pool = None
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def submit(self, domain_event) -> None:
+        """
+        :param domain_event: The `DomainEvent` to handle in a worker process
+        """
+        self.__submit(_handle_in_worker, domain_event)
+
+    def submit_batch(self, domain_events) -> None:
+        """
+        :param domain_events: The `DomainEvent` list to handle in one call of a worker process
+        """
+        self.__submit(_handle_batch_in_worker, domain_events)
+
+    def notify(self, subscriber, domain_event) -> None:
+        """
+        :param subscriber: Ignored, the workers have their own copy of the subscriber
+        :param domain_event: The published `DomainEvent`
+        """
+        self.submit(domain_event)
+
+    def notify_batch(self, subscriber, domain_events) -> None:
+        """
+        :param subscriber: Ignored, the workers have their own copy of the subscriber
+        :param domain_events: The published `DomainEvent` list
+        """
+        self.submit_batch(domain_events)
+
+    def drain(self, timeout=None) -> bool:
+        """
+        Waits until all the submitted notifications have been handled
+
+        :param timeout: Maximum seconds to wait, or None to wait forever
+        :return: If all notifications were handled before the timeout
+        """
+        with self.lock:
+            pending = list(self.pending)
+        return not wait(pending, timeout).not_done
+
+    def shutdown(self, timeout=None) -> None:
+        """
+        Handles the waiting notifications and stops the worker processes
+
+        :param timeout: Maximum seconds to wait for the notifications
+        """
+        self.drain(timeout)
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def __submit(self, function, payload) -> None:
+        future = self.__get_pool().submit(
+            function, self.identifier, pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+        )
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(partial(self.__done, payload))
+
+    def __get_pool(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=get_context(self.start_method),
+                    initializer=_install_subscriber,
+                    initargs=(self.identifier, self.payload)
+                )
+            return self.pool
+
+    def __done(self, payload, future) -> None:
+        with self.lock:
+            self.pending.discard(future)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.on_failure(self.identifier, payload, error)
+
+
+_WORKER_SUBSCRIBERS = {}
+
+
+def _install_subscriber(identifier, payload) -> None:
+    _WORKER_SUBSCRIBERS[identifier] = pickle.loads(payload)
+
+
+def _handle_in_worker(identifier, payload) -> None:
+    _WORKER_SUBSCRIBERS[identifier].handle(pickle.loads(payload))
+
+
+def _handle_batch_in_worker(identifier, payload) -> None:
+    _WORKER_SUBSCRIBERS[identifier].handle_batch(pickle.loads(payload))
+
+
+def ordering_key(domain_event) -> str:
+    """
+    :param domain_event: A `DomainEvent`
+    :return: The identifier of the aggregate that published the event
+    """
+    identifier = getattr(domain_event, 'identifier', None)
+    return str(getattr(identifier, 'identifier', identifier))
+
+
+class UnknownBackpressurePolicy(Exception):
+    """
+    An asynchronous subscriber has requested a backpressure policy that is not supported
+    """
+
+
+class SubscriberCannotBePickled(Exception):
+    """
+    A subscriber notified in worker processes has to be picklable
+    """
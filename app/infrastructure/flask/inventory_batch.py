@@ -0,0 +1,102 @@
+import logging
+from typing import Generator
+from uuid import uuid4
+
+from app.application.persist_inventory import PersistInventoryCommand
+from app.domain.model.Inventory import InventoryAmountInvalid
+
+
+class InventoryBatchIngestion:
+    """
+    Stores the rows of a bulk inventory request in chunks. Each chunk is executed on the bus
+    with a single `execute_batch`, so its inventory is written with one bulk write, and the
+    result of its rows is yielded as soon as it is known.
+
+    A chunk that fails may have been partially stored: without transactions the inventory can
+    be written before the outbox fails. Inventory is stored once per event and seller, so
+    sending the failed rows again is safe.
+    """
+    BATCH_SIZE = 500
+    REQUIRED_FIELDS = ('event_id', 'amount', 'seller_name')
+
+    def __init__(self, bus, batch_size=BATCH_SIZE):
+        """
+        :param bus: The `SimpleBus` executing the `PersistInventoryCommand`
+        :param batch_size: Number of rows stored together
+        """
+        self.bus = bus
+        self.batch_size = batch_size
+
+    def ingest(self, documents) -> Generator:
+        """
+        :param documents: Iterable of (document, reason it cannot be read or None), as yielded
+            by `iter_json_documents`
+        :return: A generator of the result of each row, followed by a summary of all of them
+        """
+        summary = {'rows': 0, 'done': 0, 'failed': 0}
+        pending = []
+        for (row, (document, reason)) in enumerate(documents):
+            summary['rows'] += 1
+            command = None
+            if reason is None:
+                (command, reason) = InventoryBatchIngestion.__to_command(document)
+            if command is None:
+                summary['failed'] += 1
+                yield {'row': row, 'response': 'failed', 'reason': reason}
+                continue
+            pending.append((row, command))
+            if len(pending) == self.batch_size:
+                yield from self.__store(pending, summary)
+                pending = []
+        yield from self.__store(pending, summary)
+        yield {'summary': summary}
+
+    def __store(self, pending, summary) -> Generator:
+        if not pending:
+            return
+        try:
+            identifiers = self.bus.execute_batch([command for (_, command) in pending])
+        except Exception:
+            logging.exception('Batch of inventory could not be stored')
+            summary['failed'] += len(pending)
+            for (row, _) in pending:
+                yield {'row': row, 'response': 'failed', 'reason': 'may be partially stored'}
+            return
+        summary['done'] += len(pending)
+        for ((row, _), identifier) in zip(pending, identifiers):
+            yield {'row': row, 'response': 'done', 'id': identifier}
+
+    @staticmethod
+    def __to_command(document) -> tuple:
+        if not isinstance(document, dict) or not all(
+            field in document for field in InventoryBatchIngestion.REQUIRED_FIELDS
+        ):
+            return None, 'field missing'
+        try:
+            amount = to_amount(document['amount'])
+        except InventoryAmountInvalid:
+            return None, 'invalid amount'
+        return PersistInventoryCommand(
+            uuid4(),
+            str(document['event_id']),
+            amount,
+            str(document['seller_name'])
+        ), None
+
+
+def to_amount(value) -> int:
+    """
+    Form fields are strings and JSON amounts numbers, the domain only accepts integer amounts
+
+    :param value: The amount received
+    :return: The amount as an integer
+    :raises InventoryAmountInvalid:
+    """
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            raise InventoryAmountInvalid
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise InventoryAmountInvalid
+    return value
@@ -0,0 +1,171 @@
+import codecs
+import json
+
+from flask import Response, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+CHUNK_SIZE = 64 * 1024
+MAX_DOCUMENT_SIZE = 64 * 1024
+
+
+def wants_ndjson(request) -> bool:
+    """
+    :param request: The Flask request
+    :return: If the client asked for a NDJSON stream, with `?stream=1` or the `Accept` header
+    """
+    if request.args.get('stream') == '1':
+        return True
+    return request.accept_mimetypes.best_match(
+        ['application/json', NDJSON_MIMETYPE]
+    ) == NDJSON_MIMETYPE
+
+
+def ndjson_response(records) -> Response:
+    """
+    Streams the records as they are produced, one JSON document per line
+
+    :param records: An iterable of serializable records, usually a generator over a cursor
+    :return: A streamed Flask response
+    """
+    return Response(stream_with_context(_to_chunks(records)), mimetype=NDJSON_MIMETYPE)
+
+
+def _to_chunks(records):
+    # The first record is sent alone so the client starts receiving data right away, the
+    # following ones are grouped to avoid a write per record
+    chunk = []
+    size = CHUNK_SIZE
+    for record in records:
+        line = json.dumps(record, default=str) + '\n'
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def iter_json_documents(stream, max_document_size=MAX_DOCUMENT_SIZE):
+    """
+    Parses a JSON array, or NDJSON documents, while the body is read, so it is never whole in
+    memory. A NDJSON line that is not valid is reported and skipped; an array is not parsed
+    past an element that is not valid, because the next one cannot be told apart.
+
+    :param stream: The binary stream of the body, such as `request.stream`
+    :param max_document_size: Maximum number of characters of each document
+    :return: Generator of `(document, None)`, or `(None, reason)` for a document that is
+        not valid
+    """
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if not first:
+        return
+    if first == b'[':
+        yield from _iter_array(stream, max_document_size)
+        return
+    line = _read_line(stream, max_document_size, first)
+    while line is not None:
+        if line.strip():
+            yield _parse_line(line, max_document_size)
+        line = _read_line(stream, max_document_size)
+
+
+def _read_line(stream, max_document_size, start=b''):
+    # Longer lines are cut, and rejected as too large when they are parsed
+    line = start + stream.readline(max_document_size + 1 - len(start))
+    if not line:
+        return None
+    if len(line) > max_document_size and not line.endswith(b'\n'):
+        while True:
+            rest = stream.readline(CHUNK_SIZE)
+            if not rest or rest.endswith(b'\n'):
+                break
+    return line.decode('utf-8', 'replace')
+
+
+def _parse_line(line, max_document_size):
+    if len(line.rstrip('\r\n')) > max_document_size:
+        return None, 'document too large'
+    try:
+        return json.loads(line), None
+    except ValueError as error:
+        return None, 'invalid JSON: {0}'.format(error)
+
+
+def _iter_array(stream, max_document_size):
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    buffer = ''
+    position = 0
+    finished = False
+    expect_value = True
+    empty = True
+    while True:
+        # Skips whitespace and separators, reading more of the body when needed
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+        if position == len(buffer):
+            if finished:
+                yield None, 'unterminated array'
+                return
+            data = stream.read(CHUNK_SIZE)
+            finished = not data
+            buffer = buffer[position:] + text_decoder.decode(data, finished)
+            position = 0
+            continue
+        if not expect_value:
+            if buffer[position] == ']':
+                if not _is_blank(buffer[position + 1:], stream, text_decoder):
+                    yield None, 'invalid JSON: data after the array'
+                return
+            if buffer[position] != ',':
+                yield None, 'invalid JSON: expected , or ]'
+                return
+            position += 1
+            expect_value = True
+            continue
+        if buffer[position] == ']':
+            if not empty:
+                yield None, 'invalid JSON: expected a value after ,'
+            elif not _is_blank(buffer[position + 1:], stream, text_decoder):
+                yield None, 'invalid JSON: data after the array'
+            return
+        try:
+            (document, end) = decoder.raw_decode(buffer, position)
+            # A number at the end of the buffer may continue in the next read
+            complete = end < len(buffer) or finished
+        except ValueError as error:
+            (document, end, complete) = (None, None, False)
+            if finished:
+                yield None, 'invalid JSON: {0}'.format(error)
+                return
+            if len(buffer) - position > max_document_size:
+                yield None, 'document too large'
+                return
+        if end is not None and end - position > max_document_size:
+            yield None, 'document too large'
+            return
+        if complete:
+            yield document, None
+            position = end
+            expect_value = False
+            empty = False
+            continue
+        data = stream.read(CHUNK_SIZE)
+        finished = not data
+        buffer = buffer[position:] + text_decoder.decode(data, finished)
+        position = 0
+
+
+def _is_blank(rest, stream, text_decoder) -> bool:
+    # Only whitespace may follow the array, the rest of the body is read to check it
+    while True:
+        if rest.strip(' \t\r\n'):
+            return False
+        data = stream.read(CHUNK_SIZE)
+        if not data:
+            return not text_decoder.decode(b'', True).strip(' \t\r\n')
+        rest = text_decoder.decode(data)
@@ -0,0 +1,95 @@
+"""
+Delivers the domain events stored in the outbox. It can run as a thread of the application, or
+in its own process with `python -m app.infrastructure.outbox_dispatcher`
+"""
+import logging
+import threading
+
+from app.infrastructure.domain_events import DomainEventPublisher
+
+
+class OutboxDispatcher:
+    """
+    Drains the outbox in batches, notifying the deferred subscribers of the
+    `DomainEventPublisher` and marking the events they have received as delivered.
+    Delivery is at least once: an event is delivered again if the dispatcher stops before
+    marking it. Each batch is claimed, so several dispatchers can drain the same outbox.
+    """
+
+    def __init__(self, outbox, batch_size, interval, publisher=None):
+        """
+        :param outbox: The `DomainEventOutbox` to drain
+        :param batch_size: Maximum number of events read on each round trip
+        :param interval: Seconds to wait when the outbox is empty
+        :param publisher: The `DomainEventPublisher`, the singleton by default
+        """
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.interval = interval
+        self.publisher = publisher
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def dispatch_pending(self) -> int:
+        """
+        Delivers one batch of pending events, each subscriber receives its events of the batch
+        in a single `handle_batch` call. When a subscriber fails its events are kept in the
+        outbox to be retried, only for the subscribers that have not received them.
+
+        :return: Number of events delivered
+        """
+        publisher = self.publisher or DomainEventPublisher.get_instance()
+        claimed = self.outbox.claim(self.batch_size)
+        if not claimed:
+            return 0
+        results = publisher.deliver_batch(claimed)
+        delivered = []
+        for (identifier, _, _) in claimed:
+            (delivered_to, error) = results[identifier]
+            if error is not None:
+                logging.error('Outbox event {0} could not be delivered'.format(identifier))
+                self.outbox.mark_failed(identifier, error, delivered_to)
+                continue
+            delivered.append(identifier)
+        self.outbox.mark_delivered(delivered)
+        return len(delivered)
+
+    def run(self) -> None:
+        """
+        Delivers the pending events until `stop` is called
+        """
+        logging.info('Outbox dispatcher started')
+        while not self.stopped.is_set():
+            try:
+                delivered = self.dispatch_pending()
+            except Exception:
+                logging.exception('Outbox could not be read')
+                delivered = 0
+            if delivered < self.batch_size:
+                self.stopped.wait(self.interval)
+        logging.info('Outbox dispatcher stopped')
+
+    def start(self) -> None:
+        """
+        Runs the dispatcher in a daemon thread
+        """
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name='outbox-dispatcher', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None) -> None:
+        """
+        :param timeout: Seconds to wait for the thread to finish
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+
+if __name__ == '__main__':
+    from app.infrastructure.boot import Boot
+
+    BOOT = Boot()
+    BOOT.start()
+    BOOT.injector.get_service('app.domain_events.outbox_dispatcher').instance.run()
@@ -0,0 +1,74 @@
+from typing import Generator
+
+from app.domain.model.Event import Event, EventCreated, EventDeleted
+from app.infrastructure.domain_events import DomainEventSubscriber
+from app.infrastructure.persistence.event_repository import EventRepository
+
+
+class CachedEventRepository(EventRepository):
+    """
+    Decorates an `EventRepository` caching the events read by identifier. The entries are
+    invalidated by `EventCacheInvalidator` when the domain events of a write are released.
+
+    The cache holds the immutable fields of the events, and each read builds a new `Event`, so
+    callers changing their event do not change the one read by others.
+    """
+
+    def __init__(self, repository, cache):
+        """
+        :param repository: The decorated `EventRepository`
+        :param cache: A `LruTtlCache` shared with the `EventCacheInvalidator`
+        """
+        self.repository = repository
+        self.cache = cache
+
+    def persist(self, event) -> None:
+        self.repository.persist(event)
+
+    def persist_many(self, events) -> None:
+        self.repository.persist_many(events)
+
+    def delete(self, event) -> None:
+        self.repository.delete(event)
+
+    def of_id(self, identifier) -> object:
+        record = self.cache.get_or_load(
+            str(identifier),
+            lambda: CachedEventRepository.__to_record(self.repository.of_id(identifier))
+        )
+        if record is None:
+            return None
+        return Event(*record)
+
+    def all(self) -> list:
+        return self.repository.all()
+
+    def slice(self, after, limit) -> list:
+        return self.repository.slice(after, limit)
+
+    def iter_all(self, batch_size=None) -> Generator:
+        return self.repository.iter_all(batch_size)
+
+    @staticmethod
+    def __to_record(event) -> object:
+        if event is None:
+            return None
+        return event.identifier, event.name
+
+
+class EventCacheInvalidator(DomainEventSubscriber):
+    """
+    Removes from the cache the events that have been created, modified or deleted
+    """
+
+    def __init__(self, cache):
+        """
+        :param cache: The `LruTtlCache` of the `CachedEventRepository`
+        """
+        self.cache = cache
+
+    def is_subscribed_to(self, domain_event) -> bool:
+        return isinstance(domain_event, (EventCreated, EventDeleted))
+
+    def handle(self, domain_event) -> None:
+        self.cache.delete(str(domain_event.identifier.identifier))
@@ -1,3 +1,7 @@
+from typing import Generator
+
+from pymongo import ASCENDING, IndexModel, UpdateOne
+
 from app.domain.model.Event import Event, EventId, EventName
 
 
@@ -5,6 +9,9 @@ class EventRepository:
     def persist(self, event) -> None:
         raise NotImplementedError
 
+    def persist_many(self, events) -> None:
+        raise NotImplementedError
+
     def delete(self, event) -> None:
         raise NotImplementedError
 
@@ -14,39 +21,64 @@ class EventRepository:
     def all(self) -> list:
         raise NotImplementedError
 
+    def slice(self, after, limit) -> list:
+        raise NotImplementedError
+
+    def iter_all(self, batch_size=None) -> Generator:
+        raise NotImplementedError
+
 
 class MongoEventRepository(EventRepository):
-    def __init__(self, mongo_client):
+    INDEXES = [
+        IndexModel([('identifier', ASCENDING)], name='identifier', unique=True, background=True)
+    ]
+    PROJECTION = {'_id': 0, 'identifier': 1, 'name': 1}
+    BATCH_SIZE = 500
+
+    def __init__(self, mongo_client, unit_of_work):
         self.collection = mongo_client.collection('events')
+        self.unit_of_work = unit_of_work
 
     def persist(self, event) -> None:
-        if self.__exist_document(event.identifier.identifier):
-            self.collection.update_one(
-                {'identifier': event.identifier.identifier},
-                {
-                    "$set": {
-                        'identifier': str(event.identifier.identifier),
-                        'name': event.name.name
-                    }
-                }
-            )
-        else:
-            self.collection.insert_one({
-                'identifier': str(event.identifier.identifier),
-                'name': event.name.name
-            })
+        # The event is written, and its domain events released, when the outermost unit of
+        # work is committed
+        with self.unit_of_work:
+            self.unit_of_work.register(event, self)
 
-        # This action should be launched from a database afterPersist hook if possible
-        event.release()
+    def persist_many(self, events) -> None:
+        """
+        Stores several events with a single `bulk_write`
+
+        :param events: List of `Event`
+        """
+        with self.unit_of_work:
+            for event in events:
+                self.unit_of_work.register(event, self)
+
+    def to_upsert(self, event) -> UpdateOne:
+        return UpdateOne(
+            {'identifier': str(event.identifier.identifier)},
+            {
+                "$set": {
+                    'identifier': str(event.identifier.identifier),
+                    'name': event.name.name
+                }
+            },
+            upsert=True
+        )
 
     def delete(self, event) -> None:
-        self.collection.delete_one({'identifier': event.identifier})
+        self.collection.delete_one({'identifier': str(event.identifier.identifier)})
 
         # This action should be launched from a database afterPersist hook if possible
+        event.event_deleted()
         event.release()
 
     def of_id(self, identifier) -> object:
-        result = self.collection.find_one({'identifier': identifier})
+        result = self.collection.find_one(
+            {'identifier': identifier},
+            MongoEventRepository.PROJECTION
+        )
         if result is not None:
             return self.__to_instance(
                 result
@@ -55,11 +87,35 @@ class MongoEventRepository(EventRepository):
             return None
 
     def all(self) -> list:
-        events = self.collection.find({})
+        return list(self.iter_all())
+
+    def slice(self, after, limit) -> list:
+        """
+        :param after: Identifier of the last event of the previous slice, or None to start
+        :param limit: Maximum number of events of the slice
+        :return: The events following `after` sorted by identifier
+        """
+        criteria = {'identifier': {'$gt': after}} if after is not None else {}
+        events = self.collection.find(criteria, MongoEventRepository.PROJECTION) \
+            .sort('identifier', ASCENDING) \
+            .limit(limit)
         return [self.__to_instance(event) for event in events]
 
-    def __exist_document(self, identifier):
-        return self.of_id(identifier) is not None
+    def iter_all(self, batch_size=None) -> Generator:
+        """
+        Builds the events while the cursor is consumed, so only one batch of documents is held
+        in memory at a time
+
+        :param batch_size: Number of documents fetched on each round trip
+        :return: A generator of events
+        """
+        cursor = self.collection.find(
+            {},
+            MongoEventRepository.PROJECTION,
+            batch_size=batch_size or MongoEventRepository.BATCH_SIZE
+        )
+        for record in cursor:
+            yield self.__to_instance(record)
 
     def __to_instance(self, record):
         return Event(
@@ -0,0 +1,97 @@
+"""
+Converts domain events into documents that can be stored and read back by later versions of the
+application. A document names the class of the event and holds its fields; value objects are
+rebuilt with their constructor. Only `DomainEvent` and `ValueObject` classes can be loaded.
+"""
+from importlib import import_module
+from uuid import UUID
+
+from app.infrastructure.domain_events import DomainEvent, ValueObject
+
+FORMAT_VERSION = 1
+VALUE_OBJECT = '__valueObject__'
+UUID_VALUE = '__uuid__'
+
+
+def to_document(domain_event) -> dict:
+    """
+    :param domain_event: A `DomainEvent`
+    :return: Document with the class and the fields of the event
+    """
+    return {
+        'type': _class_path(type(domain_event)),
+        'fields': {
+            name: _encode(getattr(domain_event, name))
+            for name in _fields(type(domain_event))
+            if hasattr(domain_event, name)
+        }
+    }
+
+
+def from_document(document) -> DomainEvent:
+    """
+    :param document: A document built by `to_document`
+    :return: The `DomainEvent`
+    :raises EventCannotBeDeserialized:
+    """
+    try:
+        event_class = _load_class(document['type'], DomainEvent)
+        domain_event = event_class.__new__(event_class)
+        for (name, value) in document['fields'].items():
+            setattr(domain_event, name, _decode(value))
+        return domain_event
+    except EventCannotBeDeserialized:
+        raise
+    except Exception as error:
+        raise EventCannotBeDeserialized('{0!r}'.format(error)) from error
+
+
+def _encode(value) -> object:
+    if isinstance(value, ValueObject):
+        return {
+            VALUE_OBJECT: _class_path(type(value)),
+            'values': [_encode(getattr(value, name)) for name in _fields(type(value))]
+        }
+    if isinstance(value, UUID):
+        return {UUID_VALUE: str(value)}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value) -> object:
+    if isinstance(value, dict) and VALUE_OBJECT in value:
+        value_class = _load_class(value[VALUE_OBJECT], ValueObject)
+        return value_class(*[_decode(item) for item in value['values']])
+    if isinstance(value, dict) and UUID_VALUE in value:
+        return UUID(value[UUID_VALUE])
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _fields(cls) -> list:
+    # Fields declared by the class and its parents, parents first
+    fields = []
+    for parent in reversed(cls.__mro__):
+        slots = parent.__dict__.get('__slots__', ())
+        fields.extend([slots] if isinstance(slots, str) else slots)
+    return fields
+
+
+def _class_path(cls) -> str:
+    return '{0}.{1}'.format(cls.__module__, cls.__qualname__)
+
+
+def _load_class(class_path, base_class) -> type:
+    (module_name, _, class_name) = class_path.rpartition('.')
+    cls = getattr(import_module(module_name), class_name, None)
+    if not isinstance(cls, type) or not issubclass(cls, base_class):
+        raise EventCannotBeDeserialized('{0} is not a {1}'.format(class_path, base_class.__name__))
+    return cls
+
+
+class EventCannotBeDeserialized(Exception):
+    """
+    A stored domain event cannot be loaded, its class or fields no longer exist
+    """
@@ -0,0 +1,102 @@
+import logging
+
+from pymongo.errors import OperationFailure
+
+
+class MongoIndexManager:
+    """
+    Creates the indexes declared by the repositories. Repositories declare their indexes as
+    `pymongo.IndexModel` instances in the `INDEXES` class attribute, and expose the
+    `collection` where they are created.
+    """
+    PRIMARY_KEY_INDEX = '_id_'
+    FLAG_OPTIONS = ('unique', 'sparse')
+    VALUE_OPTIONS = ('partialFilterExpression', 'expireAfterSeconds')
+
+    def ensure_indexes(self, repository) -> object:
+        """
+        Creates the declared indexes that do not exist yet in the collection of the
+        repository. Indexes that are not declared are reported but never dropped. An index that
+        cannot be created, for instance a unique index over duplicated documents, is logged and
+        reported as failed, the other indexes are still created.
+
+        :param repository: A repository declaring `INDEXES`
+        :return: The `IndexReport` before the missing indexes were created
+        """
+        report = self.report(repository)
+        for model in repository.INDEXES:
+            name = model.document['name']
+            if name not in report.missing:
+                continue
+            try:
+                repository.collection.create_indexes([model])
+            except OperationFailure as error:
+                report.failed.append(name)
+                logging.error(
+                    'Index {0} could not be created on {1}, the documents may violate it: '
+                    '{2}'.format(name, repository.collection.name, error)
+                )
+                continue
+            logging.info('Index {0} created on {1}'.format(name, repository.collection.name))
+        for name in report.changed:
+            logging.warning('Index {0} on {1} does not match its declaration'.format(
+                name,
+                repository.collection.name
+            ))
+        for name in report.extra:
+            logging.warning('Index {0} on {1} is not declared'.format(
+                name,
+                repository.collection.name
+            ))
+        return report
+
+    def report(self, repository) -> object:
+        """
+        Compares the declared indexes with the indexes of the collection
+
+        :param repository: A repository declaring `INDEXES`
+        :return: An `IndexReport`
+        """
+        existing = repository.collection.index_information()
+        declared = {model.document['name']: model for model in repository.INDEXES}
+        report = IndexReport()
+        for (name, model) in declared.items():
+            if name not in existing:
+                report.missing.append(name)
+            elif not MongoIndexManager.__matches(existing[name], model.document):
+                report.changed.append(name)
+        for name in existing:
+            if name not in declared and name != MongoIndexManager.PRIMARY_KEY_INDEX:
+                report.extra.append(name)
+        return report
+
+    @staticmethod
+    def __matches(existing, declared) -> bool:
+        # Same keys and the same options, the options not declared are the server defaults
+        if list(existing['key']) != list(declared['key'].items()):
+            return False
+        for option in MongoIndexManager.FLAG_OPTIONS:
+            if bool(existing.get(option, False)) != bool(declared.get(option, False)):
+                return False
+        for option in MongoIndexManager.VALUE_OPTIONS:
+            if existing.get(option) != declared.get(option):
+                return False
+        return True
+
+
+class IndexReport:
+    """
+    Differences between the declared indexes and the indexes of a collection
+    """
+
+    def __init__(self):
+        self.missing = []
+        self.changed = []
+        self.extra = []
+        self.failed = []
+
+    def is_synchronised(self) -> bool:
+        """
+        :return: If the collection has exactly the declared indexes
+        """
+        return not (self.missing or self.changed or self.extra or self.failed)
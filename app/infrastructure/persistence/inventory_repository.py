@@ -1,36 +1,81 @@
+from typing import Generator
+
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+
 from app.domain.model.Event import EventId
 from app.domain.model.Inventory import InventoryRepository, Inventory, InventoryId, SellerName, \
-    InventoryAmount
+    InventoryAmount, InventoryBelowMinimum
+
+
+def stored_amount(missing=None) -> dict:
+    """
+    Previous versions stored the amount as it was received from the form, a string, so the
+    queries and updates read the stored amount through this expression
+
+    :param missing: Amount of the documents without one, by default they have none
+    :return: The aggregation expression converting the stored amount to an integer
+    """
+    if missing is None:
+        return {'$toInt': '$amount'}
+    return {'$toInt': {'$ifNull': ['$amount', missing]}}
 
 
 class MongoInventoryRepository(InventoryRepository):
-    def __init__(self, mongo_client):
+    INDEXES = [
+        IndexModel([('identifier', ASCENDING)], name='identifier', unique=True, background=True),
+        IndexModel(
+            [('eventId', ASCENDING), ('sellerName', ASCENDING)],
+            name='eventId_sellerName',
+            unique=True,
+            background=True
+        )
+    ]
+    PROJECTION = {
+        '_id': 0,
+        'identifier': 1,
+        'eventId': 1,
+        'sellerName': 1,
+        'amount': stored_amount()
+    }
+    BATCH_SIZE = 500
+
+    def __init__(self, mongo_client, unit_of_work):
         self.collection = mongo_client.collection('inventory')
+        self.unit_of_work = unit_of_work
 
     def persist(self, inventory) -> None:
-        if self.exists_document(inventory.identifier):
-            self.collection.update_one(
-                {'identifier': inventory.identifier.identifier},
-                {
-                    "$set": {
-                        'identifier': str(inventory.identifier.identifier),
-                        'eventId': str(inventory.event_id.identifier),
-                        'sellerName': inventory.seller_name.name,
-                        'amount': inventory.amount.amount
-                    }
-                }
-            )
-        else:
-            self.collection.insert_one({
-                'identifier': str(inventory.identifier.identifier),
-                'eventId': str(inventory.event_id.identifier),
-                'sellerName': inventory.seller_name.name,
-                'amount': inventory.amount.amount
+        # The inventory is written, and its domain events released, when the outermost unit of
+        # work is committed
+        with self.unit_of_work:
+            self.unit_of_work.register(inventory, self)
 
-            })
+    def persist_many(self, inventories) -> None:
+        """
+        Stores several inventories with a single `bulk_write`
 
-        # This action should be launched from a database afterPersist hook if possible
-        inventory.release()
+        :param inventories: List of `Inventory`
+        """
+        with self.unit_of_work:
+            for inventory in inventories:
+                self.unit_of_work.register(inventory, self)
+
+    def to_upsert(self, inventory) -> UpdateOne:
+        # A seller has one inventory per event, so a retried or concurrent write replaces it
+        # instead of creating a second one. The identifier is replaced too, so the identifier of
+        # the latest write always names the stored inventory
+        return UpdateOne(
+            {
+                'eventId': str(inventory.event_id.identifier),
+                'sellerName': inventory.seller_name.name
+            },
+            {
+                '$set': {
+                    'identifier': str(inventory.identifier.identifier),
+                    'amount': inventory.amount.amount
+                }
+            },
+            upsert=True
+        )
 
     def delete(self, inventory) -> None:
         self.collection.delete_one({'identifier': inventory.identifier})
@@ -39,7 +84,10 @@ class MongoInventoryRepository(InventoryRepository):
         inventory.release()
 
     def of_id(self, identifier) -> object:
-        result = self.collection.find_one({'identifier': identifier})
+        result = self.collection.find_one(
+            {'identifier': identifier},
+            MongoInventoryRepository.PROJECTION
+        )
         if result is not None:
             return self.__to_instance(
                 result
@@ -48,13 +96,61 @@ class MongoInventoryRepository(InventoryRepository):
             return None
 
     def of_event_id(self, event_id) -> list:
-        result = self.collection.find({'eventId': str(event_id.identifier)})
-        if result is not None:
-            return [self.__to_instance(
-                item
-            ) for item in result]
-        else:
-            return []
+        return list(self.iter_of_event_id(event_id))
+
+    def iter_of_event_id(self, event_id, batch_size=None) -> Generator:
+        """
+        Builds the inventory while the cursor is consumed, so only one batch of documents is
+        held in memory at a time
+
+        :param event_id: `EventId` of the inventory
+        :param batch_size: Number of documents fetched on each round trip
+        :return: A generator of inventory
+        """
+        cursor = self.collection.find(
+            {'eventId': str(event_id.identifier)},
+            MongoInventoryRepository.PROJECTION,
+            batch_size=batch_size or MongoInventoryRepository.BATCH_SIZE
+        )
+        for record in cursor:
+            yield self.__to_instance(record)
+
+    def adjust(self, event_id, seller_name, delta, minimum=None) -> object:
+        """
+        Applies `delta` to the amount of a seller in a single atomic update, creating the
+        inventory if it does not exist. When a `minimum` is given, decrements that would leave
+        the amount below it are rejected. The stored amount is converted to an integer, and
+        stored as one, by the update itself.
+
+        :raises InventoryBelowMinimum:
+        """
+        criteria = {
+            'eventId': str(event_id.identifier),
+            'sellerName': seller_name.name
+        }
+        guarded = minimum is not None and delta.amount < 0
+        if guarded:
+            criteria['$expr'] = {
+                '$gte': [stored_amount(), minimum.amount - delta.amount]
+            }
+        result = self.collection.find_one_and_update(
+            criteria,
+            [{
+                '$set': {
+                    'amount': {'$add': [stored_amount(missing=0), delta.amount]},
+                    'identifier': {
+                        '$ifNull': ['$identifier', str(InventoryId.generate_id().identifier)]
+                    }
+                }
+            }],
+            # A guarded adjustment cannot create the inventory, otherwise a seller without
+            # enough stock would get a second inventory instead of a rejection
+            upsert=not guarded,
+            return_document=ReturnDocument.AFTER
+        )
+        if result is None:
+            raise InventoryBelowMinimum
+        return self.__to_instance(result)
 
     def __to_instance(self, record):
         return Inventory(
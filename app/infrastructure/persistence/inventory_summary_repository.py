@@ -0,0 +1,201 @@
+from pymongo import ASCENDING, IndexModel, UpdateOne
+
+from app.infrastructure.persistence.inventory_repository import stored_amount
+
+
+class InventorySummaryRepository:
+    """
+    Read model with the inventory totals of each event
+    """
+
+    def apply(self, inventory_updated) -> None:
+        raise NotImplementedError
+
+    def apply_many(self, inventory_updates) -> None:
+        raise NotImplementedError
+
+    def of_event_id(self, event_id) -> object:
+        raise NotImplementedError
+
+    def rebuild(self, event_id=None) -> None:
+        raise NotImplementedError
+
+
+class MongoInventorySummaryRepository(InventorySummaryRepository):
+    INDEXES = [
+        IndexModel([('eventId', ASCENDING)], name='eventId', unique=True, background=True)
+    ]
+    PROJECTION = {'_id': 0, 'eventId': 1, 'totalAmount': 1, 'sellerCount': 1, 'updatedOn': 1}
+    APPLIED_ADJUSTMENTS = 100
+
+    def __init__(self, mongo_client):
+        self.collection = mongo_client.collection('inventory_summary')
+        self.inventory_collection = mongo_client.collection('inventory')
+
+    def apply(self, inventory_updated) -> None:
+        """
+        Applies an inventory change to the summary of its event with a single atomic update. A
+        replaced amount sets the amount of the seller, an adjustment is added to it. The summary
+        remembers the last `APPLIED_ADJUSTMENTS` adjustments it applied, so a redelivered event
+        changes nothing.
+
+        :param inventory_updated: An `InventoryUpdated` domain event
+        """
+        self.collection.update_one(
+            MongoInventorySummaryRepository.__criteria(inventory_updated),
+            MongoInventorySummaryRepository.__pipeline(inventory_updated),
+            upsert=True
+        )
+
+    def apply_many(self, inventory_updates) -> None:
+        """
+        Applies several inventory changes to the summaries with a single `bulk_write`
+
+        :param inventory_updates: List of `InventoryUpdated` domain events, in the order they
+            were published
+        """
+        if not inventory_updates:
+            return
+        self.collection.bulk_write([
+            UpdateOne(
+                MongoInventorySummaryRepository.__criteria(inventory_updated),
+                MongoInventorySummaryRepository.__pipeline(inventory_updated),
+                upsert=True
+            ) for inventory_updated in inventory_updates
+        ], ordered=True)
+
+    def of_event_id(self, event_id) -> object:
+        """
+        :param event_id: `EventId` of the summary
+        :return: The summary document or None if the event has no inventory
+        """
+        return self.collection.find_one(
+            {'eventId': str(event_id.identifier)},
+            MongoInventorySummaryRepository.PROJECTION
+        )
+
+    def rebuild(self, event_id=None) -> None:
+        """
+        Recomputes the summaries from the inventory collection. Inventory changes applied
+        while the summaries are rebuilt may be lost, and the rebuilt summaries forget the
+        adjustments they applied, so it should run on a quiet system with an empty outbox.
+
+        :param event_id: `EventId` of the summary to rebuild, or None to rebuild all of them
+        """
+        criteria = {'eventId': str(event_id.identifier)} if event_id is not None else {}
+        self.collection.delete_many(criteria)
+        self.inventory_collection.aggregate([
+            {'$match': criteria},
+            {
+                '$group': {
+                    '_id': {'eventId': '$eventId', 'seller': '$sellerName'},
+                    'amount': {'$sum': stored_amount()}
+                }
+            },
+            {'$match': {'amount': {'$ne': 0}}},
+            {
+                '$group': {
+                    '_id': '$_id.eventId',
+                    'totalAmount': {'$sum': '$amount'},
+                    'sellerAmounts': {'$push': {'seller': '$_id.seller', 'amount': '$amount'}}
+                }
+            },
+            {
+                '$project': {
+                    '_id': 0,
+                    'eventId': '$_id',
+                    'totalAmount': 1,
+                    'sellerAmounts': 1,
+                    'sellerCount': {'$size': '$sellerAmounts'},
+                    'appliedAdjustments': [],
+                    'updatedOn': '$$NOW'
+                }
+            },
+            {
+                '$merge': {
+                    'into': 'inventory_summary',
+                    'on': 'eventId',
+                    'whenMatched': 'replace',
+                    'whenNotMatched': 'insert'
+                }
+            }
+        ])
+
+    @staticmethod
+    def __criteria(inventory_updated) -> dict:
+        return {'eventId': str(inventory_updated.event_id.identifier)}
+
+    @staticmethod
+    def __pipeline(inventory_updated) -> list:
+        seller = {'$literal': inventory_updated.seller_name.name}
+        amounts = {'$ifNull': ['$sellerAmounts', []]}
+        previous = {
+            '$sum': {
+                '$map': {
+                    'input': {
+                        '$filter': {
+                            'input': amounts,
+                            'as': 'entry',
+                            'cond': {'$eq': ['$$entry.seller', seller]}
+                        }
+                    },
+                    'as': 'entry',
+                    'in': '$$entry.amount'
+                }
+            }
+        }
+        # A replaced amount is absolute, so applying it again changes nothing. An adjustment is
+        # added to the amount of the seller, the last adjustments applied are remembered so a
+        # redelivered one is not added twice.
+        if inventory_updated.delta is None:
+            (current, applied) = (inventory_updated.amount.amount, None)
+        else:
+            current = {'$add': [previous, inventory_updated.delta.amount]}
+            applied = {
+                '$in': [inventory_updated.domain_event_id, {'$ifNull': ['$appliedAdjustments', []]}]
+            }
+        changes = {
+            'totalAmount': {
+                '$add': [{'$ifNull': ['$totalAmount', 0]}, {'$subtract': [current, previous]}]
+            },
+            'sellerAmounts': {
+                '$filter': {
+                    'input': {
+                        '$concatArrays': [
+                            {
+                                '$filter': {
+                                    'input': amounts,
+                                    'as': 'entry',
+                                    'cond': {'$ne': ['$$entry.seller', seller]}
+                                }
+                            },
+                            [{'seller': seller, 'amount': current}]
+                        ]
+                    },
+                    'as': 'entry',
+                    # Sellers without inventory are removed, so they are no longer counted
+                    'cond': {'$ne': ['$$entry.amount', 0]}
+                }
+            },
+            'updatedOn': inventory_updated.occurred_on
+        }
+        if applied is not None:
+            changes['appliedAdjustments'] = {
+                '$slice': [
+                    {
+                        '$concatArrays': [
+                            {'$ifNull': ['$appliedAdjustments', []]},
+                            [inventory_updated.domain_event_id]
+                        ]
+                    },
+                    -MongoInventorySummaryRepository.APPLIED_ADJUSTMENTS
+                ]
+            }
+            changes = {
+                field: {'$cond': [applied, '$' + field, change]}
+                for (field, change) in changes.items()
+            }
+        return [
+            {'$set': changes},
+            {'$set': {'sellerCount': {'$size': '$sellerAmounts'}}}
+        ]
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+import logging
+from uuid import uuid4
+
+from pymongo import ASCENDING, IndexModel, InsertOne
+
+from app.infrastructure.domain_events import DomainEventOutbox
+from app.infrastructure.persistence.event_serializer import FORMAT_VERSION, \
+    EventCannotBeDeserialized, from_document, to_document
+
+
+class MongoOutbox(DomainEventOutbox):
+    """
+    Stores the domain events in the `outbox` collection until an `OutboxDispatcher` delivers
+    them. Events are stored as versioned documents, see `event_serializer`. Events that cannot
+    be loaded are moved to the dead letters, so they do not block the outbox.
+
+    Dispatchers claim the events they deliver for `lease` seconds, so several of them can run
+    at the same time without delivering the same events. The subscribers that received an
+    event are recorded in `deliveredTo`, so when another one fails only the failing one is
+    notified again.
+    """
+    INDEXES = [
+        IndexModel(
+            [('delivered', ASCENDING), ('attempts', ASCENDING), ('_id', ASCENDING)],
+            name='delivered_attempts',
+            background=True
+        ),
+        # Delivered events are kept a week to ease debugging
+        IndexModel(
+            [('deliveredOn', ASCENDING)],
+            name='deliveredOn',
+            expireAfterSeconds=7 * 24 * 60 * 60,
+            background=True
+        )
+    ]
+
+    def __init__(self, mongo_client, max_attempts, lease=60):
+        """
+        :param mongo_client: The `Mongo` service
+        :param max_attempts: Deliveries tried before an event is no longer pending
+        :param lease: Seconds a dispatcher owns the events it has claimed, after them the
+            events can be claimed again, for instance when the dispatcher has died
+        """
+        self.collection = mongo_client.collection('outbox')
+        self.max_attempts = max_attempts
+        self.lease = lease
+
+    def to_inserts(self, domain_events) -> list:
+        """
+        :param domain_events: List of `DomainEvent`
+        :return: The write operations storing the events in the `collection`
+        """
+        return [InsertOne({
+            'type': '{0}.{1}'.format(type(event).__module__, type(event).__name__),
+            'occurredOn': event.occurred_on,
+            'format': FORMAT_VERSION,
+            'event': to_document(event),
+            'delivered': False,
+            'deliveredTo': [],
+            'attempts': 0
+        }) for event in domain_events]
+
+    def store(self, domain_events) -> None:
+        self.collection.bulk_write(self.to_inserts(domain_events), ordered=True)
+
+    def claim(self, limit) -> list:
+        # The update only matches the events that are still unclaimed, so each event is owned
+        # by a single dispatcher, then the events it owns are read
+        now = datetime.utcnow()
+        candidates = [record['_id'] for record in self.collection.find(
+            self.__claimable(now), {'_id': 1}
+        ).sort('_id', ASCENDING).limit(limit)]
+        if not candidates:
+            return []
+        owner = uuid4().hex
+        criteria = self.__claimable(now)
+        criteria['_id'] = {'$in': candidates}
+        self.collection.update_many(
+            criteria,
+            {'$set': {'owner': owner, 'leaseUntil': now + timedelta(seconds=self.lease)}}
+        )
+        records = self.collection.find(
+            {'_id': {'$in': candidates}, 'owner': owner},
+            {'format': 1, 'event': 1, 'deliveredTo': 1}
+        ).sort('_id', ASCENDING)
+        claimed = []
+        for record in records:
+            try:
+                domain_event = MongoOutbox.__load(record)
+            except EventCannotBeDeserialized as error:
+                logging.error('Outbox event {0} cannot be loaded: {1}'.format(record['_id'], error))
+                self.mark_dead(record['_id'], error)
+                continue
+            claimed.append((record['_id'], domain_event, set(record.get('deliveredTo', []))))
+        return claimed
+
+    def mark_delivered(self, identifiers) -> None:
+        if not identifiers:
+            return
+        self.collection.update_many(
+            {'_id': {'$in': identifiers}},
+            {'$set': {'delivered': True, 'deliveredOn': datetime.utcnow(), 'leaseUntil': None}}
+        )
+
+    def mark_failed(self, identifier, error, delivered_to=()) -> None:
+        self.collection.update_one(
+            {'_id': identifier},
+            {
+                '$inc': {'attempts': 1},
+                '$set': {'lastError': repr(error), 'leaseUntil': None},
+                '$addToSet': {'deliveredTo': {'$each': sorted(delivered_to)}}
+            }
+        )
+
+    def mark_dead(self, identifier, error) -> None:
+        """
+        Moves an event that cannot be loaded to the dead letters, it is kept in the collection
+        with `deadLetter` set but it is no longer pending
+
+        :param identifier: Identifier of the event
+        :param error: Why it cannot be loaded
+        """
+        self.collection.update_one(
+            {'_id': identifier},
+            {'$set': {
+                'attempts': self.max_attempts,
+                'deadLetter': True,
+                'lastError': repr(error),
+                'leaseUntil': None
+            }}
+        )
+
+    def __claimable(self, now) -> dict:
+        return {
+            'delivered': False,
+            'attempts': {'$lt': self.max_attempts},
+            '$or': [{'leaseUntil': None}, {'leaseUntil': {'$lte': now}}]
+        }
+
+    @staticmethod
+    def __load(record):
+        if record.get('format') == FORMAT_VERSION:
+            return from_document(record['event'])
+        raise EventCannotBeDeserialized('Unknown format {0}'.format(record.get('format')))
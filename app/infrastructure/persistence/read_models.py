@@ -0,0 +1,92 @@
+from typing import Generator
+
+from pymongo import ASCENDING
+
+from app.infrastructure.persistence.inventory_repository import stored_amount
+
+
+class EventReadModel:
+    """
+    Query side of the events, returns the documents rendered by the views without building
+    the domain aggregates
+    """
+
+    def slice(self, after, limit) -> list:
+        raise NotImplementedError
+
+    def iter_all(self, batch_size=None) -> Generator:
+        raise NotImplementedError
+
+
+class InventoryReadModel:
+    """
+    Query side of the inventory, returns the documents rendered by the views without building
+    the domain aggregates
+    """
+
+    def iter_of_event_id(self, event_id, batch_size=None) -> Generator:
+        raise NotImplementedError
+
+
+class MongoEventReadModel(EventReadModel):
+    """
+    The fields are renamed by the projection, so the documents are returned as Mongo sends
+    them. Projections with expressions require MongoDB 4.4.
+    """
+    PROJECTION = {'_id': 0, 'id': '$identifier', 'name': 1}
+    BATCH_SIZE = 500
+
+    def __init__(self, mongo_client):
+        self.collection = mongo_client.collection('events')
+
+    def slice(self, after, limit) -> list:
+        """
+        :param after: Identifier of the last event of the previous slice, or None to start
+        :param limit: Maximum number of events of the slice
+        :return: List of `{'id', 'name'}` following `after` sorted by identifier
+        """
+        criteria = {'identifier': {'$gt': after}} if after is not None else {}
+        return list(
+            self.collection.find(criteria, MongoEventReadModel.PROJECTION)
+            .sort('identifier', ASCENDING)
+            .limit(limit)
+        )
+
+    def iter_all(self, batch_size=None) -> Generator:
+        """
+        :param batch_size: Number of documents fetched on each round trip
+        :return: A generator of `{'id', 'name'}`
+        """
+        yield from self.collection.find(
+            {},
+            MongoEventReadModel.PROJECTION,
+            batch_size=batch_size or MongoEventReadModel.BATCH_SIZE
+        )
+
+
+class MongoInventoryReadModel(InventoryReadModel):
+    """
+    The fields are renamed by the projection, so the documents are returned as Mongo sends
+    them. Projections with expressions require MongoDB 4.4.
+    """
+    PROJECTION = {
+        '_id': 0,
+        'seller_name': '$sellerName',
+        'amount': stored_amount()
+    }
+    BATCH_SIZE = 500
+
+    def __init__(self, mongo_client):
+        self.collection = mongo_client.collection('inventory')
+
+    def iter_of_event_id(self, event_id, batch_size=None) -> Generator:
+        """
+        :param event_id: Identifier of the event
+        :param batch_size: Number of documents fetched on each round trip
+        :return: A generator of `{'seller_name', 'amount'}`
+        """
+        yield from self.collection.find(
+            {'eventId': str(event_id)},
+            MongoInventoryReadModel.PROJECTION,
+            batch_size=batch_size or MongoInventoryReadModel.BATCH_SIZE
+        )
@@ -0,0 +1,163 @@
+import logging
+import threading
+
+from app.infrastructure.domain_events import DomainEventPublisher
+
+
+class UnitOfWork:
+    """
+    Tracks the aggregates that are new or modified while an operation is executed, and stores
+    all of them at once when the operation finishes.
+    """
+
+    def begin(self) -> None:
+        """
+        Opens a unit of work. Units of work can be nested, only the outermost one stores the
+        aggregates.
+        """
+        raise NotImplementedError
+
+    def register(self, aggregate, mapper) -> None:
+        """
+        Tracks a new or modified aggregate
+
+        :param aggregate: Instance implementing `DomainRoot`
+        :param mapper: The repository that knows how to write the aggregate
+        :raises UnitOfWorkNotStarted:
+        """
+        raise NotImplementedError
+
+    def commit(self) -> None:
+        """
+        Closes a unit of work. When the outermost unit is closed the tracked aggregates are
+        stored and, after the write succeeds, their domain events are published together.
+
+        :raises UnitOfWorkNotStarted:
+        """
+        raise NotImplementedError
+
+    def rollback(self) -> None:
+        """
+        Closes a unit of work discarding all the tracked aggregates and their domain events
+        """
+        raise NotImplementedError
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+class MongoUnitOfWork(UnitOfWork):
+    """
+    Unit of work that converts the tracked aggregates into ordered upserts, and writes them with
+    a single `bulk_write` per collection. The state is kept per thread, so one instance can be
+    shared by all the requests served by the application.
+
+    The mappers must expose the `collection` where the aggregates are stored and a
+    `to_upsert(aggregate)` method returning the write operation of the aggregate.
+
+    When the `DomainEventPublisher` uses an outbox, the domain events of the aggregates that
+    deferred subscribers listen to are written to it in the same batch. The batch is atomic if
+    the `Mongo` service has transactions enabled, otherwise the outbox is written right after
+    the aggregates.
+    """
+
+    def __init__(self, mongo_client):
+        """
+        :param mongo_client: The `Mongo` service
+        """
+        self.mongo_client = mongo_client
+        self.local = threading.local()
+
+    def begin(self) -> None:
+        state = self.__state()
+        state.depth += 1
+
+    def register(self, aggregate, mapper) -> None:
+        state = self.__state()
+        if state.depth == 0:
+            raise UnitOfWorkNotStarted
+        # The write operation is built on commit, so an aggregate registered twice is only
+        # written once with its latest state
+        state.entries[id(aggregate)] = (aggregate, mapper)
+
+    def commit(self) -> None:
+        state = self.__state()
+        if state.depth == 0:
+            raise UnitOfWorkNotStarted
+        state.depth -= 1
+        if state.depth > 0:
+            return
+        entries = list(state.entries.values())
+        state.entries.clear()
+        publisher = DomainEventPublisher.get_instance()
+        domain_events = [event for (aggregate, _) in entries for event in aggregate.events]
+        deferred = publisher.deferred_events(domain_events)
+        if not deferred:
+            self.__flush(entries, None, [])
+            self.__clear(entries)
+            publisher.publish_batch(domain_events)
+            return
+        self.__flush(entries, publisher.outbox, deferred)
+        self.__clear(entries)
+        publisher.dispatch_batch(domain_events)
+
+    def rollback(self) -> None:
+        state = self.__state()
+        if state.depth == 0:
+            raise UnitOfWorkNotStarted
+        state.depth -= 1
+        self.__clear(state.entries.values())
+        state.entries.clear()
+        logging.debug('Unit of work has been rolled back')
+
+    def __flush(self, entries, outbox, domain_events) -> None:
+        operations = {}
+        for (aggregate, mapper) in entries:
+            if id(mapper) not in operations:
+                operations[id(mapper)] = (mapper, [])
+            operations[id(mapper)][1].append(mapper.to_upsert(aggregate))
+        if outbox is not None and domain_events:
+            operations[id(outbox)] = (outbox, outbox.to_inserts(domain_events))
+        if not self.mongo_client.transactions:
+            self.__write(operations.values(), None)
+            return
+        with self.mongo_client.start_session() as session:
+            session.with_transaction(
+                lambda transaction: self.__write(operations.values(), transaction)
+            )
+
+    def __write(self, operations, session) -> None:
+        for (mapper, requests) in operations:
+            mapper.collection.bulk_write(requests, ordered=True, session=session)
+            logging.debug(
+                '{0} documents have been written by {1}'.format(
+                    len(requests),
+                    type(mapper).__name__
+                )
+            )
+
+    @staticmethod
+    def __clear(entries) -> None:
+        for (aggregate, _) in entries:
+            aggregate.clear()
+
+    def __state(self):
+        state = self.local
+        if not hasattr(state, 'depth'):
+            state.depth = 0
+            state.entries = {}
+        return state
+
+
+class UnitOfWorkNotStarted(Exception):
+    """
+    An operation has been requested on a unit of work that has not been opened
+    """
@@ -0,0 +1,389 @@
+"""
+Caches the results of the query handlers. Each result is stored with the versions of its tags,
+and a domain event invalidates a tag by changing its version, so the results read before the
+change are never served again, even if they were being loaded while it happened.
+"""
+from datetime import datetime
+from hashlib import blake2b
+from importlib import import_module
+import json
+from multiprocessing import resource_tracker, shared_memory
+import os
+import struct
+import sys
+import threading
+import time
+
+from app.infrastructure.cache import LruTtlCache
+from app.infrastructure.domain_events import DomainEventSubscriber
+from app.infrastructure.single_flight import coalescing_key
+
+
+class QueryCacheBackend:
+    """
+    Storage of a query cache
+    """
+
+    def get(self, key, versions) -> object:
+        """
+        :param key: The key of the query
+        :param versions: The current versions of the tags of the query
+        :return: The cached result, or None when it is not cached, has expired or was stored
+            with other versions
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, versions) -> None:
+        """
+        :param key: The key of the query
+        :param value: The result of the query
+        :param versions: The versions of the tags read before the query was run
+        """
+        raise NotImplementedError
+
+    def versions(self, tags) -> tuple:
+        """
+        :param tags: List of tags
+        :return: The current version of each tag
+        """
+        raise NotImplementedError
+
+    def invalidate(self, tags) -> None:
+        """
+        Changes the version of the tags, so the results stored with them are not served
+
+        :param tags: List of tags
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """
+        :return: The counters of the cache
+        """
+        raise NotImplementedError
+
+
+class LruQueryCacheBackend(QueryCacheBackend):
+    """
+    Keeps the results in the memory of the process, bounded in size and lifetime. The cached
+    results are shared by the callers, so they must not be modified.
+    """
+
+    def __init__(self, max_size, ttl, tag_slots=4096):
+        """
+        :param max_size: Maximum number of results
+        :param ttl: Seconds a result can be served since it was stored
+        :param tag_slots: Number of tag versions, tags sharing a slot are invalidated together
+        """
+        self.entries = LruTtlCache(max_size, ttl)
+        self.tag_versions = [0] * tag_slots
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, versions) -> object:
+        entry = self.entries.get(key)
+        hit = entry is not None and entry[0] == versions
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry[1] if hit else None
+
+    def set(self, key, value, versions) -> None:
+        self.entries.set(key, (versions, value))
+
+    def versions(self, tags) -> tuple:
+        return tuple(self.tag_versions[self.__slot(tag)] for tag in tags)
+
+    def invalidate(self, tags) -> None:
+        with self.lock:
+            for tag in tags:
+                self.tag_versions[self.__slot(tag)] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'size': self.entries.stats()['size'],
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def __slot(self, tag) -> int:
+        return hash(tag) % len(self.tag_versions)
+
+
+class SharedMemoryQueryCacheBackend(QueryCacheBackend):
+    """
+    Keeps the results in a named shared memory segment, so all the processes of the
+    application, for instance the workers of a WSGI server, share the results and their
+    invalidations. The segment is a fixed number of slots, a result goes to the slot of its
+    key replacing the previous one, and results bigger than a slot are not cached. Writes are
+    not locked: a slot being written is detected by its checksum and read as a miss.
+
+    Any local process can write to the segment, so results are stored as JSON, never as
+    pickles. Only results made of JSON values and datetimes are cached; tuples are served as
+    lists.
+
+    The segment outlives the processes, `unlink` removes it.
+    """
+    VERSION = struct.Struct('<Q')
+    HEADER = struct.Struct('<16s16sdI')
+    DATETIME_VALUE = '__datetime__'
+
+    def __init__(self, name, slots=1024, slot_size=16384, ttl=60, tag_slots=4096):
+        """
+        :param name: Name of the shared memory segment
+        :param slots: Number of results
+        :param slot_size: Bytes of each result, including its header
+        :param ttl: Seconds a result can be served since it was stored
+        :param tag_slots: Number of tag versions, tags sharing a slot are invalidated together
+        """
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ttl = ttl
+        self.tag_slots = tag_slots
+        self.entries_offset = tag_slots * SharedMemoryQueryCacheBackend.VERSION.size
+        self.memory = SharedMemoryQueryCacheBackend.__open(
+            name, self.entries_offset + slots * slot_size
+        )
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.oversized = 0
+        self.unserializable = 0
+
+    def get(self, key, versions) -> object:
+        value = self.__read(key, versions)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, versions) -> None:
+        try:
+            payload = json.dumps(
+                [versions, value],
+                default=SharedMemoryQueryCacheBackend.__encode,
+                separators=(',', ':')
+            ).encode()
+        except (TypeError, ValueError):
+            with self.lock:
+                self.unserializable += 1
+            return
+        if SharedMemoryQueryCacheBackend.HEADER.size + len(payload) > self.slot_size:
+            with self.lock:
+                self.oversized += 1
+            return
+        digest = SharedMemoryQueryCacheBackend.__digest(key)
+        offset = self.__offset(digest)
+        header = SharedMemoryQueryCacheBackend.HEADER.pack(
+            digest,
+            SharedMemoryQueryCacheBackend.__digest(payload),
+            time.time() + self.ttl,
+            len(payload)
+        )
+        start = offset + len(header)
+        self.memory.buf[offset:start] = header
+        self.memory.buf[start:start + len(payload)] = payload
+
+    def versions(self, tags) -> tuple:
+        return tuple(
+            SharedMemoryQueryCacheBackend.VERSION.unpack_from(
+                self.memory.buf, self.__tag_offset(tag)
+            )[0] for tag in tags
+        )
+
+    def invalidate(self, tags) -> None:
+        # A random version cannot be lost by two processes invalidating at the same time
+        for tag in tags:
+            SharedMemoryQueryCacheBackend.VERSION.pack_into(
+                self.memory.buf,
+                self.__tag_offset(tag),
+                int.from_bytes(os.urandom(SharedMemoryQueryCacheBackend.VERSION.size), 'little')
+            )
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'oversized': self.oversized,
+                'unserializable': self.unserializable
+            }
+
+    def close(self) -> None:
+        self.memory.close()
+
+    def unlink(self) -> None:
+        # Unlinking unregisters the tracked segment, which was unregistered when it was opened
+        if SharedMemoryQueryCacheBackend.__is_tracked():
+            resource_tracker.register('/' + self.memory.name, 'shared_memory')
+        self.memory.unlink()
+
+    def __read(self, key, versions) -> object:
+        digest = SharedMemoryQueryCacheBackend.__digest(key)
+        offset = self.__offset(digest)
+        (stored_digest, checksum, expires_on, length) = \
+            SharedMemoryQueryCacheBackend.HEADER.unpack_from(self.memory.buf, offset)
+        if stored_digest != digest or expires_on <= time.time():
+            return None
+        start = offset + SharedMemoryQueryCacheBackend.HEADER.size
+        if start + length > offset + self.slot_size:
+            return None
+        payload = bytes(self.memory.buf[start:start + length])
+        if SharedMemoryQueryCacheBackend.__digest(payload) != checksum:
+            return None
+        try:
+            (stored_versions, value) = json.loads(
+                payload,
+                object_hook=SharedMemoryQueryCacheBackend.__decode
+            )
+        except ValueError:
+            return None
+        return value if tuple(stored_versions) == tuple(versions) else None
+
+    def __offset(self, digest) -> int:
+        slot = int.from_bytes(digest[:8], 'little') % self.slots
+        return self.entries_offset + slot * self.slot_size
+
+    def __tag_offset(self, tag) -> int:
+        slot = int.from_bytes(SharedMemoryQueryCacheBackend.__digest(tag)[:8], 'little')
+        return (slot % self.tag_slots) * SharedMemoryQueryCacheBackend.VERSION.size
+
+    @staticmethod
+    def __digest(data) -> bytes:
+        if isinstance(data, str):
+            data = data.encode()
+        return blake2b(data, digest_size=16).digest()
+
+    @staticmethod
+    def __encode(value) -> dict:
+        if isinstance(value, datetime):
+            return {SharedMemoryQueryCacheBackend.DATETIME_VALUE: value.isoformat()}
+        raise TypeError(type(value).__name__)
+
+    @staticmethod
+    def __decode(document) -> object:
+        if len(document) == 1 and SharedMemoryQueryCacheBackend.DATETIME_VALUE in document:
+            return datetime.fromisoformat(document[SharedMemoryQueryCacheBackend.DATETIME_VALUE])
+        return document
+
+    @staticmethod
+    def __is_tracked() -> bool:
+        # Before Python 3.13 the segments are always tracked, on POSIX, by the resource
+        # tracker, which removes them when the process that opened them exits
+        return sys.version_info < (3, 13) and os.name == 'posix'
+
+    @staticmethod
+    def __attach(name, **options) -> shared_memory.SharedMemory:
+        # The segment is shared with processes that are not children of this one, it must not
+        # be removed when this one exits
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(name, track=False, **options)
+        memory = shared_memory.SharedMemory(name, **options)
+        if SharedMemoryQueryCacheBackend.__is_tracked():
+            resource_tracker.unregister('/' + memory.name, 'shared_memory')
+        return memory
+
+    @staticmethod
+    def __open(name, size) -> shared_memory.SharedMemory:
+        try:
+            memory = SharedMemoryQueryCacheBackend.__attach(name, create=True, size=size)
+        except FileExistsError:
+            memory = SharedMemoryQueryCacheBackend.__attach(name)
+        if memory.size < size:
+            memory.close()
+            raise SharedMemoryTooSmall(name)
+        return memory
+
+
+class CachedQueryHandler:
+    """
+    Decorates a query handler caching its results. Streamed queries, and queries with fields
+    that are not hashable, are not cached.
+    """
+
+    def __init__(self, handler, backend, tags):
+        """
+        :param handler: The query handler
+        :param backend: The `QueryCacheBackend`
+        :param tags: Templates of the tags of the results, formatted with the query, for
+            instance `inventory_of_event:{query.event_id}`
+        """
+        self.handler = handler
+        self.backend = backend
+        self.tags = list(tags)
+
+    def handle(self, query):
+        key = query_key(query)
+        if key is None:
+            return self.handler.handle(query)
+        versions = self.backend.versions([tag.format(query=query) for tag in self.tags])
+        result = self.backend.get(key, versions)
+        if result is None:
+            result = self.handler.handle(query)
+            if result is not None:
+                self.backend.set(key, result, versions)
+        return result
+
+
+class QueryCacheInvalidator(DomainEventSubscriber):
+    """
+    Invalidates the tags of the cached results affected by the domain events
+    """
+
+    def __init__(self, backend, tags):
+        """
+        :param backend: The `QueryCacheBackend`
+        :param tags: Dictionary from the `module.Class` path of a domain event to the templates
+            of the tags it invalidates, formatted with the event, for instance
+            `inventory_of_event:{event.event_id.identifier}`
+        """
+        self.backend = backend
+        self.tags = {}
+        for (class_path, templates) in tags.items():
+            (module_name, _, class_name) = class_path.rpartition('.')
+            self.tags[getattr(import_module(module_name), class_name)] = list(templates)
+
+    def is_subscribed_to(self, domain_event) -> bool:
+        return isinstance(domain_event, tuple(self.tags))
+
+    def handle(self, domain_event) -> None:
+        self.backend.invalidate(self.__tags_of(domain_event))
+
+    def handle_batch(self, domain_events) -> None:
+        tags = set()
+        for domain_event in domain_events:
+            tags.update(self.__tags_of(domain_event))
+        self.backend.invalidate(sorted(tags))
+
+    def __tags_of(self, domain_event) -> list:
+        return [
+            template.format(event=domain_event)
+            for (event_class, templates) in self.tags.items()
+            if isinstance(domain_event, event_class)
+            for template in templates
+        ]
+
+
+def query_key(query) -> str:
+    """
+    :param query: A query DTO
+    :return: Key made of the class and the fields of the query, the same in every process, or
+        None when the query cannot be cached
+    """
+    key = coalescing_key(query)
+    if key is None:
+        return None
+    (query_class, fields) = key
+    return '{0}.{1}:{2!r}'.format(query_class.__module__, query_class.__qualname__, fields)
+
+
+class SharedMemoryTooSmall(Exception):
+    """
+    The shared memory segment of the query cache exists with a smaller size than configured
+    """
@@ -2,9 +2,21 @@
 The conversion from file definition to instance has been based on:
 https://github.com/jagoPG/restaurant-ml-inspector
 """
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from importlib import import_module
+import logging
+import os
+import pickle
+import threading
 from typing import Generator
 
-from yaml import load, Loader
+from yaml import load
+try:
+    # The C loader of libyaml is several times faster, when it is installed
+    from yaml import CLoader as Loader
+except ImportError:
+    from yaml import Loader
 
 
 class ServiceInjector:
@@ -64,51 +76,150 @@ class ServiceConsumer:
 
 class ServiceRecorder:
     """
-    Parses a definition file with all services, and registers in a `DependencyInjector`
+    Parses a definition file with all services, and registers in a `DependencyInjector`.
+
+    The services are sorted by their dependencies, so they can be declared in any order. The
+    eager services of each level of the dependency graph do not depend on each other, and are
+    built concurrently. Lazy services are not built when they are recorded, so they gain nothing
+    from it: they are built one by one on their first use, with the dependencies they need.
     """
 
-    def __init__(self, service_injector, parser):
+    def __init__(self, service_injector, parser, lazy=False, workers=8, profiler=None):
         """
         :param service_injector: A `ServiceInjector` to store the instances
         :param parser: A `ServiceFileParser` to read the definition file
+        :param lazy: If the services that do not declare `lazy` are built on the first access
+            to their instance instead of when they are recorded
+        :param workers: Maximum number of services built at the same time, 1 builds them one
+            after another
+        :param profiler: A `BootProfiler` measuring the services, they are all built when
+            recorded and one after another then, so none is built once the profile is over
         """
         self.service_injector = service_injector
         self.parser = parser
+        self.lazy = lazy
+        self.workers = workers if profiler is None else 1
+        self.profiler = profiler
 
     def record(self, file_location) -> None:
         """
         :param file_location: Location of the service definition file
+        :raises FileCannotBeParsed, DependencyDoesNotExist, CircularDependency:
         """
         self.parser.set_filepath(file_location)
         if not self.parser.can_be_parsed():
             raise FileCannotBeParsed
-        for service in self.parser.parse_line():
-            instance = self.__create_service(service)
+        definitions = list(self.parser.parse_line())
+        levels = ServiceRecorder.__sort_in_levels(
+            definitions,
+            self.service_injector.service_consumer.services
+        )
+        services = {}
+        with ThreadPoolExecutor(max(self.workers, 1)) as executor:
+            for level in levels:
+                services.update(self.__create_level(level, services, executor))
+        # Registered in the order of the file, subscribers are notified in that order
+        for service in definitions:
             self.service_injector.service_consumer.register_service(
                 service.identifier,
-                instance
+                services[service.identifier]
             )
 
-    def __create_service(self, service_definition) -> object:
-        class_name, module = ServiceRecorder.__separate_class_and_module(
-            service_definition.class_path
-        )
-        new_instance = ServiceRecorder.__generate_instance(
-            module,
-            class_name,
-            self.__to_instance(service_definition.dependencies) # get dependency instances
-        )
+    def __create_level(self, level, services, executor) -> dict:
+        eager = [definition for definition in level if not self.__is_lazy(definition)]
+        if self.workers <= 1 or len(eager) <= 1:
+            return {
+                definition.identifier: self.__create_service(definition, services)
+                for definition in level
+            }
+        futures = {
+            definition.identifier: executor.submit(self.__create_service, definition, services)
+            for definition in eager
+        }
+        created = {
+            definition.identifier: self.__create_service(definition, services)
+            for definition in level
+            if definition.identifier not in futures
+        }
+        created.update({identifier: future.result() for (identifier, future) in futures.items()})
+        return created
+
+    def __is_lazy(self, service_definition) -> bool:
+        if self.profiler is not None:
+            return False
+        return service_definition.lazy if service_definition.lazy is not None else self.lazy
+
+    def __create_service(self, service_definition, services) -> object:
+        if self.__is_lazy(service_definition):
+            return LazyService(
+                service_definition.identifier,
+                partial(self.__build, service_definition, services),
+                service_definition.tags
+            )
         return Service(
             service_definition.identifier,
-            new_instance,
+            self.__build(service_definition, services),
             service_definition.tags
         )
 
-    def __to_instance(self, dependencies = []):
+    def __build(self, service_definition, services) -> object:
+        class_name, module = ServiceRecorder.__separate_class_and_module(
+            service_definition.class_path
+        )
+        arguments = self.__to_instance(service_definition.dependencies, services)
+        if self.profiler is not None:
+            return self.profiler.build(
+                service_definition.identifier,
+                partial(ServiceRecorder.__get_class, module, class_name),
+                arguments
+            )
+        return ServiceRecorder.__generate_instance(module, class_name, arguments)
+
+    def __to_instance(self, dependencies, services):
         return [
-            self.service_injector.get_service(dependency).instance for dependency in dependencies
+            dependency.value if isinstance(dependency, Parameter)
+            else services[dependency].instance if dependency in services
+            else self.service_injector.get_service(dependency).instance
+            for dependency in dependencies
         ]
 
+    @staticmethod
+    def __sort_in_levels(definitions, registered) -> list:
+        # Kahn's algorithm, each level only depends on the previous ones
+        declared = {definition.identifier for definition in definitions}
+        pending = {}
+        for definition in definitions:
+            dependencies = set()
+            for dependency in definition.dependencies:
+                if isinstance(dependency, Parameter) or dependency in registered:
+                    continue
+                if dependency not in declared:
+                    raise DependencyDoesNotExist(
+                        '{0} depends on {1}'.format(definition.identifier, dependency)
+                    )
+                dependencies.add(dependency)
+            pending[definition.identifier] = (definition, dependencies)
+        levels = []
+        while pending:
+            level = [
+                definition for (definition, dependencies) in pending.values()
+                if dependencies.isdisjoint(pending)
+            ]
+            if not level:
+                raise CircularDependency(ServiceRecorder.__find_cycle(pending))
+            for definition in level:
+                del pending[definition.identifier]
+            levels.append(level)
+        return levels
+
+    @staticmethod
+    def __find_cycle(pending) -> str:
+        # Every pending service depends on another pending one, following them loops
+        path = [next(iter(pending))]
+        while path.count(path[-1]) < 2:
+            path.append(min(pending[path[-1]][1].intersection(pending)))
+        return ' -> '.join(path[path.index(path[-1]):])
+
     @staticmethod
     def __separate_class_and_module(full_path) -> tuple:
         last_separator_char = full_path.rfind('.')
@@ -123,12 +234,9 @@ class ServiceRecorder:
 
     @staticmethod
     def __get_class(module_name, class_name):
-        parts = module_name.split('.')
-        module_reference = __import__(module_name)
-        parts.append(class_name)
-        for folder in parts[1:]:
-            module_reference = getattr(module_reference, folder)
-        return module_reference
+        # Services are built in several threads, `import_module` waits for a module being
+        # imported by another thread instead of returning it half initialised
+        return getattr(import_module(module_name), class_name)
 
     @staticmethod
     def __generate_instance(module_name, class_name, args=None) -> object:
@@ -147,6 +255,43 @@ class Service(dict):
         self.tags = tags
 
 
+class LazyService(Service):
+    """
+    A service that is built on the first access to its instance. Threads accessing it at the
+    same time wait for a single build.
+    """
+
+    def __init__(self, identifier, factory, tags):
+        """
+        :param identifier: An unique identifier for the service
+        :param factory: Function without arguments that builds the instance
+        :param tags: Tags of the service
+        """
+        self.factory = factory
+        # Reentrant, so a dependency cycle fails instead of blocking the thread forever
+        self.lock = threading.RLock()
+        self.built = False
+        super(LazyService, self).__init__(identifier, None, tags)
+
+    @property
+    def instance(self) -> object:
+        """
+        :return: The instance of the service, built on the first call
+        """
+        if not self.built:
+            with self.lock:
+                if not self.built:
+                    self._instance = self.factory()
+                    self.factory = None
+                    self.built = True
+        return self._instance
+
+    @instance.setter
+    def instance(self, instance) -> None:
+        self._instance = instance
+        self.built = instance is not None
+
+
 class ServiceFileParser:
     """
     Abstract class that defines the methods that are required for a parser to be
@@ -189,24 +334,129 @@ class YamlServiceFileParser(ServiceFileParser):
     def parse_line(self) -> Generator:
         with open(self.file, mode='r') as definition_file:
             service_declarations = load(definition_file.read(), Loader)
+            parameters = service_declarations.get('parameters') or {}
             for (service_id, definition) in service_declarations['services'].items():
-                yield self.__transform_service_definition(service_id, definition)
+                yield self.__transform_service_definition(service_id, definition, parameters)
 
     @staticmethod
-    def __transform_service_definition(service_id, definition) -> object:
+    def __transform_service_definition(service_id, definition, parameters) -> object:
         service_definition = ServiceDefinition(
             service_id,
             definition['class']
         )
         if 'arguments' in definition:
             for dependency in definition['arguments']:
-                service_definition.add_dependency(dependency)
+                if YamlServiceFileParser.__is_parameter(dependency):
+                    service_definition.add_parameter(
+                        YamlServiceFileParser.__get_parameter(parameters, dependency[1:-1])
+                    )
+                else:
+                    service_definition.add_dependency(dependency)
 
         if 'tags' in definition:
             for tag_definition in definition['tags']:
                 service_definition.add_tag(tag_definition)
+        if 'lazy' in definition:
+            service_definition.lazy = YamlServiceFileParser.__to_lazy(
+                service_id,
+                definition['lazy']
+            )
         return service_definition
 
+    @staticmethod
+    def __to_lazy(service_id, value) -> bool:
+        # A quoted 'false' is a string, which would be true
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+        raise LazyFlagInvalid('{0}: {1!r}'.format(service_id, value))
+
+    @staticmethod
+    def __is_parameter(argument) -> bool:
+        return isinstance(argument, str) and len(argument) > 2 and \
+            argument.startswith('%') and argument.endswith('%')
+
+    @staticmethod
+    def __get_parameter(parameters, name) -> object:
+        if name not in parameters:
+            raise ParameterDoesNotExist(name)
+        return parameters[name]
+
+
+class CompiledServiceFileParser(ServiceFileParser):
+    """
+    Parses a definition file with another parser only when it has changed since it was
+    compiled. The parsed definitions are stored in a pickle, so starting a process only has to
+    load them.
+    """
+    FORMAT_VERSION = 1
+
+    def __init__(self, parser, compiled_file):
+        """
+        :param parser: The `ServiceFileParser` of the definition file
+        :param compiled_file: Location of the compiled definitions
+        """
+        super(CompiledServiceFileParser, self).__init__()
+        self.parser = parser
+        self.compiled_file = compiled_file
+
+    def set_filepath(self, file):
+        super(CompiledServiceFileParser, self).set_filepath(file)
+        self.parser.set_filepath(file)
+
+    def can_be_parsed(self) -> bool:
+        return self.parser.can_be_parsed()
+
+    def parse_line(self) -> Generator:
+        definitions = self.__load()
+        if definitions is None:
+            definitions = self.compile()
+        yield from definitions
+
+    def compile(self) -> list:
+        """
+        Parses the definition file and stores the definitions in the compiled file. The
+        definitions are still returned when the compiled file cannot be written.
+
+        :return: List of ServiceDefinition
+        """
+        source = self.__source()
+        definitions = list(self.parser.parse_line())
+        temporary_file = '{0}.{1}.tmp'.format(self.compiled_file, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.compiled_file) or '.', exist_ok=True)
+            with open(temporary_file, mode='wb') as compiled_file:
+                pickle.dump(
+                    (CompiledServiceFileParser.FORMAT_VERSION, source, definitions),
+                    compiled_file,
+                    pickle.HIGHEST_PROTOCOL
+                )
+            # Processes starting at the same time never read a file half written
+            os.replace(temporary_file, self.compiled_file)
+            logging.debug('Service definitions compiled into {0}'.format(self.compiled_file))
+        except OSError:
+            logging.warning('Service definitions cannot be compiled', exc_info=True)
+        return definitions
+
+    def __load(self):
+        try:
+            with open(self.compiled_file, mode='rb') as compiled_file:
+                (version, source, definitions) = pickle.load(compiled_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.PickleError):
+            logging.warning('Compiled service definitions cannot be read', exc_info=True)
+            return None
+        if version != CompiledServiceFileParser.FORMAT_VERSION or source != self.__source():
+            return None
+        return definitions
+
+    def __source(self) -> tuple:
+        # The definition file has changed when its path, size or modification time differ
+        stat = os.stat(self.file)
+        return os.path.abspath(self.file), stat.st_size, stat.st_mtime_ns
+
 
 class ServiceDefinition:
     """
@@ -222,6 +472,8 @@ class ServiceDefinition:
         self.class_path = class_path
         self.dependencies = []
         self.tags = []
+        # None when the definition does not declare it, the `ServiceRecorder` decides then
+        self.lazy = None
 
     def add_dependency(self, identifier) -> None:
         """
@@ -233,6 +485,14 @@ class ServiceDefinition:
             raise DependencyAlreadyExists
         self.dependencies.append(identifier)
 
+    def add_parameter(self, value) -> None:
+        """
+        Adds a literal argument to this service, it is passed as is to the constructor
+
+        :param value: The value of the argument
+        """
+        self.dependencies.append(Parameter(value))
+
     def add_tag(self, tag_definition) -> None:
         """
         Adds a tag to a ServiceDefinition to be managed by an external service
@@ -242,6 +502,16 @@ class ServiceDefinition:
         self.tags.append(tag_definition)
 
 
+class Parameter:
+    """
+    A literal argument of a service, declared in the `parameters` section of the definition
+    file and referenced by `%name%`
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
 class ServiceAlreadyExists(Exception):
     """
     A service has been already been registered
@@ -254,13 +524,37 @@ class ServiceDoesNotExist(Exception):
     """
 
 
+class DependencyDoesNotExist(ServiceDoesNotExist):
+    """
+    A service depends on a service that is not declared
+    """
+
+
+class CircularDependency(Exception):
+    """
+    Services depend on each other, so none of them can be built
+    """
+
+
 class DependencyAlreadyExists(Exception):
     """
     A dependency is already been registered in a service
     """
 
 
+class ParameterDoesNotExist(Exception):
+    """
+    A service references a parameter that is not declared
+    """
+
+
 class FileCannotBeParsed(Exception):
     """
     A file is incompatible with a parser
     """
+
+
+class LazyFlagInvalid(Exception):
+    """
+    The `lazy` flag of a service has to be a boolean, `true` or `false`
+    """
@@ -1,11 +1,38 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import threading
+import time
+
 
 class SimpleBus:
     """
-    Searches an appropriate handler for a command
+    Searches an appropriate handler for a command. The handler of each DTO class, wrapped in
+    the middleware that applies to it, is resolved on its first execution and reused.
+
+    Independent operations can be executed concurrently on a pool of threads shared by all
+    the callers, started on the first concurrent execution.
     """
 
-    def __init__(self):
-        self.operation_provider = OperationProvider()
+    def __init__(self, max_workers=8, middleware=None):
+        """
+        :param max_workers: Maximum number of operations executed concurrently
+        :param middleware: List of `Middleware`, the first one is the outermost
+        """
+        self.middleware = list(middleware or [])
+        self.chains = {}
+        self.batch_chains = {}
+        self.operation_provider = OperationProvider(self.__clear_chains)
+        self.max_workers = max_workers
+        self.executor = None
+        self.busy = 0
+        self.lock = threading.Lock()
+
+    def add_middleware(self, middleware) -> None:
+        """
+        :param middleware: A `Middleware` wrapped inside the ones already added
+        """
+        self.middleware.append(middleware)
+        self.__clear_chains()
 
     def execute(self, operation):
         """
@@ -13,42 +40,229 @@ class SimpleBus:
 
         :param operation: a DTO class
         """
-        module_name = operation.__class__.__module__
-        class_name = operation.__class__.__name__
-        handler = self.__get_handler(
-            '{0}.{1}'.format(module_name, class_name)
-        )
-        return handler.invoke(operation)
+        try:
+            chain = self.chains[operation.__class__]
+        except KeyError:
+            chain = self.__compile(operation.__class__)
+        return chain(operation)
 
-    def __get_handler(self, command_class) -> object:
-        if not self.operation_provider.is_operation(command_class):
-            raise HandlerNotFound
-        return self.operation_provider.operations[command_class]
+    def execute_batch(self, operations) -> list:
+        """
+        Executes a sequence of operations grouped by their handler, so each handler receives
+        its operations in one `invoke_batch` call, in the order they were given. DTO classes
+        sharing a handler, such as subclasses, share the call when the same middleware applies
+        to them.
+
+        The groups run one after another, in the order of their first operation, so operations
+        of different handlers do not run in the order they were given: in `[a1, b1, a2]` the
+        operation `a2` runs before `b1`.
+
+        :param operations: List of DTO
+        :return: List with the result of each operation, in the same order
+        """
+        groups = {}
+        for (index, operation) in enumerate(operations):
+            try:
+                (key, chain) = self.batch_chains[operation.__class__]
+            except KeyError:
+                (key, chain) = self.__compile_batch(operation.__class__)
+            if key not in groups:
+                groups[key] = (chain, [], [])
+            groups[key][1].append(index)
+            groups[key][2].append(operation)
+        results = [None] * len(operations)
+        for (chain, indexes, batch) in groups.values():
+            batch_results = chain(batch)
+            if batch_results is not None:
+                for (index, result) in zip(indexes, batch_results):
+                    results[index] = result
+        return results
+
+    def execute_many(self, operations, timeout=None) -> list:
+        """
+        Executes independent operations concurrently. Operations must not execute other
+        operations concurrently, as they could wait for a thread of the pool forever.
+
+        An operation that times out while running cannot be stopped, it keeps its thread of
+        the pool until it finishes. When every thread is busy the operations that do not get
+        one run in the calling thread, one after another, instead of waiting in the queue. The
+        ones not started when the timeout expires time out without running, but one already
+        running in the calling thread is waited for, so it can exceed the timeout.
+
+        :param operations: List of DTO
+        :param timeout: Maximum seconds to wait for the operations, or None to wait forever
+        :return: List with the result of each operation, in the same order
+        :raises OperationsFailed: When any operation fails or times out, once the rest have
+            finished or the timeout has expired
+        """
+        executor = self.__get_executor()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        futures = []
+        for operation in operations:
+            if self.__reserve():
+                future = executor.submit(self.execute, operation)
+                future.add_done_callback(self.__release)
+                futures.append(future)
+            else:
+                futures.append(None)
+        for (index, future) in enumerate(futures):
+            if future is None:
+                futures[index] = self.__execute_here(operations[index], deadline)
+        results = []
+        errors = []
+        for (index, future) in enumerate(futures):
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                results.append(future.result(remaining))
+            except FutureTimeoutError:
+                future.cancel()
+                results.append(None)
+                errors.append((index, OperationTimedOut(operations[index])))
+            except Exception as error:
+                results.append(None)
+                errors.append((index, error))
+        if errors:
+            raise OperationsFailed(errors, results)
+        return results
+
+    async def execute_async(self, operation, timeout=None):
+        """
+        Executes an operation in the pool of threads without blocking the event loop. The
+        operation waits in the queue when every thread is busy, and it counts as busy until it
+        finishes, so `execute_many` runs its operations in the calling thread meanwhile.
+
+        :param operation: a DTO class
+        :param timeout: Maximum seconds the operation can take, or None to wait forever
+        :return: The result of the operation
+        :raises OperationTimedOut:
+        """
+        executor = self.__get_executor()
+        with self.lock:
+            self.busy += 1
+        future = executor.submit(self.execute, operation)
+        future.add_done_callback(self.__release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            raise OperationTimedOut(operation)
+
+    def shutdown(self, wait=True) -> None:
+        """
+        Stops the pool of threads
+
+        :param wait: If the operations being executed are waited for
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait)
+
+    def __reserve(self) -> bool:
+        with self.lock:
+            if self.busy >= self.max_workers:
+                return False
+            self.busy += 1
+            return True
+
+    def __release(self, future) -> None:
+        with self.lock:
+            self.busy -= 1
+
+    def __execute_here(self, operation, deadline) -> Future:
+        future = Future()
+        if deadline is not None and time.monotonic() >= deadline:
+            future.set_exception(OperationTimedOut(operation))
+            return future
+        try:
+            future.set_result(self.execute(operation))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def __get_executor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix='simple-bus'
+                )
+            return self.executor
+
+    def __clear_chains(self) -> None:
+        self.chains.clear()
+        self.batch_chains.clear()
+
+    def __compile_batch(self, operation_class):
+        handler = self.operation_provider.resolve(operation_class)
+        middleware = tuple(item for item in self.middleware if item.applies_to(operation_class))
+        chain = handler.invoke_batch
+        for item in reversed(middleware):
+            chain = SimpleBus.__wrap_batch(item, chain)
+        # Classes with the same handler and middleware are executed in the same batch
+        self.batch_chains[operation_class] = ((handler, middleware), chain)
+        return self.batch_chains[operation_class]
+
+    @staticmethod
+    def __wrap_batch(middleware, proceed):
+        return lambda operations: middleware.execute_batch(operations, proceed)
+
+    def __compile(self, operation_class):
+        chain = self.operation_provider.resolve(operation_class).invoke
+        for middleware in reversed(self.middleware):
+            if middleware.applies_to(operation_class):
+                chain = SimpleBus.__wrap(middleware, chain)
+        self.chains[operation_class] = chain
+        return chain
+
+    @staticmethod
+    def __wrap(middleware, proceed):
+        return lambda operation: middleware.execute(operation, proceed)
 
 
 class OperationProvider:
-    def __init__(self):
+    def __init__(self, on_record=None):
+        """
+        :param on_record: Function without arguments called when a handler is recorded
+        """
         self.operations = {}
+        self.resolved = {}
+        self.on_record = on_record
 
     def record(self, dto_class, handler) -> None:
         """
         Records a operation handler in the bus
 
-        :param dto_class: <module>.<class> full qualifier
+        :param dto_class: The class of the DTO, it also handles its subclasses
         :param handler: instance of the service which will handle the request
         """
-        identifier = '{0}.{1}'.format(dto_class.__module__, dto_class.__name__)
-        if identifier in self.operations:
+        if dto_class in self.operations:
             raise HandlerAlreadyExists
-        self.operations[identifier] = handler
+        self.operations[dto_class] = handler
+        self.resolved.clear()
+        if self.on_record is not None:
+            self.on_record()
 
     def is_operation(self, operation_class) -> bool:
         """
-        :param operation_class: The classname as string
+        :param operation_class: The class of the DTO
         :return: If the operation is already registered
         """
         return operation_class in self.operations
 
+    def resolve(self, operation_class) -> object:
+        """
+        :param operation_class: The class of the DTO
+        :return: The handler of the class, or of its closest parent class
+        :raises HandlerNotFound:
+        """
+        handler = self.resolved.get(operation_class)
+        if handler is not None:
+            return handler
+        for parent_class in operation_class.__mro__:
+            if parent_class in self.operations:
+                handler = self.resolved[operation_class] = self.operations[parent_class]
+                return handler
+        raise HandlerNotFound
+
 
 class OperationHandler:
     """
@@ -63,6 +277,77 @@ class OperationHandler:
         """
         raise NotImplementedError()
 
+    def invoke_batch(self, operations):
+        """
+        Executes several operations of the same class, one by one unless the handler can
+        execute them at once
+
+        :param operations: List of DTO
+        :return: List with the result of each operation
+        """
+        return [self.invoke(operation) for operation in operations]
+
+
+class ServiceOperationHandler(OperationHandler):
+    """
+    Adapts an application service with a `handle` method to the bus. The service is built on
+    its first operation when it is lazy.
+    """
+
+    def __init__(self, service):
+        """
+        :param service: The `Service` of the `ServiceInjector`
+        """
+        self.service = service
+
+    def invoke(self, operation):
+        return self.service.instance.handle(operation)
+
+    def invoke_batch(self, operations):
+        instance = self.service.instance
+        if hasattr(instance, 'handle_batch'):
+            return instance.handle_batch(operations)
+        return [instance.handle(operation) for operation in operations]
+
+
+class Middleware:
+    """
+    Behaviour wrapped around the handlers of the bus, such as timing, transactions or caching
+    """
+
+    def applies_to(self, operation_class) -> bool:
+        """
+        :param operation_class: The class of a DTO
+        :return: If the middleware wraps the handler of the DTO, it is asked once per class
+        """
+        return True
+
+    def execute(self, operation, proceed):
+        """
+        :param operation: DTO with data
+        :param proceed: Function running the rest of the chain with a DTO
+        :return: The result of the operation
+        """
+        raise NotImplementedError()
+
+    def execute_batch(self, operations, proceed):
+        """
+        Wraps each operation with `execute`, so the rest of the chain runs once per operation.
+        Middleware that can wrap the whole batch at once overrides it.
+
+        :param operations: List of DTO of the same class
+        :param proceed: Function running the rest of the chain with a list of DTO
+        :return: List with the result of each operation, or None
+        """
+        return [
+            self.execute(operation, lambda item: Middleware.__first(proceed([item])))
+            for operation in operations
+        ]
+
+    @staticmethod
+    def __first(results):
+        return results[0] if results is not None else None
+
 
 class HandlerNotFound(Exception):
     """
@@ -74,3 +359,32 @@ class HandlerAlreadyExists(Exception):
     """
     A handler has already be defined
     """
+
+
+class OperationTimedOut(Exception):
+    """
+    An operation has not finished in the time it was given
+    """
+
+    def __init__(self, operation):
+        super().__init__(type(operation).__name__)
+        self.operation = operation
+
+
+class OperationsFailed(Exception):
+    """
+    Some of the operations executed concurrently have failed
+    """
+
+    def __init__(self, errors, results):
+        """
+        :param errors: List of (index of the operation, exception)
+        :param results: List with the result of each operation, None for the failed ones
+        """
+        super().__init__('{0} of {1} operations failed: {2}'.format(
+            len(errors),
+            len(results),
+            ', '.join('#{0} {1!r}'.format(index, error) for (index, error) in errors)
+        ))
+        self.errors = errors
+        self.results = results
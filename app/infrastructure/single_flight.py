@@ -0,0 +1,117 @@
+import threading
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call with a key is in flight, the callers
+    with the same key wait for it and share its result, or its exception, instead of running
+    their own. Nothing is kept once the call has finished, so results are never stale.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, function) -> object:
+        """
+        :param key: Hashable key of the call
+        :param function: Function without arguments running the call
+        :return: The result of the call, shared with the concurrent callers of the same key
+        """
+        with self.lock:
+            self.calls += 1
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = Flight()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            return flight.wait()
+        try:
+            flight.result = function()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self) -> dict:
+        """
+        :return: The counters of the calls
+        """
+        with self.lock:
+            return {
+                'in_flight': len(self.flights),
+                'calls': self.calls,
+                'coalesced': self.coalesced
+            }
+
+
+class Flight:
+    """
+    A call in progress of a `SingleFlight`
+    """
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self) -> object:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlightHandler:
+    """
+    Decorates a query handler so identical concurrent queries are handled once
+    """
+
+    def __init__(self, handler, single_flight=None):
+        """
+        :param handler: The query handler
+        :param single_flight: The `SingleFlight` holding the calls in flight, a new one by default
+        """
+        self.handler = handler
+        self.single_flight = single_flight or SingleFlight()
+
+    def handle(self, query):
+        key = coalescing_key(query)
+        if key is None:
+            return self.handler.handle(query)
+        return self.single_flight.do(key, lambda: self.handler.handle(query))
+
+
+def coalescing_key(operation) -> tuple:
+    """
+    :param operation: A DTO
+    :return: Key made of the class and the fields of the DTO, or None when it cannot be
+        coalesced: its fields are not hashable, or it asks for a stream, which can only be
+        consumed by one caller
+    """
+    if getattr(operation, 'stream', False):
+        return None
+    fields = getattr(operation, '__dict__', None)
+    if fields is None:
+        fields = {
+            name: getattr(operation, name)
+            for cls in type(operation).__mro__
+            for name in getattr(cls, '__slots__', ())
+            if hasattr(operation, name)
+        }
+    key = (type(operation), tuple(sorted(fields.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
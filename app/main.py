@@ -1,11 +1,21 @@
+import atexit
 import logging
+import os
 
+from app.application.adjust_inventory import AdjustInventoryCommand
 from app.application.get_events import GetEventsQuery
 from app.application.get_inventory import GetInventoryOfEventQuery
+from app.application.get_inventory_summary import GetInventorySummaryQuery
 from app.application.persist_event import PersistEventCommand
 from app.application.persist_inventory import PersistInventoryCommand
+from app.application.rebuild_inventory_summary import RebuildInventorySummaryCommand
 from app.domain.model.Event import EventNameInvalid
+from app.domain.model.Inventory import InventoryAmountInvalid, InventoryBelowMinimum
 from app.infrastructure.boot import Boot
+from app.infrastructure.domain_events import DomainEventPublisher
+from app.infrastructure.flask.inventory_batch import InventoryBatchIngestion, to_amount
+from app.infrastructure.flask.streaming import iter_json_documents, ndjson_response, \
+    wants_ndjson
 from flask import Flask, jsonify, request, render_template
 from uuid import uuid4
 
@@ -13,50 +23,89 @@ from uuid import uuid4
 boot = Boot()
 boot.start()
 injector = boot.injector
+# Asynchronous subscribers handle the events already published before the process exits
+atexit.register(DomainEventPublisher.get_instance().shutdown, 5)
+bus = injector.get_service('app.application.bus').instance
+atexit.register(bus.shutdown)
+inventory_batch = InventoryBatchIngestion(bus)
+if os.environ.get('OUTBOX_DISPATCHER', 'process') == 'thread':
+    # The dispatcher runs in its own process by default, see `bin/bash/run.sh`, so the
+    # workers of the application do not drain the outbox as well
+    injector.get_service('app.domain_events.outbox_dispatcher').instance.start()
 app = Flask(__name__, template_folder='infrastructure/flask/templates')
+EVENT_PAGE_SIZE = 50
+PAGE_QUERY_TIMEOUT = 5
 
 
 @app.route('/')
 def index():
-    handler = injector.get_service('app.application.query.get_events').instance
-    return render_template('index.html', events=handler.handle(GetEventsQuery()))
+    return render_template('index.html', events=bus.execute(GetEventsQuery()))
 
 
 @app.route('/<event_id>')
 def inventory_of_event(event_id):
-    handler = injector.get_service('app.application.inventory.query_inventory_of_event').instance
-    return render_template(
-        'inventory_of_id.html', inventory=handler.handle(GetInventoryOfEventQuery(event_id))
+    # Independent queries of a page run concurrently, it waits for the slowest one only
+    (inventory, summary) = bus.execute_many(
+        [GetInventoryOfEventQuery(event_id), GetInventorySummaryQuery(event_id)],
+        PAGE_QUERY_TIMEOUT
     )
+    return render_template('inventory_of_id.html', inventory=inventory, summary=summary)
 
 
 @app.route('/event')
 def get_events():
-    logging.debug('GET all events')
-    handler = injector.get_service('app.application.query.get_events').instance
-    result = handler.handle(GetEventsQuery())
+    if wants_ndjson(request):
+        logging.debug('GET stream of events')
+        return ndjson_response(bus.execute(GetEventsQuery(stream=True)))
+    logging.debug('GET page of events')
+    result = bus.execute(GetEventsQuery(
+        after=request.args.get('after'),
+        limit=max(request.args.get('limit', EVENT_PAGE_SIZE, type=int), 1)
+    ))
     return jsonify(result)
 
 
 @app.route('/event/<identifier>')
 def get_event(identifier):
     logging.debug('GET event with ID')
-    handler = injector.get_service('app.application.query.get_events').instance
-    result = handler.handle(GetEventsQuery(identifier))
+    result = bus.execute(GetEventsQuery(identifier))
     return jsonify(result)
 
 
+@app.route('/inventory/<event_id>')
+def get_inventory_of_event(event_id):
+    logging.debug('GET inventory of event')
+    if wants_ndjson(request):
+        return ndjson_response(bus.execute(GetInventoryOfEventQuery(event_id, stream=True)))
+    return jsonify(bus.execute(GetInventoryOfEventQuery(event_id)))
+
+
+@app.route('/inventory/<event_id>/summary')
+def get_inventory_summary(event_id):
+    logging.debug('GET inventory summary of event')
+    handler = injector.get_service('app.application.inventory.query_inventory_summary').instance
+    return jsonify(handler.handle(GetInventorySummaryQuery(event_id)))
+
+
+@app.route('/inventory/summary/rebuild', methods=['POST'])
+def rebuild_inventory_summary():
+    logging.debug('POST rebuild inventory summary')
+    __execute_command(
+        'app.application.inventory.rebuild_inventory_summary',
+        RebuildInventorySummaryCommand(request.form.get('event_id'))
+    )
+    return jsonify({'response': 'done'})
+
+
 @app.route('/event', methods=['POST', 'PATCH'])
 def post_event():
     logging.debug('POST new event')
     if request.form['name'] is None:
         logging.debug('POST failed: no name was attached')
         return jsonify({'response': 'failed', 'reason': 'no name was attached'})
-    handler = injector.get_service(
-        'app.application.command.persist_event'
-    ).instance
     try:
-        handler.handle(
+        __execute_command(
+            'app.application.command.persist_event',
             PersistEventCommand(
                 uuid4(),
                 request.form['name']
@@ -70,27 +119,75 @@ def post_event():
 @app.route('/inventory', methods=['POST'])
 def post_inventory():
     logging.debug('POST new inventory')
+    logging.debug('Fields attached to the request: {0}'.format(request.form))
     if not __is_valid_inventory_request(request.form):
         logging.debug('POST failed: field missing')
         return jsonify({'response': 'failed', 'reason': 'field missing'})
-    handler = injector.get_service(
-        'app.application.inventory.persist_inventory'
-    ).instance
-    handler.handle(
-        PersistInventoryCommand(
-            uuid4(),
-            request.form['event_id'],
-            request.form['amount'],
-            request.form['seller_name']
+    try:
+        __execute_command(
+            'app.application.inventory.persist_inventory',
+            PersistInventoryCommand(
+                uuid4(),
+                request.form['event_id'],
+                to_amount(request.form['amount']),
+                request.form['seller_name']
+            )
         )
-    )
+    except InventoryAmountInvalid:
+        return jsonify({'response': 'failed', 'reason': 'invalid amount'})
+    return jsonify({'response': 'done'})
+
+
+@app.route('/inventory/batch', methods=['POST'])
+def post_inventory_batch():
+    # The body is a JSON array or NDJSON, the result of each row is streamed as NDJSON while the
+    # body is read, followed by a summary
+    logging.debug('POST batch of inventory')
+    return ndjson_response(inventory_batch.ingest(iter_json_documents(request.stream)))
+
+
+@app.route('/inventory/adjust', methods=['POST'])
+def adjust_inventory():
+    logging.debug('POST inventory adjustment')
+    if not __is_valid_adjustment_request(request.form):
+        logging.debug('POST failed: field missing')
+        return jsonify({'response': 'failed', 'reason': 'field missing'})
+    minimum = request.form.get('minimum')
+    try:
+        __execute_command(
+            'app.application.inventory.adjust_inventory',
+            AdjustInventoryCommand(
+                request.form['event_id'],
+                request.form['seller_name'],
+                to_amount(request.form['delta']),
+                to_amount(minimum) if minimum is not None else None
+            )
+        )
+    except InventoryAmountInvalid:
+        return jsonify({'response': 'failed', 'reason': 'invalid amount'})
+    except InventoryBelowMinimum:
+        return jsonify({'response': 'failed', 'reason': 'not enough inventory'})
     return jsonify({'response': 'done'})
 
 
+def __execute_command(handler_id, command):
+    # All the aggregates stored by the command are written at once when it finishes
+    unit_of_work = injector.get_service('app.persistence.mongodb.unit_of_work').instance
+    with unit_of_work:
+        injector.get_service(handler_id).instance.handle(command)
+
+
 def __is_valid_inventory_request(body):
-    logging.debug('Fields attached to the request: {0}'.format(body))
     REQUIRED_FIELDS = ['event_id', 'amount', 'seller_name']
     for field in REQUIRED_FIELDS:
         if field not in body:
             return False
     return True
+
+
+def __is_valid_adjustment_request(body):
+    REQUIRED_FIELDS = ['event_id', 'delta', 'seller_name']
+    for field in REQUIRED_FIELDS:
+        if field not in body:
+            return False
+    return True
@@ -0,0 +1,7 @@
+#!/usr/bin/env bash
+
+set -e
+
+BENCHMARK=${1:-hydration}
+shift || true
+python -m "app.infrastructure.benchmark.${BENCHMARK}" "$@"
@@ -2,4 +2,9 @@
 
 set -e
 
-FLASK_APP=app/main.py FLASK_ENV=development python -m flask run
\ No newline at end of file
+# The deferred domain events are delivered by a single dispatcher process
+python -m app.infrastructure.outbox_dispatcher &
+DISPATCHER=$!
+trap 'kill $DISPATCHER' EXIT
+
+FLASK_APP=app/main.py FLASK_ENV=development python -m flask run
@@ -0,0 +1,45 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.application.get_events import GetEvents, GetEventsQuery
+from app.domain.model.Event import Event, EventId, EventName
+
+
+class GetEventsTest(TestCase):
+    def setUp(self) -> None:
+        self.repository = MagicMock()
+        self.read_model = MagicMock()
+        self.handler = GetEvents(self.repository, self.read_model)
+
+    def test_page_has_a_next_cursor(self):
+        self.read_model.slice.return_value = [self.__record('a'), self.__record('b')]
+        result = self.handler.handle(GetEventsQuery(after='0', limit=1))
+        self.read_model.slice.assert_called_with('0', 2)
+        self.assertEqual([{'id': 'a', 'name': 'Event named a'}], result['events'])
+        self.assertEqual('a', result['next'])
+
+    def test_last_page_has_no_next_cursor(self):
+        self.read_model.slice.return_value = [self.__record('a')]
+        result = self.handler.handle(GetEventsQuery(limit=1))
+        self.read_model.slice.assert_called_with(None, 2)
+        self.assertIsNone(result['next'])
+
+    def test_page_size_is_bounded(self):
+        self.read_model.slice.return_value = []
+        self.handler.handle(GetEventsQuery(limit=GetEvents.MAX_PAGE_SIZE * 2))
+        self.read_model.slice.assert_called_with(None, GetEvents.MAX_PAGE_SIZE + 1)
+
+    def test_listings_do_not_build_aggregates(self):
+        self.read_model.iter_all.return_value = iter([self.__record('a')])
+        self.assertEqual([self.__record('a')], self.handler.handle(GetEventsQuery()))
+        self.repository.all.assert_not_called()
+        self.repository.iter_all.assert_not_called()
+
+    def test_event_of_id_is_read_from_the_repository(self):
+        self.repository.of_id.return_value = Event(EventId('a'), EventName('Event named a'))
+        self.assertEqual(self.__record('a'), self.handler.handle(GetEventsQuery('a')))
+        self.read_model.slice.assert_not_called()
+
+    @staticmethod
+    def __record(identifier):
+        return {'id': identifier, 'name': 'Event named {0}'.format(identifier)}
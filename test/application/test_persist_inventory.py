@@ -0,0 +1,34 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.application.persist_inventory import PersistInventory, PersistInventoryCommand
+from app.domain.model.Inventory import InventoryAmount, InventoryUpdated
+
+
+class PersistInventoryTest(TestCase):
+    def setUp(self) -> None:
+        self.repository = MagicMock()
+        self.handler = PersistInventory(self.repository)
+
+    def test_batch_is_persisted_at_once(self):
+        identifiers = self.handler.handle_batch([
+            PersistInventoryCommand('first', 'event', 1, 'seller'),
+            PersistInventoryCommand('second', 'event', 2, 'other')
+        ])
+        self.repository.persist.assert_not_called()
+        (inventories,), _ = self.repository.persist_many.call_args
+        self.assertEqual(
+            ['first', 'second'],
+            [inventory.identifier.identifier for inventory in inventories]
+        )
+        self.assertEqual([2], [inventory.amount.amount for inventory in inventories[1:]])
+        self.assertIsInstance(inventories[0].events[0], InventoryUpdated)
+        self.assertEqual(['first', 'second'], identifiers)
+
+    def test_replaced_inventory_publishes_its_amount(self):
+        identifier = self.handler.handle(PersistInventoryCommand('new', 'event', 2, 'seller'))
+        self.assertEqual('new', identifier)
+        self.assertEqual(['persist'], [name for (name, _, _) in self.repository.mock_calls])
+        (inventory,), _ = self.repository.persist.call_args
+        self.assertEqual(InventoryAmount(2), inventory.events[0].amount)
+        self.assertIsNone(inventory.events[0].delta)
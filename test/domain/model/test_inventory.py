@@ -0,0 +1,46 @@
+import pickle
+from unittest import TestCase
+
+from app.domain.model.Event import EventId
+from app.domain.model.Inventory import Inventory, InventoryId, InventoryAmount, SellerName, \
+    InventoryUpdated
+from app.infrastructure.domain_events import ValueObjectIsImmutable
+
+
+class InventoryTest(TestCase):
+    def test_value_objects_are_compared_by_value(self):
+        self.assertEqual(InventoryAmount(5), InventoryAmount(5))
+        self.assertNotEqual(InventoryAmount(5), InventoryAmount(6))
+        self.assertNotEqual(InventoryId('seller'), SellerName('seller'))
+        self.assertEqual(1, len({SellerName('seller'), SellerName('seller')}))
+
+    def test_value_objects_are_immutable(self):
+        amount = InventoryAmount(5)
+        with self.assertRaises(ValueObjectIsImmutable):
+            amount.amount = 6
+        with self.assertRaises(AttributeError):
+            amount.other = 6
+        self.assertEqual(5, amount.amount)
+
+    def test_hydrated_inventory_has_no_event_buffer(self):
+        inventory = self.__inventory()
+        self.assertFalse(hasattr(inventory, '__dict__'))
+        self.assertIsNone(inventory._events)
+        self.assertEqual(0, len(inventory.events))
+        inventory.clear()
+        self.assertIsNone(inventory._events)
+
+    def test_inventory_updated_is_recorded_and_survives_pickling(self):
+        inventory = self.__inventory()
+        inventory.inventory_updated(InventoryAmount(-2))
+        event = pickle.loads(pickle.dumps(inventory.events[0], pickle.HIGHEST_PROTOCOL))
+        self.assertIsInstance(event, InventoryUpdated)
+        self.assertEqual(EventId('event'), event.event_id)
+        self.assertEqual(InventoryAmount(-2), event.delta)
+        self.assertEqual(inventory.events[0].occurred_on, event.occurred_on)
+
+    @staticmethod
+    def __inventory():
+        return Inventory(
+            InventoryId('inventory'), EventId('event'), InventoryAmount(10), SellerName('seller')
+        )
@@ -0,0 +1,86 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.application.persist_inventory import PersistInventoryCommand
+from app.domain.model.Inventory import InventoryAmountInvalid
+from app.infrastructure.flask.inventory_batch import InventoryBatchIngestion, to_amount
+
+
+class InventoryBatchIngestionTest(TestCase):
+    def setUp(self) -> None:
+        self.bus = MagicMock()
+        self.bus.execute_batch.side_effect = lambda commands: [
+            'id-{0}'.format(command.amount) for command in commands
+        ]
+        self.ingestion = InventoryBatchIngestion(self.bus, batch_size=2)
+
+    def test_rows_are_stored_in_chunks(self):
+        results = list(self.ingestion.ingest([
+            (InventoryBatchIngestionTest.__row(amount), None) for amount in range(5)
+        ]))
+        self.assertEqual([2, 2, 1], [
+            len(commands) for ((commands,), _) in self.bus.execute_batch.call_args_list
+        ])
+        (commands,), _ = self.bus.execute_batch.call_args_list[0]
+        self.assertIsInstance(commands[0], PersistInventoryCommand)
+        self.assertEqual('event', commands[0].event_id)
+        self.assertEqual(
+            [{'row': row, 'response': 'done', 'id': 'id-{0}'.format(row)} for row in range(5)],
+            results[:-1]
+        )
+        self.assertEqual({'summary': {'rows': 5, 'done': 5, 'failed': 0}}, results[-1])
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        results = list(self.ingestion.ingest([
+            (InventoryBatchIngestionTest.__row(1), None),
+            (None, 'invalid JSON: oops'),
+            ({'event_id': 'event', 'amount': 2}, None),
+            (InventoryBatchIngestionTest.__row('many'), None),
+            (InventoryBatchIngestionTest.__row(4), None)
+        ]))
+        self.assertEqual([
+            {'row': 1, 'response': 'failed', 'reason': 'invalid JSON: oops'},
+            {'row': 2, 'response': 'failed', 'reason': 'field missing'},
+            {'row': 3, 'response': 'failed', 'reason': 'invalid amount'},
+            {'row': 0, 'response': 'done', 'id': 'id-1'},
+            {'row': 4, 'response': 'done', 'id': 'id-4'},
+            {'summary': {'rows': 5, 'done': 2, 'failed': 3}}
+        ], results)
+
+    def test_failed_chunk_is_reported_as_partially_stored(self):
+        self.bus.execute_batch.side_effect = [RuntimeError(), ['id-2', 'id-3']]
+        results = list(self.ingestion.ingest([
+            (InventoryBatchIngestionTest.__row(amount), None) for amount in range(4)
+        ]))
+        self.assertEqual([
+            {'row': 0, 'response': 'failed', 'reason': 'may be partially stored'},
+            {'row': 1, 'response': 'failed', 'reason': 'may be partially stored'},
+            {'row': 2, 'response': 'done', 'id': 'id-2'},
+            {'row': 3, 'response': 'done', 'id': 'id-3'},
+            {'summary': {'rows': 4, 'done': 2, 'failed': 2}}
+        ], results)
+
+    def test_results_are_yielded_while_the_rows_are_read(self):
+        results = self.ingestion.ingest(
+            (InventoryBatchIngestionTest.__row(amount), None) for amount in range(4)
+        )
+        next(results)
+        self.assertEqual(1, self.bus.execute_batch.call_count)
+
+    def test_empty_body_only_has_the_summary(self):
+        self.assertEqual(
+            [{'summary': {'rows': 0, 'done': 0, 'failed': 0}}],
+            list(self.ingestion.ingest([]))
+        )
+        self.bus.execute_batch.assert_not_called()
+
+    def test_amount_is_an_integer(self):
+        self.assertEqual(3, to_amount('3'))
+        self.assertEqual(3, to_amount(3))
+        for value in ('three', 3.5, True, None):
+            with self.assertRaises(InventoryAmountInvalid):
+                to_amount(value)
+
+    @staticmethod
+    def __row(amount):
+        return {'event_id': 'event', 'amount': amount, 'seller_name': 'seller'}
@@ -0,0 +1,102 @@
+import io
+import json
+from unittest import TestCase
+
+from flask import Flask, request
+
+from app.infrastructure.flask import streaming
+from app.infrastructure.flask.streaming import iter_json_documents, ndjson_response, \
+    wants_ndjson, NDJSON_MIMETYPE
+
+
+class StreamingTest(TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+
+    def test_stream_is_requested_by_query_string(self):
+        with self.app.test_request_context('/event?stream=1'):
+            self.assertTrue(wants_ndjson(request))
+
+    def test_stream_is_requested_by_accept_header(self):
+        with self.app.test_request_context('/event', headers={'Accept': NDJSON_MIMETYPE}):
+            self.assertTrue(wants_ndjson(request))
+
+    def test_json_is_served_by_default(self):
+        with self.app.test_request_context('/event', headers={'Accept': '*/*'}):
+            self.assertFalse(wants_ndjson(request))
+
+    def test_records_are_written_one_per_line(self):
+        records = ({'id': index} for index in range(3))
+        with self.app.test_request_context('/event'):
+            response = ndjson_response(records)
+            lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(NDJSON_MIMETYPE, response.mimetype)
+        self.assertEqual([{'id': 0}, {'id': 1}, {'id': 2}], [json.loads(line) for line in lines])
+
+    def test_first_record_is_sent_alone(self):
+        chunks = list(streaming._to_chunks({'id': index} for index in range(3)))
+        self.assertEqual(['{"id": 0}\n', '{"id": 1}\n{"id": 2}\n'], chunks)
+
+
+class JsonDocumentsTest(TestCase):
+    def test_array_is_parsed_element_by_element(self):
+        documents = self.__parse(b' [{"amount": 1}, {"amount": 2} ,3] ')
+        self.assertEqual([({'amount': 1}, None), ({'amount': 2}, None), (3, None)], documents)
+
+    def test_array_bigger_than_a_read_is_parsed(self):
+        body = json.dumps([{'amount': index} for index in range(20000)]).encode()
+        self.assertGreater(len(body), streaming.CHUNK_SIZE)
+        documents = self.__parse(body)
+        self.assertEqual(20000, len(documents))
+        self.assertEqual(({'amount': 19999}, None), documents[-1])
+
+    def test_array_is_not_parsed_past_an_invalid_element(self):
+        (first, (document, reason)) = self.__parse(b'[1, {oops}, 3]')
+        self.assertEqual((1, None), first)
+        self.assertIsNone(document)
+        self.assertTrue(reason.startswith('invalid JSON'))
+
+    def test_unterminated_array_is_reported(self):
+        self.assertEqual([(1, None), (None, 'unterminated array')], self.__parse(b'[1, '))
+
+    def test_trailing_comma_is_reported(self):
+        self.assertEqual(
+            [(1, None), (2, None), (None, 'invalid JSON: expected a value after ,')],
+            self.__parse(b'[1, 2,]')
+        )
+
+    def test_data_after_the_array_is_reported(self):
+        self.assertEqual(
+            [(1, None), (None, 'invalid JSON: data after the array')],
+            self.__parse(b'[1] {"amount": 2}')
+        )
+        self.assertEqual(
+            [(None, 'invalid JSON: data after the array')],
+            self.__parse(b'[]' + b' ' * streaming.CHUNK_SIZE + b'x')
+        )
+        self.assertEqual([(1, None)], self.__parse(b'[1] \n'))
+
+    def test_invalid_lines_are_reported_and_skipped(self):
+        documents = self.__parse(b'{"amount": 1}\n{oops\n\n{"amount": 2}\n')
+        self.assertEqual(({'amount': 1}, None), documents[0])
+        self.assertIsNone(documents[1][0])
+        self.assertEqual(({'amount': 2}, None), documents[2])
+
+    def test_documents_are_bounded_in_size(self):
+        long_line = json.dumps({'name': 'x' * 100}).encode()
+        self.assertEqual(
+            [(None, 'document too large'), ({'amount': 2}, None)],
+            self.__parse(long_line + b'\n{"amount": 2}', max_document_size=50)
+        )
+        self.assertEqual(
+            [(None, 'document too large')],
+            self.__parse(b'[' + long_line * 1000 + b']', max_document_size=50)
+        )
+
+    def test_empty_body_has_no_documents(self):
+        self.assertEqual([], self.__parse(b' \n'))
+        self.assertEqual([], self.__parse(b'[]'))
+
+    @staticmethod
+    def __parse(body, **options):
+        return list(iter_json_documents(io.BytesIO(body), **options))
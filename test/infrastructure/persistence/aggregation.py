@@ -0,0 +1,79 @@
+"""
+Evaluates the aggregation expressions and update pipelines built by the repositories on plain
+documents, so their tests check what the update does instead of how it is written. Only the
+operators used by the repositories are supported.
+"""
+OPERATORS = {
+    '$toInt': lambda value: None if value is None else int(value),
+    '$add': lambda *values: sum(values),
+    '$subtract': lambda first, second: first - second,
+    '$sum': lambda values: sum(values) if isinstance(values, list) else values,
+    '$eq': lambda first, second: first == second,
+    '$ne': lambda first, second: first != second,
+    '$gte': lambda first, second: first >= second,
+    '$in': lambda value, values: value in values,
+    '$concatArrays': lambda *arrays: [item for array in arrays for item in array],
+    '$slice': lambda values, count: values[count:] if count < 0 else values[:count],
+    '$size': len
+}
+
+
+def apply_pipeline(document, pipeline) -> dict:
+    """
+    :param document: The stored document, or an empty one when it is inserted
+    :param pipeline: List of `$set` stages
+    :return: The updated document
+    """
+    document = dict(document)
+    for stage in pipeline:
+        ((operator, fields),) = stage.items()
+        assert operator == '$set', operator
+        document.update({
+            field: evaluate(expression, document) for (field, expression) in fields.items()
+        })
+    return document
+
+
+def evaluate(expression, document, variables=None) -> object:
+    """
+    :param expression: An aggregation expression
+    :param document: The document the field paths refer to
+    :param variables: Values of the `$$` variables
+    :return: The value of the expression
+    """
+    variables = variables or {}
+    if isinstance(expression, str) and expression.startswith('$$'):
+        (name, _, field) = expression[2:].partition('.')
+        return variables[name][field] if field else variables[name]
+    if isinstance(expression, str) and expression.startswith('$'):
+        return document.get(expression[1:])
+    if isinstance(expression, list):
+        return [evaluate(item, document, variables) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) != 1 or not next(iter(expression)).startswith('$'):
+        return {key: evaluate(value, document, variables) for (key, value) in expression.items()}
+    ((operator, arguments),) = expression.items()
+    if operator == '$literal':
+        return arguments
+    if operator == '$ifNull':
+        (value, default) = evaluate(arguments, document, variables)
+        return default if value is None else value
+    if operator == '$cond':
+        (condition, then, otherwise) = arguments
+        chosen = then if evaluate(condition, document, variables) else otherwise
+        return evaluate(chosen, document, variables)
+    if operator in ('$map', '$filter'):
+        items = evaluate(arguments['input'], document, variables)
+        body = arguments['in'] if operator == '$map' else arguments['cond']
+        results = [
+            evaluate(body, document, dict(variables, **{arguments['as']: item}))
+            for item in items
+        ]
+        if operator == '$map':
+            return results
+        return [item for (item, kept) in zip(items, results) if kept]
+    values = evaluate(arguments, document, variables)
+    if isinstance(arguments, list):
+        return OPERATORS[operator](*values)
+    return OPERATORS[operator](values)
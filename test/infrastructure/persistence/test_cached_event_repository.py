@@ -0,0 +1,61 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.domain.model.Event import Event, EventId, EventName, EventCreated, EventDeleted
+from app.infrastructure.cache import LruTtlCache
+from app.infrastructure.persistence.cached_event_repository import CachedEventRepository, \
+    EventCacheInvalidator
+from app.infrastructure.persistence.event_repository import MongoEventRepository
+
+
+class CachedEventRepositoryTest(TestCase):
+    def setUp(self) -> None:
+        self.cache = LruTtlCache(10, 60)
+        self.repository = MagicMock()
+        self.repository.of_id.return_value = Event(
+            EventId('identifier'), EventName('Event named identifier')
+        )
+        self.cached_repository = CachedEventRepository(self.repository, self.cache)
+        self.invalidator = EventCacheInvalidator(self.cache)
+
+    def test_event_is_read_once(self):
+        self.cached_repository.of_id('identifier')
+        event = self.cached_repository.of_id('identifier')
+        self.repository.of_id.assert_called_once_with('identifier')
+        self.assertEqual(EventId('identifier'), event.identifier)
+        self.assertEqual(EventName('Event named identifier'), event.name)
+
+    def test_each_read_builds_its_own_event(self):
+        first = self.cached_repository.of_id('identifier')
+        first.name = EventName('Renamed event')
+        second = self.cached_repository.of_id('identifier')
+        self.assertIsNot(first, second)
+        self.assertEqual(EventName('Event named identifier'), second.name)
+
+    def test_missing_event_is_not_cached(self):
+        self.repository.of_id.return_value = None
+        self.cached_repository.of_id('identifier')
+        self.cached_repository.of_id('identifier')
+        self.assertEqual(2, self.repository.of_id.call_count)
+
+    def test_created_event_is_invalidated(self):
+        self.cached_repository.of_id('identifier')
+        domain_event = EventCreated(EventId('identifier'), EventName('A new event name'))
+        self.assertTrue(self.invalidator.is_subscribed_to(domain_event))
+        self.invalidator.handle(domain_event)
+        self.cached_repository.of_id('identifier')
+        self.assertEqual(2, self.repository.of_id.call_count)
+
+    def test_deleted_event_is_invalidated(self):
+        self.cached_repository.of_id('identifier')
+        self.invalidator.handle(EventDeleted(EventId('identifier')))
+        self.cached_repository.of_id('identifier')
+        self.assertEqual(2, self.repository.of_id.call_count)
+
+    def test_deleting_an_event_publishes_its_deletion(self):
+        event = MagicMock()
+        MongoEventRepository(MagicMock(), MagicMock()).delete(event)
+        self.assertEqual(
+            ['event_deleted', 'release'],
+            [name for (name, _, _) in event.mock_calls if name in ('event_deleted', 'release')]
+        )
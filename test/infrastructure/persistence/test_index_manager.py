@@ -0,0 +1,79 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from pymongo import ASCENDING, IndexModel
+
+from pymongo.errors import DuplicateKeyError
+
+from app.infrastructure.persistence.index_manager import MongoIndexManager
+
+
+class FixtureRepository:
+    """
+    A repository for testing that declares two indexes
+    """
+    INDEXES = [
+        IndexModel([('identifier', ASCENDING)], name='identifier', unique=True),
+        IndexModel([('eventId', ASCENDING), ('sellerName', ASCENDING)], name='eventId_sellerName')
+    ]
+
+    def __init__(self, existing_indexes):
+        self.collection = MagicMock()
+        self.collection.index_information.return_value = existing_indexes
+
+
+class MongoIndexManagerTest(TestCase):
+    def setUp(self) -> None:
+        self.index_manager = MongoIndexManager()
+
+    def test_missing_indexes_are_created(self):
+        repository = FixtureRepository({
+            '_id_': {'key': [('_id', 1)]},
+            'identifier': {'key': [('identifier', 1)], 'unique': True}
+        })
+        report = self.index_manager.ensure_indexes(repository)
+        self.assertEqual(['eventId_sellerName'], report.missing)
+        created = repository.collection.create_indexes.call_args[0][0]
+        self.assertEqual(['eventId_sellerName'], [model.document['name'] for model in created])
+
+    def test_nothing_is_created_when_indexes_exist(self):
+        repository = FixtureRepository({
+            '_id_': {'key': [('_id', 1)]},
+            'identifier': {'key': [('identifier', 1)], 'unique': True},
+            'eventId_sellerName': {'key': [('eventId', 1), ('sellerName', 1)]}
+        })
+        report = self.index_manager.ensure_indexes(repository)
+        self.assertTrue(report.is_synchronised())
+        repository.collection.create_indexes.assert_not_called()
+
+    def test_undeclared_and_changed_indexes_are_reported(self):
+        repository = FixtureRepository({
+            '_id_': {'key': [('_id', 1)]},
+            'identifier': {'key': [('identifier', -1)]},
+            'eventId_sellerName': {'key': [('eventId', 1), ('sellerName', 1)]},
+            'name': {'key': [('name', 1)]}
+        })
+        report = self.index_manager.report(repository)
+        self.assertEqual([], report.missing)
+        self.assertEqual(['identifier'], report.changed)
+        self.assertEqual(['name'], report.extra)
+
+    def test_changed_options_are_reported(self):
+        repository = FixtureRepository({
+            '_id_': {'key': [('_id', 1)]},
+            'identifier': {'key': [('identifier', 1)]},
+            'eventId_sellerName': {'key': [('eventId', 1), ('sellerName', 1)], 'unique': False}
+        })
+        report = self.index_manager.report(repository)
+        self.assertEqual(['identifier'], report.changed)
+
+    def test_index_that_cannot_be_created_is_reported(self):
+        repository = FixtureRepository({'_id_': {'key': [('_id', 1)]}})
+        repository.collection.create_indexes.side_effect = [
+            DuplicateKeyError('E11000 duplicate key'), None
+        ]
+        with self.assertLogs(level='ERROR'):
+            report = self.index_manager.ensure_indexes(repository)
+        self.assertEqual(['identifier'], report.failed)
+        self.assertEqual(2, repository.collection.create_indexes.call_count)
+        self.assertFalse(report.is_synchronised())
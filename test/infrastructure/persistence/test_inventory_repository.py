@@ -0,0 +1,106 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, call
+
+from pymongo import UpdateOne
+
+from app.domain.model.Event import EventId
+from app.domain.model.Inventory import Inventory, InventoryAmount, InventoryId, SellerName, \
+    InventoryBelowMinimum
+from app.infrastructure.persistence.inventory_repository import MongoInventoryRepository
+from test.infrastructure.persistence.aggregation import apply_pipeline, evaluate
+
+
+class MongoInventoryRepositoryTest(TestCase):
+    def setUp(self) -> None:
+        self.collection = MagicMock()
+        mongo_client = MagicMock()
+        mongo_client.collection.return_value = self.collection
+        self.repository = MongoInventoryRepository(mongo_client, MagicMock())
+        self.collection.find_one_and_update.return_value = {
+            'identifier': 'inventory',
+            'eventId': 'event',
+            'sellerName': 'seller',
+            'amount': 7
+        }
+
+    def test_adjustment_is_a_single_upsert(self):
+        inventory = self.repository.adjust(
+            EventId('event'), SellerName('seller'), InventoryAmount(5)
+        )
+        self.assertEqual(7, inventory.amount.amount)
+        self.collection.find_one.assert_not_called()
+        (criteria, update), options = self.collection.find_one_and_update.call_args
+        self.assertEqual({'eventId': 'event', 'sellerName': 'seller'}, criteria)
+        self.assertEqual(7, apply_pipeline({'identifier': 'stored', 'amount': 2}, update)['amount'])
+        created = apply_pipeline({}, update)
+        self.assertEqual(5, created['amount'])
+        self.assertIsNotNone(created['identifier'])
+        self.assertTrue(options['upsert'])
+
+    def test_decrement_is_guarded_by_the_minimum(self):
+        self.repository.adjust(
+            EventId('event'), SellerName('seller'), InventoryAmount(-3), InventoryAmount(0)
+        )
+        (criteria, update), options = self.collection.find_one_and_update.call_args
+        self.assertTrue(evaluate(criteria['$expr'], {'amount': 3}))
+        self.assertFalse(evaluate(criteria['$expr'], {'amount': 2}))
+        self.assertNotIn('amount', criteria)
+        self.assertEqual(0, apply_pipeline({'amount': 3}, update)['amount'])
+        self.assertFalse(options['upsert'])
+
+    def test_legacy_string_amount_is_read_as_an_integer(self):
+        self.repository.adjust(EventId('event'), SellerName('seller'), InventoryAmount(5))
+        (_, update), _ = self.collection.find_one_and_update.call_args
+        self.assertEqual(12, apply_pipeline({'amount': '7'}, update)['amount'])
+        self.assertEqual(
+            7, evaluate(MongoInventoryRepository.PROJECTION['amount'], {'amount': '7'})
+        )
+
+    def test_inventory_is_replaced_by_event_and_seller(self):
+        inventory = Inventory(
+            InventoryId('inventory'), EventId('event'), InventoryAmount(3), SellerName('seller')
+        )
+        self.assertEqual(
+            UpdateOne(
+                {'eventId': 'event', 'sellerName': 'seller'},
+                {'$set': {'identifier': 'inventory', 'amount': 3}},
+                upsert=True
+            ),
+            self.repository.to_upsert(inventory)
+        )
+        index = next(
+            model.document for model in MongoInventoryRepository.INDEXES
+            if model.document['name'] == 'eventId_sellerName'
+        )
+        self.assertTrue(index['unique'])
+
+    def test_decrement_below_the_minimum_is_rejected(self):
+        self.collection.find_one_and_update.return_value = None
+        with self.assertRaises(InventoryBelowMinimum):
+            self.repository.adjust(
+                EventId('event'), SellerName('seller'), InventoryAmount(-3), InventoryAmount(0)
+            )
+
+    def test_inventory_of_event_is_built_while_the_cursor_is_consumed(self):
+        self.collection.find.return_value = iter([
+            {'identifier': 'first', 'eventId': 'event', 'sellerName': 'seller', 'amount': 1},
+            {'identifier': 'second', 'eventId': 'event', 'sellerName': 'seller', 'amount': 2}
+        ])
+        inventory = self.repository.iter_of_event_id(EventId('event'), batch_size=10)
+        self.collection.find.assert_not_called()
+        self.assertEqual('first', next(inventory).identifier.identifier)
+        (criteria, projection), options = self.collection.find.call_args
+        self.assertEqual({'eventId': 'event'}, criteria)
+        self.assertEqual(MongoInventoryRepository.PROJECTION, projection)
+        self.assertEqual(10, options['batch_size'])
+        self.assertEqual(['second'], [item.identifier.identifier for item in inventory])
+
+    def test_inventories_are_persisted_in_a_single_unit_of_work(self):
+        unit_of_work = self.repository.unit_of_work
+        (first, second) = (MagicMock(), MagicMock())
+        self.repository.persist_many([first, second])
+        unit_of_work.__enter__.assert_called_once()
+        self.assertEqual(
+            [call(first, self.repository), call(second, self.repository)],
+            unit_of_work.register.call_args_list
+        )
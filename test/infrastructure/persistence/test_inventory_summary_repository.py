@@ -0,0 +1,97 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from pymongo import UpdateOne
+
+from app.domain.model.Event import EventId
+from app.domain.model.Inventory import Inventory, InventoryId, InventoryAmount, SellerName
+from app.infrastructure.persistence.inventory_summary_repository import \
+    MongoInventorySummaryRepository
+from test.infrastructure.persistence.aggregation import apply_pipeline
+
+
+class MongoInventorySummaryRepositoryTest(TestCase):
+    def setUp(self) -> None:
+        self.collections = {'inventory_summary': MagicMock(), 'inventory': MagicMock()}
+        mongo_client = MagicMock()
+        mongo_client.collection.side_effect = lambda name: self.collections[name]
+        self.repository = MongoInventorySummaryRepository(mongo_client)
+
+    def test_replaced_amount_sets_the_amount_of_the_seller(self):
+        summary = self.__apply({}, self.__updated('seller', 10))
+        self.assertEqual(10, summary['totalAmount'])
+        summary = self.__apply(summary, self.__updated('other', 5))
+        summary = self.__apply(summary, self.__updated('seller', 4))
+        self.assertEqual(9, summary['totalAmount'])
+        self.assertEqual(
+            [{'seller': 'other', 'amount': 5}, {'seller': 'seller', 'amount': 4}],
+            summary['sellerAmounts']
+        )
+        self.assertEqual(2, summary['sellerCount'])
+        self.assertNotIn('appliedAdjustments', summary)
+        (criteria, _), options = self.collections['inventory_summary'].update_one.call_args
+        self.assertEqual({'eventId': 'event'}, criteria)
+        self.assertTrue(options['upsert'])
+
+    def test_replaced_amount_applied_again_changes_nothing(self):
+        domain_event = self.__updated('seller', 10)
+        summary = self.__apply({}, domain_event)
+        self.assertEqual(summary, self.__apply(summary, domain_event))
+
+    def test_adjustment_is_added_once(self):
+        summary = self.__apply({}, self.__updated('seller', 10))
+        adjustment = self.__updated('seller', 8, -2)
+        summary = self.__apply(summary, adjustment)
+        self.assertEqual(8, summary['totalAmount'])
+        self.assertEqual([adjustment.domain_event_id], summary['appliedAdjustments'])
+        self.assertEqual(summary, self.__apply(summary, adjustment))
+
+    def test_applied_adjustments_are_bounded(self):
+        summary = {'appliedAdjustments': ['previous'] * (
+            MongoInventorySummaryRepository.APPLIED_ADJUSTMENTS
+        )}
+        adjustment = self.__updated('seller', 1, 1)
+        summary = self.__apply(summary, adjustment)
+        self.assertEqual(
+            MongoInventorySummaryRepository.APPLIED_ADJUSTMENTS,
+            len(summary['appliedAdjustments'])
+        )
+        self.assertEqual(adjustment.domain_event_id, summary['appliedAdjustments'][-1])
+
+    def test_sellers_without_inventory_are_not_counted(self):
+        summary = self.__apply({}, self.__updated('seller', 10))
+        summary = self.__apply(summary, self.__updated('seller', 0))
+        self.assertEqual(0, summary['totalAmount'])
+        self.assertEqual([], summary['sellerAmounts'])
+        self.assertEqual(0, summary['sellerCount'])
+
+    def test_inventory_changes_are_applied_in_a_single_bulk_write(self):
+        domain_events = [self.__updated('seller', 10), self.__updated('seller', 15, 5)]
+        self.repository.apply_many(domain_events)
+        self.collections['inventory_summary'].update_one.assert_not_called()
+        (requests,), options = self.collections['inventory_summary'].bulk_write.call_args
+        self.repository.apply(domain_events[1])
+        (criteria, pipeline), _ = self.collections['inventory_summary'].update_one.call_args
+        self.assertEqual(UpdateOne(criteria, pipeline, upsert=True), requests[1])
+        self.assertEqual(2, len(requests))
+        self.assertTrue(options['ordered'])
+
+    def test_summary_of_event_is_rebuilt(self):
+        self.repository.rebuild(EventId('event'))
+        self.collections['inventory_summary'].delete_many.assert_called_with({'eventId': 'event'})
+        pipeline = self.collections['inventory'].aggregate.call_args[0][0]
+        self.assertEqual({'$match': {'eventId': 'event'}}, pipeline[0])
+        self.assertEqual('inventory_summary', pipeline[-1]['$merge']['into'])
+
+    def __apply(self, summary, domain_event) -> dict:
+        self.repository.apply(domain_event)
+        (_, pipeline), _ = self.collections['inventory_summary'].update_one.call_args
+        return apply_pipeline(summary, pipeline)
+
+    @staticmethod
+    def __updated(seller, amount, delta=None):
+        inventory = Inventory(
+            InventoryId('inventory'), EventId('event'), InventoryAmount(amount), SellerName(seller)
+        )
+        inventory.inventory_updated(InventoryAmount(delta) if delta is not None else None)
+        return inventory.events[0]
@@ -0,0 +1,76 @@
+import pickle
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.domain.model.Event import EventCreated, EventId, EventName
+from app.infrastructure.persistence.outbox import MongoOutbox
+
+
+class MongoOutboxTest(TestCase):
+    def setUp(self) -> None:
+        self.collection = MagicMock()
+        mongo_client = MagicMock()
+        mongo_client.collection.return_value = self.collection
+        self.outbox = MongoOutbox(mongo_client, max_attempts=5)
+        self.event = EventCreated(EventId('event'), EventName('Event named event'))
+
+    def test_events_are_stored_as_versioned_documents(self):
+        (insert,) = self.outbox.to_inserts([self.event])
+        self.assertEqual(1, insert._doc['format'])
+        self.assertEqual('app.domain.model.Event.EventCreated', insert._doc['event']['type'])
+        self.assertNotIn('payload', insert._doc)
+
+    def test_stored_events_are_loaded(self):
+        (insert,) = self.outbox.to_inserts([self.event])
+        self.__pending([dict(insert._doc, _id=1, deliveredTo=['done'])])
+        ((identifier, domain_event, delivered_to),) = self.outbox.claim(10)
+        self.assertEqual(1, identifier)
+        self.assertEqual({'done'}, delivered_to)
+        self.assertEqual(EventId('event'), domain_event.identifier)
+        self.assertEqual(EventName('Event named event'), domain_event.name)
+        self.assertEqual(self.event.domain_event_id, domain_event.domain_event_id)
+
+    def test_event_that_cannot_be_loaded_is_moved_to_the_dead_letters(self):
+        (insert,) = self.outbox.to_inserts([self.event])
+        self.__pending([
+            {
+                '_id': 1,
+                'format': 1,
+                'event': {'type': 'app.domain.model.Event.Moved', 'fields': {}}
+            },
+            # Pickled events are never loaded from the database
+            {'_id': 2, 'payload': pickle.dumps(self.event)},
+            dict(insert._doc, _id=3)
+        ])
+        self.assertEqual([3], [identifier for (identifier, _, _) in self.outbox.claim(10)])
+        dead = [call[0][0]['_id'] for call in self.collection.update_one.call_args_list]
+        self.assertEqual([1, 2], dead)
+        (_, update) = self.collection.update_one.call_args[0]
+        self.assertTrue(update['$set']['deadLetter'])
+        self.assertEqual(5, update['$set']['attempts'])
+
+    def test_only_the_events_still_unclaimed_are_delivered(self):
+        (insert,) = self.outbox.to_inserts([self.event])
+        self.__pending([dict(insert._doc, _id=1), dict(insert._doc, _id=2)])
+        self.outbox.claim(10)
+        (criteria, update) = self.collection.update_many.call_args[0]
+        self.assertEqual({'$in': [1, 2]}, criteria['_id'])
+        self.assertEqual({'leaseUntil': None}, criteria['$or'][0])
+        (criteria, _) = self.collection.find.call_args[0]
+        self.assertEqual(update['$set']['owner'], criteria['owner'])
+
+    def test_failed_event_keeps_the_subscribers_that_received_it(self):
+        self.outbox.mark_failed(1, RuntimeError(), {'working'})
+        (_, update) = self.collection.update_one.call_args[0]
+        self.assertEqual({'$each': ['working']}, update['$addToSet']['deliveredTo'])
+        self.assertIsNone(update['$set']['leaseUntil'])
+
+    def __pending(self, records):
+        # The first query finds the candidates, the second one reads the claimed events
+        candidates = MagicMock()
+        candidates.sort.return_value.limit.return_value = [
+            {'_id': record['_id']} for record in records
+        ]
+        claimed = MagicMock()
+        claimed.sort.return_value = iter(records)
+        self.collection.find.side_effect = [candidates, claimed]
@@ -0,0 +1,41 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.infrastructure.persistence.read_models import MongoEventReadModel, \
+    MongoInventoryReadModel
+from test.infrastructure.persistence.aggregation import evaluate
+
+
+class MongoEventReadModelTest(TestCase):
+    def setUp(self) -> None:
+        self.collection = MagicMock()
+        mongo_client = MagicMock()
+        mongo_client.collection.return_value = self.collection
+        self.read_model = MongoEventReadModel(mongo_client)
+
+    def test_slice_returns_the_projected_documents(self):
+        records = [{'id': 'b', 'name': 'Event named b'}]
+        self.collection.find.return_value.sort.return_value.limit.return_value = iter(records)
+        self.assertEqual(records, self.read_model.slice('a', 10))
+        (criteria, projection), _ = self.collection.find.call_args
+        self.assertEqual({'identifier': {'$gt': 'a'}}, criteria)
+        self.assertEqual('$identifier', projection['id'])
+        self.collection.find.return_value.sort.return_value.limit.assert_called_with(10)
+
+
+class MongoInventoryReadModelTest(TestCase):
+    def setUp(self) -> None:
+        self.collection = MagicMock()
+        mongo_client = MagicMock()
+        mongo_client.collection.return_value = self.collection
+        self.read_model = MongoInventoryReadModel(mongo_client)
+
+    def test_inventory_of_event_is_read_while_the_cursor_is_consumed(self):
+        self.collection.find.return_value = iter([{'seller_name': 'seller', 'amount': 1}])
+        inventory = self.read_model.iter_of_event_id('event', batch_size=10)
+        self.collection.find.assert_not_called()
+        self.assertEqual([{'seller_name': 'seller', 'amount': 1}], list(inventory))
+        (criteria, projection), options = self.collection.find.call_args
+        self.assertEqual({'eventId': 'event'}, criteria)
+        self.assertEqual(1, evaluate(projection['amount'], {'amount': '1'}))
+        self.assertEqual(10, options['batch_size'])
@@ -0,0 +1,139 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.infrastructure.domain_events import DomainEventPublisher, DomainEventSubscriber
+from app.infrastructure.persistence.unit_of_work import MongoUnitOfWork, UnitOfWorkNotStarted
+
+
+class FixtureMapper:
+    """
+    A repository for testing, writes operations into a mocked collection
+    """
+
+    def __init__(self):
+        self.collection = MagicMock()
+
+    def to_upsert(self, aggregate):
+        return 'upsert {0}'.format(aggregate.identifier)
+
+
+class MongoUnitOfWorkTest(TestCase):
+    def setUp(self) -> None:
+        mongo_client = MagicMock()
+        mongo_client.transactions = False
+        self.unit_of_work = MongoUnitOfWork(mongo_client)
+        self.mapper = FixtureMapper()
+        self.publisher = DomainEventPublisher.PUBLISHER_INSTANCE = DomainEventPublisher()
+        self.addCleanup(setattr, DomainEventPublisher, 'PUBLISHER_INSTANCE', None)
+
+    def test_aggregates_are_written_in_a_single_bulk_write(self):
+        first, second = self.__aggregate('first'), self.__aggregate('second')
+        with self.unit_of_work:
+            self.unit_of_work.register(first, self.mapper)
+            self.unit_of_work.register(second, self.mapper)
+            self.mapper.collection.bulk_write.assert_not_called()
+        self.mapper.collection.bulk_write.assert_called_once_with(
+            ['upsert first', 'upsert second'], ordered=True, session=None
+        )
+
+    def test_aggregates_are_grouped_by_mapper(self):
+        other_mapper = FixtureMapper()
+        with self.unit_of_work:
+            self.unit_of_work.register(self.__aggregate('first'), self.mapper)
+            self.unit_of_work.register(self.__aggregate('second'), other_mapper)
+        self.mapper.collection.bulk_write.assert_called_once_with(
+            ['upsert first'], ordered=True, session=None
+        )
+        other_mapper.collection.bulk_write.assert_called_once_with(
+            ['upsert second'], ordered=True, session=None
+        )
+
+    def test_aggregate_registered_twice_is_written_once(self):
+        aggregate = self.__aggregate('first')
+        with self.unit_of_work:
+            self.unit_of_work.register(aggregate, self.mapper)
+            self.unit_of_work.register(aggregate, self.mapper)
+        self.mapper.collection.bulk_write.assert_called_once_with(
+            ['upsert first'], ordered=True, session=None
+        )
+
+    def test_nested_units_are_written_by_the_outermost(self):
+        aggregate = self.__aggregate('first')
+        self.publisher.publish_batch = MagicMock()
+        with self.unit_of_work:
+            with self.unit_of_work:
+                self.unit_of_work.register(aggregate, self.mapper)
+            self.mapper.collection.bulk_write.assert_not_called()
+            self.publisher.publish_batch.assert_not_called()
+        self.mapper.collection.bulk_write.assert_called_once()
+        self.publisher.publish_batch.assert_called_once()
+
+    def test_events_of_all_aggregates_are_published_together_after_the_write(self):
+        first, second = self.__aggregate('first'), self.__aggregate('second')
+        first.events, second.events = ['created first'], ['created second']
+        self.publisher.publish_batch = MagicMock()
+        self.mapper.collection.bulk_write.side_effect = lambda *args, **kwargs: \
+            self.publisher.publish_batch.assert_not_called()
+        with self.unit_of_work:
+            self.unit_of_work.register(first, self.mapper)
+            self.unit_of_work.register(second, self.mapper)
+        self.publisher.publish_batch.assert_called_once_with(['created first', 'created second'])
+        first.clear.assert_called_once()
+        second.clear.assert_called_once()
+
+    def test_events_are_not_released_when_the_write_fails(self):
+        aggregate = self.__aggregate('first')
+        self.publisher.publish_batch = MagicMock()
+        self.mapper.collection.bulk_write.side_effect = ConnectionError
+        with self.assertRaises(ConnectionError):
+            with self.unit_of_work:
+                self.unit_of_work.register(aggregate, self.mapper)
+        self.publisher.publish_batch.assert_not_called()
+
+    def test_rollback_discards_the_aggregates(self):
+        aggregate = self.__aggregate('first')
+        with self.assertRaises(ValueError):
+            with self.unit_of_work:
+                self.unit_of_work.register(aggregate, self.mapper)
+                raise ValueError
+        self.mapper.collection.bulk_write.assert_not_called()
+        aggregate.release.assert_not_called()
+        aggregate.clear.assert_called_once()
+
+    def test_domain_events_are_written_to_the_outbox_in_the_same_batch(self):
+        publisher = self.publisher
+        publisher.set_outbox(FixtureMapper())
+        publisher.outbox.to_inserts = lambda events: ['insert {0}'.format(e) for e in events]
+        publisher.subscribe('deferred', MagicMock(spec=DomainEventSubscriber), 'outbox')
+        aggregate = self.__aggregate('first')
+        aggregate.events = ['created']
+        with self.unit_of_work:
+            self.unit_of_work.register(aggregate, self.mapper)
+        publisher.outbox.collection.bulk_write.assert_called_once_with(
+            ['insert created'], ordered=True, session=None
+        )
+        aggregate.release.assert_not_called()
+        aggregate.clear.assert_called_once()
+
+    def test_only_domain_events_of_deferred_subscribers_are_written_to_the_outbox(self):
+        publisher = self.publisher
+        publisher.set_outbox(FixtureMapper())
+        publisher.outbox.to_inserts = lambda events: ['insert {0}'.format(e) for e in events]
+        publisher.subscribe('deferred', MagicMock(spec=DomainEventSubscriber), 'outbox', [int])
+        aggregate = self.__aggregate('first')
+        aggregate.events = ['created', 3]
+        with self.unit_of_work:
+            self.unit_of_work.register(aggregate, self.mapper)
+        publisher.outbox.collection.bulk_write.assert_called_once_with(
+            ['insert 3'], ordered=True, session=None
+        )
+
+    def test_aggregate_cannot_be_registered_without_unit(self):
+        with self.assertRaises(UnitOfWorkNotStarted):
+            self.unit_of_work.register(self.__aggregate('first'), self.mapper)
+
+    @staticmethod
+    def __aggregate(identifier):
+        aggregate = MagicMock()
+        aggregate.identifier = identifier
+        return aggregate
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from app.infrastructure.boot import Boot
+from app.infrastructure.boot_profiler import BootProfiler
+from app.infrastructure.service_injector import LazyService, ServiceInjector, ServiceRecorder, \
+    YamlServiceFileParser
+
+
+class BootProfilerTest(TestCase):
+    def setUp(self) -> None:
+        self.profiler = BootProfiler()
+        self.profiler.start()
+        self.addCleanup(self.profiler.stop)
+
+    def test_services_built_by_the_recorder_are_measured(self):
+        recorder = ServiceRecorder(
+            ServiceInjector('test', '1.0'), YamlServiceFileParser(), profiler=self.profiler
+        )
+        self.assertEqual(1, recorder.workers)
+        with self.profiler.stage('services'):
+            recorder.record('test/resources/service_injector_fixture.yaml')
+        self.assertEqual(
+            {
+                'test.service_injector.fixture_service',
+                'test.service_injector.another_fixture_service'
+            },
+            {service['service'] for service in self.profiler.services}
+        )
+        for service in self.profiler.services:
+            self.assertGreaterEqual(service['import'], 0)
+            self.assertGreaterEqual(service['construction'], 0)
+        self.assertEqual('services', self.profiler.stages[0]['stage'])
+
+    def test_lazy_services_are_built_while_profiling(self):
+        injector = ServiceInjector('test', '1.0')
+        recorder = ServiceRecorder(
+            injector, YamlServiceFileParser(), lazy=True, profiler=self.profiler
+        )
+        recorder.record('test/resources/service_injector_fixture.yaml')
+        self.assertEqual(2, len(self.profiler.services))
+        self.assertNotIsInstance(
+            injector.get_service('test.service_injector.fixture_service'), LazyService
+        )
+
+    def test_boot_is_not_lazy_while_profiling(self):
+        self.assertFalse(Boot(compiled=False, profile=True).lazy)
+        self.assertTrue(Boot(compiled=False, profile=False).lazy)
+
+    def test_report_is_sorted_by_total_time(self):
+        self.profiler.services = [
+            {'service': 'fast', 'import': 0.001, 'construction': 0.001, 'memory': 10},
+            {'service': 'slow', 'import': 0.001, 'construction': 0.5, 'memory': 2048}
+        ]
+        lines = self.profiler.report().splitlines()
+        self.assertTrue(lines[1].startswith('slow'))
+        self.assertTrue(lines[2].startswith('fast'))
+
+    def test_report_is_written_as_json(self):
+        with self.profiler.stage('indexes'):
+            pass
+        (handle, report_file) = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, report_file)
+        self.profiler.write(report_file)
+        with open(report_file) as report:
+            self.assertEqual(['indexes'], [stage['stage'] for stage in json.load(report)['stages']])
@@ -0,0 +1,64 @@
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.application.get_events import GetEventsQuery
+from app.application.persist_event import PersistEventCommand
+from app.infrastructure.bus_middleware import SingleFlightMiddleware, UnitOfWorkMiddleware
+
+
+class UnitOfWorkMiddlewareTest(TestCase):
+    def setUp(self) -> None:
+        self.unit_of_work = MagicMock()
+        self.middleware = UnitOfWorkMiddleware(self.unit_of_work, [PersistEventCommand])
+
+    def test_only_commands_are_wrapped(self):
+        self.assertTrue(self.middleware.applies_to(PersistEventCommand))
+        self.assertFalse(self.middleware.applies_to(GetEventsQuery))
+
+    def test_command_runs_in_a_unit_of_work(self):
+        proceed = MagicMock(side_effect=lambda operation: self.unit_of_work.__enter__.called)
+        self.assertTrue(self.middleware.execute('command', proceed))
+        self.unit_of_work.__exit__.assert_called_once()
+
+    def test_batch_runs_in_a_single_unit_of_work(self):
+        proceed = MagicMock(side_effect=lambda operations: self.unit_of_work.__enter__.called)
+        self.assertTrue(self.middleware.execute_batch(['first', 'second'], proceed))
+        proceed.assert_called_once_with(['first', 'second'])
+        self.unit_of_work.__enter__.assert_called_once()
+        self.unit_of_work.__exit__.assert_called_once()
+
+    def test_commands_can_be_given_by_their_path(self):
+        middleware = UnitOfWorkMiddleware(
+            self.unit_of_work, ['app.application.persist_event.PersistEventCommand']
+        )
+        self.assertTrue(middleware.applies_to(PersistEventCommand))
+        self.assertFalse(middleware.applies_to(GetEventsQuery))
+
+
+class SingleFlightMiddlewareTest(TestCase):
+    def setUp(self) -> None:
+        self.middleware = SingleFlightMiddleware(['app.application.get_events.GetEventsQuery'])
+
+    def test_only_queries_are_coalesced(self):
+        self.assertTrue(self.middleware.applies_to(GetEventsQuery))
+        self.assertFalse(self.middleware.applies_to(PersistEventCommand))
+
+    def test_identical_queries_in_flight_reach_the_handler_once(self):
+        release = threading.Event()
+        proceed = MagicMock(side_effect=lambda query: release.wait() and ['event'])
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.middleware.execute(GetEventsQuery(), proceed))
+            ) for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        while self.middleware.stats()['coalesced'] < 2:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(1)
+        self.assertEqual([['event']] * 3, results)
+        proceed.assert_called_once()
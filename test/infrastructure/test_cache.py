@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from app.infrastructure.cache import LruTtlCache
+
+
+class FixtureClock:
+    """
+    A clock for testing that only moves when it is told to
+    """
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class LruTtlCacheTest(TestCase):
+    def setUp(self) -> None:
+        self.clock = FixtureClock()
+        self.cache = LruTtlCache(2, 10, self.clock)
+
+    def test_entry_is_served_from_cache(self):
+        self.cache.set('key', 'value')
+        self.assertEqual('value', self.cache.get('key'))
+        self.assertIsNone(self.cache.get('another_key'))
+        self.assertEqual(1, self.cache.stats()['hits'])
+        self.assertEqual(1, self.cache.stats()['misses'])
+
+    def test_entry_expires(self):
+        self.cache.set('key', 'value')
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(0, self.cache.stats()['size'])
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('first', 1)
+        self.cache.set('second', 2)
+        self.cache.get('first')
+        self.cache.set('third', 3)
+        self.assertIsNone(self.cache.get('second'))
+        self.assertEqual(1, self.cache.get('first'))
+        self.assertEqual(1, self.cache.stats()['evictions'])
+
+    def test_loaded_value_is_stored(self):
+        self.assertEqual('value', self.cache.get_or_load('key', lambda: 'value'))
+        self.assertEqual('value', self.cache.get_or_load('key', lambda: 'another value'))
+
+    def test_value_loaded_during_an_invalidation_is_not_stored(self):
+        def loader():
+            self.cache.delete('key')
+            return 'stale value'
+        self.assertEqual('stale value', self.cache.get_or_load('key', loader))
+        self.assertIsNone(self.cache.get('key'))
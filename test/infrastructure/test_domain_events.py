@@ -1,7 +1,8 @@
 from unittest import TestCase
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call
 from app.infrastructure.domain_events import DomainEventPublisher, DomainEvent, DomainRoot, \
-    DomainEventSubscriber, SubscriberDoesNotExist, SubscriberAlreadyExist
+    DomainEventSubscriber, SubscriberDoesNotExist, SubscriberAlreadyExist, LazySubscriber
+from app.infrastructure.service_injector import LazyService
 
 
 class DomainEventsTest(TestCase):
@@ -47,6 +48,157 @@ class DomainEventsTest(TestCase):
         subscriber.is_subscribed_to.assert_called_with(event)
         subscriber.handle.assert_not_called()
 
+    def test_deferred_subscriber_is_notified_from_the_outbox(self):
+        event = ProductHasBeenPublished('Helix')
+        outbox = MagicMock()
+        subscriber = ProductHasBeenPublishedSubscriber()
+        subscriber.handle = MagicMock()
+        self.domainEventPublisher.set_outbox(outbox)
+        self.domainEventPublisher.subscribe('product_is_published_subscriber', subscriber, 'outbox')
+        self.domainEventPublisher.publish(event)
+        outbox.store.assert_called_with([event])
+        subscriber.handle.assert_not_called()
+        self.assertEqual(
+            ({'product_is_published_subscriber'}, None), self.domainEventPublisher.deliver(event)
+        )
+        subscriber.handle.assert_called_with(event)
+
+    def test_event_without_deferred_subscriber_is_not_stored_in_the_outbox(self):
+        outbox = MagicMock()
+        self.domainEventPublisher.set_outbox(outbox)
+        self.domainEventPublisher.subscribe(
+            'deferred', DomainEventsTest.__subscriber(), 'outbox', [int]
+        )
+        self.domainEventPublisher.publish_batch([ProductHasBeenPublished('Helix')])
+        outbox.store.assert_not_called()
+
+    def test_delivery_is_tracked_per_subscriber(self):
+        event = ProductHasBeenPublished('Helix')
+        self.domainEventPublisher.set_outbox(MagicMock())
+        (failing, working, delivered) = (
+            DomainEventsTest.__subscriber(),
+            DomainEventsTest.__subscriber(),
+            DomainEventsTest.__subscriber()
+        )
+        error = RuntimeError()
+        failing.handle.side_effect = error
+        self.domainEventPublisher.subscribe('failing', failing, 'outbox')
+        self.domainEventPublisher.subscribe('working', working, 'outbox')
+        self.domainEventPublisher.subscribe('delivered', delivered, 'outbox')
+        self.assertEqual(
+            ({'working', 'delivered'}, error),
+            self.domainEventPublisher.deliver(event, {'delivered'})
+        )
+        working.handle.assert_called_once_with(event)
+        delivered.handle.assert_not_called()
+
+    def test_lazy_subscriber_is_built_on_its_first_event(self):
+        event = ProductHasBeenPublished('Helix')
+        subscriber = DomainEventsTest.__subscriber()
+        factory = MagicMock(return_value=subscriber)
+        self.domainEventPublisher.subscribe(
+            'lazy', LazySubscriber(LazyService('lazy', factory, [])), 'sync',
+            [ProductHasBeenPublished]
+        )
+        factory.assert_not_called()
+        self.domainEventPublisher.publish(event)
+        subscriber.handle.assert_called_once_with(event)
+
+    def test_outbox_batch_is_delivered_in_one_call_per_subscriber(self):
+        (first, second) = (ProductHasBeenPublished('Helix'), ProductHasBeenPublished('Dune'))
+        self.domainEventPublisher.set_outbox(MagicMock())
+        failing = MagicMock(spec=DomainEventSubscriber)
+        working = MagicMock(spec=DomainEventSubscriber)
+        error = RuntimeError()
+        failing.handle_batch.side_effect = error
+        self.domainEventPublisher.subscribe('failing', failing, 'outbox', [ProductHasBeenPublished])
+        self.domainEventPublisher.subscribe('working', working, 'outbox', [ProductHasBeenPublished])
+        results = self.domainEventPublisher.deliver_batch([
+            (1, first, set()), (2, second, {'failing'})
+        ])
+        working.handle_batch.assert_called_once_with([first, second])
+        failing.handle_batch.assert_called_once_with([first])
+        self.assertEqual({1: ({'working'}, error), 2: ({'failing', 'working'}, None)}, results)
+
+    def test_deferred_subscriber_is_notified_without_outbox(self):
+        event = ProductHasBeenPublished('Helix')
+        subscriber = ProductHasBeenPublishedSubscriber()
+        subscriber.handle = MagicMock()
+        self.domainEventPublisher.subscribe('product_is_published_subscriber', subscriber, 'outbox')
+        self.domainEventPublisher.publish(event)
+        subscriber.handle.assert_called_with(event)
+
+    def test_subscriber_is_notified_by_event_class(self):
+        subscriber = ProductHasBeenPublishedSubscriber()
+        subscriber.handle = MagicMock()
+        subscriber.is_subscribed_to = MagicMock()
+        self.domainEventPublisher.subscribe(
+            'product_is_published_subscriber', subscriber, to_classes=[ProductHasBeenPublished]
+        )
+        event = ProductHasBeenRepublished('Helix')
+        self.domainEventPublisher.publish(event)
+        self.domainEventPublisher.publish(EventWithoutSubscribers())
+        subscriber.handle.assert_called_once_with(event)
+        subscriber.is_subscribed_to.assert_not_called()
+
+    def test_subscribers_are_resolved_once_per_event_class(self):
+        subscriber = ProductHasBeenPublishedSubscriber()
+        subscriber.handle = MagicMock()
+        self.domainEventPublisher.subscribe(
+            'product_is_published_subscriber', subscriber, to_classes=[ProductHasBeenPublished]
+        )
+        self.domainEventPublisher.publish(ProductHasBeenPublished('Helix'))
+        self.domainEventPublisher.publish(ProductHasBeenPublished('Helix'))
+        self.assertEqual([ProductHasBeenPublished], list(self.domainEventPublisher.routes))
+        self.domainEventPublisher.unsubscribe('product_is_published_subscriber')
+        self.assertEqual({}, self.domainEventPublisher.routes)
+
+    def test_batch_is_delivered_in_one_call_per_subscriber(self):
+        events = [ProductHasBeenPublished('Helix'), EventWithoutSubscribers(),
+                  ProductHasBeenRepublished('Helix')]
+        subscriber = ProductHasBeenPublishedSubscriber()
+        subscriber.handle_batch = MagicMock()
+        self.domainEventPublisher.subscribe('product_is_published_subscriber', subscriber)
+        self.domainEventPublisher.publish_batch(events)
+        subscriber.handle_batch.assert_called_once_with([events[0], events[2]])
+
+    def test_batch_falls_back_to_handle_each_event(self):
+        events = [ProductHasBeenPublished('Helix'), ProductHasBeenPublished('Nexus')]
+        subscriber = ProductHasBeenPublishedSubscriber()
+        subscriber.handle = MagicMock()
+        self.domainEventPublisher.subscribe(
+            'product_is_published_subscriber', subscriber, to_classes=[ProductHasBeenPublished]
+        )
+        self.domainEventPublisher.publish_batch(events)
+        self.assertEqual(
+            [call(events[0]), call(events[1])], subscriber.handle.call_args_list
+        )
+
+    def test_asynchronous_subscriber_is_notified_in_a_worker(self):
+        event = ProductHasBeenPublished('Helix')
+        subscriber = ProductHasBeenPublishedSubscriber()
+        subscriber.handle = MagicMock()
+        self.domainEventPublisher.subscribe(
+            'product_is_published_subscriber', subscriber, 'async', options={'workers': 1}
+        )
+        self.addCleanup(self.domainEventPublisher.shutdown)
+        self.domainEventPublisher.publish(event)
+        self.assertTrue(self.domainEventPublisher.drain(5))
+        subscriber.handle.assert_called_with(event)
+
+    def test_process_subscriber_failure_is_reported_with_its_identifier(self):
+        event = ProductHasBeenPublished('Helix')
+        self.domainEventPublisher.subscribe(
+            'failing_subscriber', FailingSubscriber(), 'process', options={'workers': 1}
+        )
+        self.addCleanup(self.domainEventPublisher.shutdown)
+        self.domainEventPublisher.publish(event)
+        self.assertTrue(self.domainEventPublisher.drain(30))
+        failure = self.domainEventPublisher.failures[0]
+        self.assertEqual('failing_subscriber', failure.identifier)
+        self.assertEqual('Helix', failure.domain_event.name)
+        self.assertIsInstance(failure.error, ValueError)
+
     def test_domain_root_caches_events(self):
         expected_name = 'Helix'
         product = Product('Helix')
@@ -57,7 +209,7 @@ class DomainEventsTest(TestCase):
         self.assertTrue(stored_events[0].name, expected_name)
 
     def test_domain_root_publishes_events(self):
-        self.domainEventPublisher.publish = MagicMock()
+        self.domainEventPublisher.publish_batch = MagicMock()
         product = Product('Helix')
 
         # Keep in the test and the DomainRoot the same instance of the DomainEventPublisher. As
@@ -68,7 +220,7 @@ class DomainEventsTest(TestCase):
         expected_event = product.events[0]
         product.release()
         self.assertTrue(len(product.events) == 0)
-        self.domainEventPublisher.publish.assert_called_with(expected_event)
+        self.domainEventPublisher.publish_batch.assert_called_with([expected_event])
 
     def test_domain_root_events_are_cleared(self):
         product = Product('Helix')
@@ -76,6 +228,12 @@ class DomainEventsTest(TestCase):
         product.clear()
         self.assertTrue(len(product.events) == 0)
 
+    @staticmethod
+    def __subscriber():
+        subscriber = ProductHasBeenPublishedSubscriber()
+        subscriber.handle = MagicMock()
+        return subscriber
+
 
 class Product(DomainRoot):
     def __init__(self, name):
@@ -94,6 +252,12 @@ class ProductHasBeenPublished(DomainEvent):
         self.name = name
 
 
+class ProductHasBeenRepublished(ProductHasBeenPublished):
+    """
+    For testing that subscribers to a class are notified about its subclasses
+    """
+
+
 class EventWithoutSubscribers(DomainEvent):
     """
     For testing an event that is not registered and should not be
@@ -107,3 +271,15 @@ class ProductHasBeenPublishedSubscriber(DomainEventSubscriber):
 
     def is_subscribed_to(self, domain_event):
         return isinstance(domain_event, ProductHasBeenPublished)
+
+
+class FailingSubscriber(DomainEventSubscriber):
+    """
+    For testing a subscriber notified in another process, so it has to be picklable
+    """
+
+    def handle(self, domain_event):
+        raise ValueError(domain_event.name)
+
+    def is_subscribed_to(self, domain_event):
+        return True
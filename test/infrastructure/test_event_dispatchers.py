@@ -0,0 +1,121 @@
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.infrastructure.domain_events import DomainEvent, DomainEventSubscriber
+from app.infrastructure.event_dispatchers import AsyncDispatcher, ProcessPoolDispatcher, \
+    UnknownBackpressurePolicy, SubscriberCannotBePickled
+
+
+class AsyncDispatcherTest(TestCase):
+    def setUp(self) -> None:
+        self.handled = []
+        self.blocked = threading.Event()
+
+    def test_notifications_with_the_same_key_are_handled_in_order(self):
+        dispatcher = self.__dispatcher(AsyncDispatcher.BLOCK, workers=4)
+        for index in range(50):
+            dispatcher.submit('aggregate', lambda index=index: self.handled.append(index))
+        self.assertTrue(dispatcher.drain(5))
+        self.assertEqual(list(range(50)), self.handled)
+
+    def test_oldest_notification_is_dropped(self):
+        dispatcher = self.__dispatcher(AsyncDispatcher.DROP_OLDEST)
+        dispatcher.submit('aggregate', self.blocked.wait)
+        self.__wait_until_busy(dispatcher)
+        for index in range(3):
+            dispatcher.submit('aggregate', lambda index=index: self.handled.append(index))
+        self.blocked.set()
+        self.assertTrue(dispatcher.drain(5))
+        self.assertEqual([1, 2], self.handled)
+        self.assertEqual(1, dispatcher.dropped)
+
+    def test_caller_runs_the_notification(self):
+        dispatcher = self.__dispatcher(AsyncDispatcher.CALLER_RUNS)
+        dispatcher.submit('aggregate', self.blocked.wait)
+        self.__wait_until_busy(dispatcher)
+        for index in range(3):
+            dispatcher.submit('aggregate', lambda index=index: self.handled.append(index))
+        self.assertEqual([2], self.handled)
+        self.blocked.set()
+        self.assertTrue(dispatcher.drain(5))
+        self.assertEqual([2, 0, 1], self.handled)
+
+    def test_drain_times_out(self):
+        dispatcher = self.__dispatcher(AsyncDispatcher.BLOCK)
+        dispatcher.submit('aggregate', self.blocked.wait)
+        self.assertFalse(dispatcher.drain(0.01))
+        self.blocked.set()
+        self.assertTrue(dispatcher.drain(5))
+
+    def test_shutdown_with_a_full_queue_times_out(self):
+        dispatcher = self.__dispatcher(AsyncDispatcher.BLOCK)
+        dispatcher.submit('aggregate', self.blocked.wait)
+        self.__wait_until_busy(dispatcher)
+        for index in range(2):
+            dispatcher.submit('aggregate', lambda index=index: self.handled.append(index))
+        started = time.monotonic()
+        dispatcher.shutdown(0.1)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(dispatcher.threads[0].is_alive())
+
+    def test_backpressure_policy_is_unknown(self):
+        with self.assertRaises(UnknownBackpressurePolicy):
+            AsyncDispatcher('test', backpressure='ignore')
+
+    def __dispatcher(self, backpressure, workers=1):
+        dispatcher = AsyncDispatcher('test', workers, 2, backpressure)
+        self.addCleanup(dispatcher.shutdown, 5)
+        self.addCleanup(self.blocked.set)
+        return dispatcher
+
+    @staticmethod
+    def __wait_until_busy(dispatcher):
+        while not dispatcher.queues[0].empty():
+            threading.Event().wait(0.001)
+
+
+class ProcessPoolDispatcherTest(TestCase):
+    def test_pool_is_started_on_the_first_notification_and_reused(self):
+        on_failure = MagicMock()
+        dispatcher = ProcessPoolDispatcher('counter', CountingSubscriber(), on_failure, 1)
+        self.addCleanup(dispatcher.shutdown)
+        self.assertIsNone(dispatcher.pool)
+        dispatcher.submit(CountedEvent(1))
+        pool = dispatcher.pool
+        dispatcher.submit(CountedEvent(-1))
+        dispatcher.submit(CountedEvent(2))
+        self.assertIs(pool, dispatcher.pool)
+        self.assertTrue(dispatcher.drain(30))
+        on_failure.assert_called_once()
+        (identifier, domain_event, error), _ = on_failure.call_args
+        self.assertEqual('counter', identifier)
+        self.assertEqual(-1, domain_event.value)
+        self.assertIsInstance(error, ValueError)
+
+
+    def test_subscriber_that_cannot_be_pickled_is_rejected(self):
+        subscriber = CountingSubscriber()
+        subscriber.lock = threading.Lock()
+        with self.assertRaises(SubscriberCannotBePickled):
+            ProcessPoolDispatcher('counter', subscriber, MagicMock())
+
+
+class CountedEvent(DomainEvent):
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
+
+
+class CountingSubscriber(DomainEventSubscriber):
+    """
+    Handled in worker processes, fails on negative values
+    """
+
+    def handle(self, domain_event):
+        if domain_event.value < 0:
+            raise ValueError(domain_event.value)
+
+    def is_subscribed_to(self, domain_event):
+        return isinstance(domain_event, CountedEvent)
@@ -0,0 +1,40 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.infrastructure.outbox_dispatcher import OutboxDispatcher
+
+
+class OutboxDispatcherTest(TestCase):
+    def setUp(self) -> None:
+        self.outbox = MagicMock()
+        self.claimed = [(1, 'first', set()), (2, 'second', {'done'}), (3, 'third', set())]
+        self.outbox.claim.return_value = self.claimed
+        self.publisher = MagicMock()
+        self.publisher.deliver_batch.side_effect = lambda records: {
+            key: (delivered_to | {'subscriber'}, None) for (key, _, delivered_to) in records
+        }
+        self.dispatcher = OutboxDispatcher(self.outbox, 10, 0, self.publisher)
+
+    def test_pending_events_are_delivered_in_one_batch(self):
+        self.assertEqual(3, self.dispatcher.dispatch_pending())
+        self.outbox.claim.assert_called_with(10)
+        self.publisher.deliver_batch.assert_called_once_with(self.claimed)
+        self.publisher.deliver.assert_not_called()
+        self.outbox.mark_delivered.assert_called_with([1, 2, 3])
+
+    def test_failed_event_is_kept_in_the_outbox(self):
+        error = RuntimeError()
+        self.publisher.deliver_batch.side_effect = lambda records: {
+            1: ({'subscriber'}, None),
+            2: ({'done', 'subscriber'}, error),
+            3: ({'subscriber'}, None)
+        }
+        self.assertEqual(2, self.dispatcher.dispatch_pending())
+        self.outbox.mark_failed.assert_called_once_with(2, error, {'done', 'subscriber'})
+        self.outbox.mark_delivered.assert_called_with([1, 3])
+
+    def test_dispatcher_runs_in_a_thread(self):
+        self.outbox.claim.return_value = []
+        self.dispatcher.start()
+        self.dispatcher.stop(1)
+        self.outbox.claim.assert_called()
@@ -0,0 +1,140 @@
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import MagicMock
+import uuid
+
+from app.application.get_events import GetEventsQuery
+from app.application.get_inventory import GetInventoryOfEventQuery
+from app.domain.model.Event import EventCreated, EventId, EventName
+from app.domain.model.Inventory import InventoryUpdated, InventoryAmount, InventoryId, SellerName
+from app.infrastructure.query_cache import CachedQueryHandler, LruQueryCacheBackend, \
+    QueryCacheInvalidator, SharedMemoryQueryCacheBackend, query_key
+
+
+class LruQueryCacheBackendTest(TestCase):
+    def setUp(self) -> None:
+        self.backend = self._backend()
+
+    def _backend(self):
+        return LruQueryCacheBackend(max_size=10, ttl=60)
+
+    def test_result_is_served_while_its_tags_are_not_invalidated(self):
+        versions = self.backend.versions(['events'])
+        self.backend.set('key', ['event'], versions)
+        self.assertEqual(['event'], self.backend.get('key', self.backend.versions(['events'])))
+        self.backend.invalidate(['inventory_of_event:other'])
+        self.assertEqual(['event'], self.backend.get('key', self.backend.versions(['events'])))
+        self.assertEqual(2, self.backend.stats()['hits'])
+
+    def test_result_is_not_served_once_a_tag_is_invalidated(self):
+        self.backend.set('key', ['event'], self.backend.versions(['events']))
+        self.backend.invalidate(['events'])
+        self.assertIsNone(self.backend.get('key', self.backend.versions(['events'])))
+        self.assertEqual(1, self.backend.stats()['misses'])
+
+    def test_result_loaded_during_an_invalidation_is_not_served(self):
+        versions = self.backend.versions(['events'])
+        self.backend.invalidate(['events'])
+        self.backend.set('key', ['stale'], versions)
+        self.assertIsNone(self.backend.get('key', self.backend.versions(['events'])))
+
+
+class SharedMemoryQueryCacheBackendTest(LruQueryCacheBackendTest):
+    def _backend(self):
+        backend = SharedMemoryQueryCacheBackend(
+            'py-ddd-test-{0}'.format(uuid.uuid4().hex[:8]), slots=8, slot_size=256, tag_slots=16
+        )
+        self.addCleanup(backend.close)
+        self.addCleanup(backend.unlink)
+        return backend
+
+    def test_processes_attached_to_the_segment_share_results_and_invalidations(self):
+        other = SharedMemoryQueryCacheBackend(
+            self.backend.memory.name, slots=8, slot_size=256, tag_slots=16
+        )
+        self.addCleanup(other.close)
+        self.backend.set('key', ['event'], self.backend.versions(['events']))
+        self.assertEqual(['event'], other.get('key', other.versions(['events'])))
+        other.invalidate(['events'])
+        self.assertIsNone(self.backend.get('key', self.backend.versions(['events'])))
+
+    def test_results_bigger_than_a_slot_are_not_cached(self):
+        self.backend.set('key', 'x' * 1024, self.backend.versions(['events']))
+        self.assertIsNone(self.backend.get('key', self.backend.versions(['events'])))
+        self.assertEqual(1, self.backend.stats()['oversized'])
+
+    def test_results_are_stored_as_json(self):
+        result = {'updatedOn': datetime(2024, 5, 1, 12, 30), 'events': ('first', 'second')}
+        self.backend.set('key', result, self.backend.versions(['events']))
+        self.assertEqual(
+            {'updatedOn': datetime(2024, 5, 1, 12, 30), 'events': ['first', 'second']},
+            self.backend.get('key', self.backend.versions(['events']))
+        )
+
+    def test_results_that_are_not_json_are_not_cached(self):
+        self.backend.set('key', {'event': object()}, self.backend.versions(['events']))
+        self.assertIsNone(self.backend.get('key', self.backend.versions(['events'])))
+        self.assertEqual(1, self.backend.stats()['unserializable'])
+
+
+class CachedQueryHandlerTest(TestCase):
+    def setUp(self) -> None:
+        self.backend = LruQueryCacheBackend(max_size=10, ttl=60)
+        self.handler = MagicMock()
+        self.handler.handle.side_effect = lambda query: ['inventory of ' + query.event_id]
+        self.cached_handler = CachedQueryHandler(
+            self.handler, self.backend, ['inventory_of_event:{query.event_id}']
+        )
+        self.invalidator = QueryCacheInvalidator(self.backend, {
+            'app.domain.model.Event.EventCreated': ['events'],
+            'app.domain.model.Inventory.InventoryUpdated': [
+                'inventory_of_event:{event.event_id.identifier}'
+            ]
+        })
+
+    def test_query_is_handled_once(self):
+        for _ in range(3):
+            self.assertEqual(
+                ['inventory of first'],
+                self.cached_handler.handle(GetInventoryOfEventQuery('first'))
+            )
+        self.handler.handle.assert_called_once()
+
+    def test_domain_event_invalidates_the_results_of_its_tags_only(self):
+        self.cached_handler.handle(GetInventoryOfEventQuery('first'))
+        self.cached_handler.handle(GetInventoryOfEventQuery('second'))
+        self.invalidator.handle(self.__inventory_updated('first'))
+        self.cached_handler.handle(GetInventoryOfEventQuery('first'))
+        self.cached_handler.handle(GetInventoryOfEventQuery('second'))
+        self.assertEqual(3, self.handler.handle.call_count)
+
+    def test_batch_of_domain_events_is_invalidated_at_once(self):
+        self.backend.invalidate = MagicMock()
+        self.invalidator.handle_batch([
+            self.__inventory_updated('first'),
+            self.__inventory_updated('first'),
+            EventCreated(EventId('second'), EventName('Event named second'))
+        ])
+        self.backend.invalidate.assert_called_once_with(['events', 'inventory_of_event:first'])
+
+    def test_streamed_queries_are_not_cached(self):
+        self.cached_handler.handle(GetInventoryOfEventQuery('first', stream=True))
+        self.cached_handler.handle(GetInventoryOfEventQuery('first', stream=True))
+        self.assertEqual(2, self.handler.handle.call_count)
+
+    def test_key_is_the_same_in_every_process(self):
+        self.assertEqual(
+            "app.application.get_events.GetEventsQuery:"
+            "(('after', None), ('identifier', 'a'), ('limit', None), ('stream', False))",
+            query_key(GetEventsQuery('a'))
+        )
+
+    @staticmethod
+    def __inventory_updated(event_id):
+        return InventoryUpdated(
+            InventoryId('inventory'),
+            EventId(event_id),
+            InventoryAmount(1),
+            SellerName('seller'),
+            InventoryAmount(1)
+        )
@@ -1,8 +1,14 @@
+import os
+import shutil
+import tempfile
+import threading
 from unittest import TestCase
+from unittest.mock import MagicMock
 
 from app.infrastructure.service_injector import ServiceInjector, ServiceDoesNotExist, \
     ServiceAlreadyExists, YamlServiceFileParser, ServiceDefinition, ServiceRecorder, \
-    FileCannotBeParsed
+    FileCannotBeParsed, ParameterDoesNotExist, LazyService, CircularDependency, LazyFlagInvalid, \
+    DependencyDoesNotExist, CompiledServiceFileParser
 
 
 class FixtureService:
@@ -19,6 +25,16 @@ class AnotherFixtureService:
     """
 
 
+class SlowFixtureService:
+    """
+    A service for testing, its construction waits for another one being built at the same time
+    """
+    BUILDING = threading.Barrier(2, timeout=5)
+
+    def __init__(self):
+        SlowFixtureService.BUILDING.wait()
+
+
 class ServiceInjectorTest(TestCase):
     """
     Tests that the service injector can store services, and does not allow
@@ -74,11 +90,152 @@ class ServiceRecorderTest(TestCase):
             self.service_injector.is_service('test.service_injector.another_fixture_service')
         )
 
+    def test_parameters_are_passed_as_arguments(self):
+        self.service_recorder.record('test/resources/service_injector_parameters_fixture.yaml')
+        service = self.service_injector.get_service('test.service_injector.fixture_service')
+        self.assertEqual('parameter value', service.instance.fixture_service)
+
+    def test_parameter_does_not_exist(self):
+        with self.assertRaises(ParameterDoesNotExist):
+            self.service_recorder.record(
+                'test/resources/service_injector_missing_parameter_fixture.yaml'
+            )
+
+    def test_services_are_built_on_first_access(self):
+        recorder = ServiceRecorder(self.service_injector, YamlServiceFileParser(), lazy=True)
+        recorder.record('test/resources/service_injector_fixture.yaml')
+        service = self.service_injector.get_service('test.service_injector.fixture_service')
+        dependency = self.service_injector.get_service(
+            'test.service_injector.another_fixture_service'
+        )
+        self.assertFalse(service.built)
+        self.assertFalse(dependency.built)
+        self.assertIs(dependency.instance, service.instance.fixture_service)
+        self.assertIs(service.instance, service.instance)
+
+    def test_definition_decides_if_the_service_is_lazy(self):
+        self.service_recorder.record('test/resources/service_injector_lazy_fixture.yaml')
+        dependency = self.service_injector.get_service(
+            'test.service_injector.another_fixture_service'
+        )
+        self.assertIsInstance(dependency, LazyService)
+        # The eager service has built its lazy dependency
+        self.assertTrue(dependency.built)
+
+    def test_lazy_flag_must_be_a_boolean(self):
+        with self.assertRaises(LazyFlagInvalid):
+            self.service_recorder.record(
+                'test/resources/service_injector_invalid_lazy_fixture.yaml'
+            )
+
+    def test_services_are_built_after_their_dependencies_in_parallel(self):
+        self.service_recorder.record('test/resources/service_injector_unordered_fixture.yaml')
+        service = self.service_injector.get_service('test.service_injector.fixture_service')
+        self.assertIsInstance(service.instance.fixture_service, SlowFixtureService)
+        self.assertEqual(
+            [
+                'test.service_injector.fixture_service',
+                'test.service_injector.slow_fixture_service',
+                'test.service_injector.another_slow_fixture_service'
+            ],
+            list(self.service_injector.service_consumer.services)
+        )
+
+    def test_circular_dependency_is_reported(self):
+        with self.assertRaises(CircularDependency) as context:
+            self.service_recorder.record('test/resources/service_injector_circular_fixture.yaml')
+        self.assertIn(
+            'test.service_injector.another_fixture_service -> '
+            'test.service_injector.fixture_service', str(context.exception)
+        )
+        self.assertEqual({}, self.service_injector.service_consumer.services)
+
+    def test_missing_dependency_is_reported(self):
+        with self.assertRaises(DependencyDoesNotExist) as context:
+            self.service_recorder.record(
+                'test/resources/service_injector_missing_dependency_fixture.yaml'
+            )
+        self.assertIn('test.service_injector.missing_service', str(context.exception))
+
     def test_service_file_is_incompatible(self):
         with self.assertRaises(FileCannotBeParsed):
             self.service_recorder.record('test/resources/service_injector_invalid_fixture.txt')
 
 
+class LazyServiceTest(TestCase):
+    def test_concurrent_first_accesses_build_the_service_once(self):
+        building = threading.Event()
+        factory = MagicMock(side_effect=lambda: building.wait(0.05) or AnotherFixtureService())
+        service = LazyService('test.service_injector.lazy', factory, [])
+        instances = []
+        threads = [
+            threading.Thread(target=lambda: instances.append(service.instance))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        factory.assert_called_once()
+        self.assertEqual(8, len(instances))
+        self.assertEqual(1, len({id(instance) for instance in instances}))
+
+    def test_failed_build_is_retried(self):
+        factory = MagicMock(side_effect=[ConnectionError, AnotherFixtureService()])
+        service = LazyService('test.service_injector.lazy', factory, [])
+        with self.assertRaises(ConnectionError):
+            service.instance
+        self.assertIsInstance(service.instance, AnotherFixtureService)
+
+
+class CompiledServiceFileParserTest(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.definition_file = os.path.join(directory, 'services.yaml')
+        shutil.copy('test/resources/service_injector_fixture.yaml', self.definition_file)
+        self.compiled_file = os.path.join(directory, 'services.compiled')
+        self.yaml_parser = YamlServiceFileParser()
+        self.yaml_parser.parse_line = MagicMock(wraps=self.yaml_parser.parse_line)
+
+    def test_definitions_are_compiled_once(self):
+        self.assertEqual(2, len(self.__parse()))
+        self.assertTrue(os.path.exists(self.compiled_file))
+        definitions = self.__parse()
+        self.yaml_parser.parse_line.assert_called_once()
+        self.assertEqual(
+            [
+                'test.service_injector.another_fixture_service',
+                'test.service_injector.fixture_service'
+            ],
+            [definition.identifier for definition in definitions]
+        )
+        self.assertEqual(
+            ['test.service_injector.another_fixture_service'], definitions[1].dependencies
+        )
+
+    def test_definitions_are_compiled_again_when_the_file_changes(self):
+        self.__parse()
+        shutil.copy('test/resources/service_injector_parameters_fixture.yaml',
+                    self.definition_file)
+        definitions = self.__parse()
+        self.assertEqual(2, self.yaml_parser.parse_line.call_count)
+        self.assertEqual('parameter value', definitions[0].dependencies[0].value)
+
+    def test_unreadable_compiled_file_is_compiled_again(self):
+        with open(self.compiled_file, mode='wb') as compiled_file:
+            compiled_file.write(b'not a pickle')
+        self.assertEqual(2, len(self.__parse()))
+        self.yaml_parser.parse_line.assert_called_once()
+        self.assertEqual(2, len(self.__parse()))
+        self.yaml_parser.parse_line.assert_called_once()
+
+    def __parse(self):
+        parser = CompiledServiceFileParser(self.yaml_parser, self.compiled_file)
+        parser.set_filepath(self.definition_file)
+        return list(parser.parse_line())
+
+
 class YamlServiceFileParserTest(TestCase):
     """
     Tests that the file parser only processes YAML files properly
@@ -1,8 +1,12 @@
+import asyncio
+import threading
+import time
 from unittest import TestCase
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call
 
 from app.infrastructure.simple_bus import OperationHandler, SimpleBus, HandlerNotFound, \
-    HandlerAlreadyExists
+    HandlerAlreadyExists, Middleware, OperationsFailed, OperationTimedOut, \
+    ServiceOperationHandler
 
 
 class MyOperationCommand:
@@ -11,6 +15,12 @@ class MyOperationCommand:
     """
 
 
+class MySpecialisedOperationCommand(MyOperationCommand):
+    """
+    Just a DTO handled by the handler of its parent class
+    """
+
+
 class MyNonRegisteredCommand:
     """
     Just a DTO that won't have a handler
@@ -22,17 +32,27 @@ class MyOperationHandler(OperationHandler):
         return True
 
 
+class RecordingMiddleware(Middleware):
+    def __init__(self, name, calls, operation_class=object):
+        self.name = name
+        self.calls = calls
+        self.operation_class = operation_class
+
+    def applies_to(self, operation_class):
+        return issubclass(operation_class, self.operation_class)
+
+    def execute(self, operation, proceed):
+        self.calls.append(self.name)
+        return proceed(operation)
+
+
 class SimpleBusTest(TestCase):
     def setUp(self) -> None:
         self.simple_bus = SimpleBus()
 
     def test_operation_is_recorded(self):
         handler = MyOperationHandler()
-        expected = {}
-        expected_class = '{0}.{1}'.format(
-            MyOperationCommand.__module__, MyOperationCommand.__name__
-        )
-        expected[expected_class] = handler
+        expected = {MyOperationCommand: handler}
         self.simple_bus.operation_provider.record(
             MyOperationCommand,
             handler
@@ -73,9 +93,202 @@ class SimpleBusTest(TestCase):
             MyOperationCommand,
             handler
         )
-        identifier = '{0}.{1}'.format(
-            MyOperationCommand.__module__, MyOperationCommand.__name__
-        )
         self.assertTrue(
-            self.simple_bus.operation_provider.is_operation(identifier)
+            self.simple_bus.operation_provider.is_operation(MyOperationCommand)
+        )
+
+    def test_subclassed_operation_is_handled_by_the_parent_handler(self):
+        handler = MyOperationHandler()
+        handler.invoke = MagicMock()
+        self.simple_bus.operation_provider.record(MyOperationCommand, handler)
+        command = MySpecialisedOperationCommand()
+        self.simple_bus.execute(command)
+        handler.invoke.assert_called_with(command)
+
+    def test_closest_handler_is_used_once_recorded(self):
+        handler, specialised_handler = MyOperationHandler(), MyOperationHandler()
+        specialised_handler.invoke = MagicMock(return_value='specialised')
+        self.simple_bus.operation_provider.record(MyOperationCommand, handler)
+        self.assertTrue(self.simple_bus.execute(MySpecialisedOperationCommand()))
+        self.simple_bus.operation_provider.record(
+            MySpecialisedOperationCommand, specialised_handler
+        )
+        self.assertEqual('specialised', self.simple_bus.execute(MySpecialisedOperationCommand()))
+
+    def test_middleware_wraps_the_handler_in_order(self):
+        calls = []
+        self.simple_bus.add_middleware(RecordingMiddleware('outer', calls))
+        self.simple_bus.add_middleware(RecordingMiddleware('inner', calls))
+        self.simple_bus.add_middleware(
+            RecordingMiddleware('other', calls, MyNonRegisteredCommand)
+        )
+        self.simple_bus.operation_provider.record(MyOperationCommand, MyOperationHandler())
+        self.assertTrue(self.simple_bus.execute(MyOperationCommand()))
+        self.assertEqual(['outer', 'inner'], calls)
+
+    def test_handler_chain_is_compiled_once_per_class(self):
+        handler = MyOperationHandler()
+        self.simple_bus.operation_provider.record(MyOperationCommand, handler)
+        self.simple_bus.execute(MyOperationCommand())
+        self.assertEqual(handler.invoke, self.simple_bus.chains[MyOperationCommand])
+
+    def test_batch_is_grouped_by_handler_and_keeps_the_order(self):
+        handler = MagicMock(spec=OperationHandler)
+        handler.invoke_batch.side_effect = lambda operations: [
+            type(operation).__name__ for operation in operations
+        ]
+        other_handler = MagicMock(spec=OperationHandler)
+        other_handler.invoke_batch.return_value = None
+        self.simple_bus.operation_provider.record(MyOperationCommand, handler)
+        self.simple_bus.operation_provider.record(MyNonRegisteredCommand, other_handler)
+        (first, other, second) = \
+            (MyOperationCommand(), MyNonRegisteredCommand(), MyOperationCommand())
+        results = self.simple_bus.execute_batch([first, other, second])
+        self.assertEqual(['MyOperationCommand', None, 'MyOperationCommand'], results)
+        handler.invoke_batch.assert_called_once_with([first, second])
+        other_handler.invoke_batch.assert_called_once_with([other])
+        handler.invoke.assert_not_called()
+
+    def test_subclasses_with_the_same_handler_share_the_batch(self):
+        handler = MagicMock(spec=OperationHandler)
+        handler.invoke_batch.side_effect = lambda operations: list(range(len(operations)))
+        self.simple_bus.operation_provider.record(MyOperationCommand, handler)
+        (first, child, second) = \
+            (MyOperationCommand(), MySpecialisedOperationCommand(), MyOperationCommand())
+        self.assertEqual([0, 1, 2], self.simple_bus.execute_batch([first, child, second]))
+        handler.invoke_batch.assert_called_once_with([first, child, second])
+
+    def test_batch_runs_through_the_middleware_once_per_handler(self):
+        calls = []
+        middleware = RecordingMiddleware('outer', calls)
+        middleware.execute_batch = lambda operations, proceed: \
+            calls.append(len(operations)) or proceed(operations)
+        self.simple_bus.add_middleware(middleware)
+        self.simple_bus.operation_provider.record(MyOperationCommand, MyOperationHandler())
+        results = self.simple_bus.execute_batch([MyOperationCommand(), MyOperationCommand()])
+        self.assertEqual([True, True], results)
+        self.assertEqual([2], calls)
+
+
+    def test_middleware_without_batch_support_wraps_each_operation(self):
+        calls = []
+        handler = MagicMock(spec=OperationHandler)
+        handler.invoke_batch.side_effect = lambda operations: [True for _ in operations]
+        self.simple_bus.add_middleware(RecordingMiddleware('outer', calls))
+        self.simple_bus.operation_provider.record(MyOperationCommand, handler)
+        (first, second) = (MyOperationCommand(), MyOperationCommand())
+        self.assertEqual([True, True], self.simple_bus.execute_batch([first, second]))
+        self.assertEqual(['outer', 'outer'], calls)
+        self.assertEqual([call([first]), call([second])], handler.invoke_batch.call_args_list)
+
+class SlowQuery:
+    def __init__(self, value, delay=0.0):
+        self.value = value
+        self.delay = delay
+
+
+class SlowQueryHandler(OperationHandler):
+    def invoke(self, operation):
+        threading.Event().wait(operation.delay)
+        if operation.value is None:
+            raise ValueError('no value')
+        return operation.value
+
+
+class SimpleBusConcurrencyTest(TestCase):
+    def setUp(self) -> None:
+        self.simple_bus = SimpleBus(max_workers=4)
+        self.simple_bus.operation_provider.record(SlowQuery, SlowQueryHandler())
+        self.addCleanup(self.simple_bus.shutdown)
+
+    def test_operations_run_concurrently_and_keep_their_order(self):
+        started = time.monotonic()
+        results = self.simple_bus.execute_many(
+            [SlowQuery('first', 0.2), SlowQuery('second', 0.1), SlowQuery('third', 0.2)]
+        )
+        self.assertEqual(['first', 'second', 'third'], results)
+        self.assertLess(time.monotonic() - started, 0.45)
+
+    def test_failures_and_timeouts_are_aggregated(self):
+        with self.assertRaises(OperationsFailed) as context:
+            self.simple_bus.execute_many(
+                [SlowQuery('first'), SlowQuery(None), SlowQuery('slow', 0.5)], timeout=0.2
+            )
+        (failed, timed_out) = context.exception.errors
+        self.assertEqual(1, failed[0])
+        self.assertIsInstance(failed[1], ValueError)
+        self.assertEqual(2, timed_out[0])
+        self.assertIsInstance(timed_out[1], OperationTimedOut)
+        self.assertEqual(['first', None, None], context.exception.results)
+
+    def test_operations_run_in_the_caller_while_the_pool_is_saturated(self):
+        simple_bus = SimpleBus(max_workers=1)
+        self.addCleanup(simple_bus.shutdown)
+        simple_bus.operation_provider.record(SlowQuery, SlowQueryHandler())
+        handler = MagicMock(spec=OperationHandler)
+        handler.invoke.side_effect = lambda operation: threading.current_thread().name
+        simple_bus.operation_provider.record(MyOperationCommand, handler)
+        with self.assertRaises(OperationsFailed):
+            simple_bus.execute_many([SlowQuery('stuck', 0.3)], timeout=0.05)
+        # The operation that timed out still holds the only thread of the pool
+        self.assertEqual(
+            [threading.current_thread().name],
+            simple_bus.execute_many([MyOperationCommand()], timeout=0.05)
+        )
+
+    def test_operation_is_executed_asynchronously(self):
+        result = asyncio.run(self.simple_bus.execute_async(SlowQuery('first')))
+        self.assertEqual('first', result)
+        with self.assertRaises(OperationTimedOut):
+            asyncio.run(self.simple_bus.execute_async(SlowQuery('slow', 0.5), timeout=0.05))
+
+    def test_asynchronous_operations_count_as_busy(self):
+        simple_bus = SimpleBus(max_workers=1)
+        self.addCleanup(simple_bus.shutdown)
+        simple_bus.operation_provider.record(SlowQuery, SlowQueryHandler())
+
+        async def run():
+            pending = asyncio.ensure_future(simple_bus.execute_async(SlowQuery('async', 0.2)))
+            await asyncio.sleep(0.05)
+            self.assertEqual(1, simple_bus.busy)
+            caller = simple_bus.execute_many([SlowQuery('caller')])
+            return caller, await pending
+
+        self.assertEqual((['caller'], 'async'), asyncio.run(run()))
+        self.assertEqual(0, simple_bus.busy)
+
+    def test_operations_left_for_the_caller_do_not_start_after_the_timeout(self):
+        simple_bus = SimpleBus(max_workers=1)
+        self.addCleanup(simple_bus.shutdown)
+        simple_bus.operation_provider.record(SlowQuery, SlowQueryHandler())
+        with self.assertRaises(OperationsFailed) as context:
+            simple_bus.execute_many(
+                [SlowQuery('pool', 0.1), SlowQuery('caller', 0.2), SlowQuery('late')],
+                timeout=0.1
+            )
+        self.assertEqual(['pool', 'caller', None], context.exception.results)
+        ((index, error),) = context.exception.errors
+        self.assertEqual(2, index)
+        self.assertIsInstance(error, OperationTimedOut)
+
+    def test_service_is_adapted_to_the_bus(self):
+        service = MagicMock()
+        service.instance.handle.return_value = 'handled'
+        self.assertEqual('handled', ServiceOperationHandler(service).invoke('query'))
+        service.instance.handle.assert_called_once_with('query')
+
+    def test_service_batch_is_handled_at_once_when_supported(self):
+        service = MagicMock()
+        service.instance.handle_batch.return_value = None
+        self.assertIsNone(ServiceOperationHandler(service).invoke_batch(['first', 'second']))
+        service.instance.handle_batch.assert_called_once_with(['first', 'second'])
+        service.instance.handle.assert_not_called()
+
+    def test_service_batch_is_handled_one_by_one_otherwise(self):
+        service = MagicMock(spec=['instance'])
+        service.instance = MagicMock(spec=['handle'])
+        service.instance.handle.side_effect = str.upper
+        self.assertEqual(
+            ['FIRST', 'SECOND'],
+            ServiceOperationHandler(service).invoke_batch(['first', 'second'])
         )
@@ -0,0 +1,97 @@
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from app.application.get_inventory import GetInventoryOfEventQuery
+from app.infrastructure.single_flight import SingleFlight, SingleFlightHandler, coalescing_key
+
+
+class SingleFlightTest(TestCase):
+    def setUp(self) -> None:
+        self.single_flight = SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def test_concurrent_calls_with_the_same_key_share_the_result(self):
+        results = self.__run_concurrently('key', 5)
+        self.assertEqual(['result'] * 5, results)
+        self.assertEqual(1, self.calls)
+        self.assertEqual(
+            {'in_flight': 0, 'calls': 5, 'coalesced': 4}, self.single_flight.stats()
+        )
+
+    def test_calls_are_not_coalesced_once_finished(self):
+        self.release.set()
+        self.single_flight.do('key', self.__load)
+        self.single_flight.do('key', self.__load)
+        self.assertEqual(2, self.calls)
+        self.assertEqual(0, self.single_flight.stats()['coalesced'])
+
+    def test_failure_is_shared_with_the_waiting_callers(self):
+        def fail():
+            self.release.wait()
+            raise ValueError('failed')
+
+        errors = []
+        threads = [
+            threading.Thread(target=self.__capture, args=(fail, errors)) for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        self.__wait_for_followers(2)
+        self.release.set()
+        for thread in threads:
+            thread.join(1)
+        self.assertEqual(3, len(errors))
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+
+    def test_handler_is_decorated(self):
+        handler = MagicMock()
+        handler.handle.return_value = ['inventory']
+        decorated = SingleFlightHandler(handler, self.single_flight)
+        self.assertEqual(['inventory'], decorated.handle(GetInventoryOfEventQuery('event')))
+        handler.handle.assert_called_once()
+
+    def test_key_is_made_of_the_class_and_fields(self):
+        self.assertEqual(
+            coalescing_key(GetInventoryOfEventQuery('event')),
+            coalescing_key(GetInventoryOfEventQuery('event'))
+        )
+        self.assertNotEqual(
+            coalescing_key(GetInventoryOfEventQuery('event')),
+            coalescing_key(GetInventoryOfEventQuery('other'))
+        )
+
+    def test_streams_and_unhashable_queries_are_not_coalesced(self):
+        self.assertIsNone(coalescing_key(GetInventoryOfEventQuery('event', stream=True)))
+        self.assertIsNone(coalescing_key(GetInventoryOfEventQuery(['event'])))
+
+    def __run_concurrently(self, key, callers) -> list:
+        results = [None] * callers
+
+        def call(index):
+            results[index] = self.single_flight.do(key, self.__load)
+
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(callers)]
+        for thread in threads:
+            thread.start()
+        self.__wait_for_followers(callers - 1)
+        self.release.set()
+        for thread in threads:
+            thread.join(1)
+        return results
+
+    def __wait_for_followers(self, followers):
+        while self.single_flight.stats()['coalesced'] < followers:
+            threading.Event().wait(0.01)
+
+    def __capture(self, function, errors):
+        try:
+            self.single_flight.do('key', function)
+        except ValueError as error:
+            errors.append(error)
+
+    def __load(self):
+        self.calls += 1
+        self.release.wait()
+        return 'result'